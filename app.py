@@ -2,6 +2,12 @@ from flask import Flask, render_template, redirect, url_for
 from flask_login import LoginManager, current_user
 from models import db, User, UserRole
 from config import Config
+from services.sqlite_profile import configure_sqlite_profile, install_sqlite_pragmas
+from services.user_cache import load_cached_user
+from services.request_profiler import init_request_profiler
+from services.metrics import init_metrics
+from services.import_jobs import init_import_jobs
+from services.crm_outbox import init_crm_outbox
 import os
 
 def create_app():
@@ -9,7 +15,14 @@ def create_app():
     app.config.from_object(Config)
     
     # Initialize extensions
+    sqlite_profile = configure_sqlite_profile(app)
     db.init_app(app)
+    if sqlite_profile:
+        install_sqlite_pragmas(app)
+    init_request_profiler(app)
+    init_metrics(app)
+    init_import_jobs(app)
+    init_crm_outbox(app)
     
     # Login manager
     login_manager = LoginManager()
@@ -19,7 +32,8 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Served from the identity cache; no query on a hit
+        return load_cached_user(int(user_id))
     
     # Create upload directories
     os.makedirs('uploads/recordings', exist_ok=True)
@@ -33,6 +47,10 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(agent_bp, url_prefix='/agent')
+
+    # CLI maintenance commands
+    from cli import register_commands
+    register_commands(app)
     
     @app.route('/')
     def index():
@@ -49,6 +67,8 @@ if __name__ == '__main__':
     app = create_app()
     with app.app_context():
         db.create_all()
+        from services.db_indexes import add_missing_columns
+        add_missing_columns()
         
         # Create admin user if not exists
         from routes.auth_routes import create_admin_user
@@ -0,0 +1,81 @@
+"""Load benchmark: one POST + commit per activity event vs batched, group-committed ingestion.
+
+    python benchmarks/bench_activity_logs.py --agents 8 --events 400 --batch 20
+
+Each agent is a thread with its own logged-in test client. Timings for the
+batched path include the final flush, so every event is on disk when the
+clock stops.
+"""
+import argparse
+import threading
+import time
+
+from common import db, make_app, seed
+
+from models import CallActivityLog, User
+from services.activity_logs import activity_log_buffer
+
+
+def _login(app, username):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': username, 'password': 'bench'})
+    return client
+
+
+def _event(lead_id, i):
+    return {'lead_id': lead_id, 'call_log_id': f'bench-{lead_id}', 'message': f'Event {i}',
+            'type': 'info', 'timestamp': None}
+
+
+def _run(app, usernames, worker):
+    clients = [_login(app, name) for name in usernames]
+    threads = [threading.Thread(target=worker, args=(client, n)) for n, client in enumerate(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    activity_log_buffer.flush()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agents', type=int, default=8, help='concurrent agents (threads)')
+    parser.add_argument('--events', type=int, default=400, help='events per agent')
+    parser.add_argument('--batch', type=int, default=20, help='events per batched request')
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        seed(agents=args.agents, leads=1000, calls=0, feedbacks=0)
+        agents = User.query.order_by(User.id).all()
+        usernames = [agent.username for agent in agents]
+        agent_ids = [agent.id for agent in agents]
+
+    def per_event(client, n):
+        for i in range(args.events):
+            payload = _event(n + 1, i)
+            payload['agent_id'] = agent_ids[n]
+            client.post('/agent/add_frontend_log', json=payload)
+
+    def batched(client, n):
+        for start in range(0, args.events, args.batch):
+            events = [_event(n + 1, i) for i in range(start, min(start + args.batch, args.events))]
+            client.post('/agent/add_frontend_logs', json={'events': events})
+
+    total = args.agents * args.events
+    print(f'{args.agents} agents x {args.events} events = {total} events')
+    for label, worker in (('one request + commit per event', per_event),
+                          (f'batches of {args.batch}, group commit', batched)):
+        with app.app_context():
+            CallActivityLog.query.delete()
+            db.session.commit()
+        elapsed = _run(app, usernames, worker)
+        with app.app_context():
+            stored = CallActivityLog.query.count()
+        print(f'{label:40} {elapsed:8.2f}s {total / elapsed:10.0f} events/s  ({stored} stored)')
+
+
+if __name__ == '__main__':
+    main()
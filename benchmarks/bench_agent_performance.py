@@ -0,0 +1,59 @@
+"""Benchmark: legacy fan-out join vs pre-aggregated agent performance query.
+
+    python benchmarks/bench_agent_performance.py --calls 1000000
+
+The legacy query joins User to Lead, LeadFeedback and CallLog at once, so its
+runtime grows with leads x feedbacks x calls per agent. Use --skip-legacy on
+large datasets if you only want the new timing.
+"""
+import argparse
+
+from common import db, make_app, seed, timed
+
+from models import User, UserRole, Lead, LeadFeedback, CallLog
+from services.agent_performance import get_agent_performance
+
+
+def legacy_agent_stats():
+    return db.session.query(
+        User.username,
+        db.func.count(Lead.id).label('total_leads'),
+        db.func.count(LeadFeedback.id).label('total_feedbacks'),
+        db.func.avg(CallLog.duration_seconds).label('avg_call_duration')
+    ).select_from(User)\
+     .outerjoin(Lead, User.id == Lead.assigned_agent_id)\
+     .outerjoin(LeadFeedback, User.id == LeadFeedback.agent_id)\
+     .outerjoin(CallLog, User.id == CallLog.agent_id)\
+     .filter(User.role == UserRole.AGENT, User.is_active == True)\
+     .group_by(User.id, User.username)\
+     .all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agents', type=int, default=50)
+    parser.add_argument('--leads', type=int, default=100000)
+    parser.add_argument('--feedbacks', type=int, default=100000)
+    parser.add_argument('--calls', type=int, default=1000000)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        print(f'Seeding {args.agents} agents, {args.leads} leads, {args.feedbacks} feedbacks, {args.calls} calls...')
+        seed(agents=args.agents, leads=args.leads, calls=args.calls, feedbacks=args.feedbacks)
+
+        new_time, new_rows = timed(get_agent_performance)
+        print(f'pre-aggregated: {new_time * 1000:10.1f} ms')
+
+        if not args.skip_legacy:
+            legacy_time, legacy_rows = timed(legacy_agent_stats, repeat=1)
+            print(f'legacy join:    {legacy_time * 1000:10.1f} ms  ({legacy_time / new_time:.1f}x slower)')
+
+            sample_new = next(row for row in new_rows if row.username == legacy_rows[0].username)
+            print(f'{legacy_rows[0].username}: legacy total_leads={legacy_rows[0].total_leads} '
+                  f'(inflated) vs exact total_leads={sample_new.total_leads}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark: one-off ``requests.post`` calls vs the pooled outbound client, over HTTPS.
+
+    python benchmarks/bench_http_client.py --requests 300 --threads 4
+
+Starts a local keep-alive HTTPS stub (self-signed certificate made with the
+``openssl`` CLI) that answers like the CRM webhook, then posts the same form
+payload through both paths. The pooled client's connect/TLS/response timings
+come from its own metrics.
+"""
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.http_client import OutboundClient  # noqa: E402
+
+PAYLOAD = {'country_code': '91', 'mobile': '9876543210', 'form_name': 'Lead Inquiry',
+           'name': 'Bench Lead', 'email': 'bench@example.com', 'project_name': 'Bench Project'}
+
+
+class StubCrmHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    workdir = tempfile.mkdtemp(prefix='crm-stub-')
+    cert, key = os.path.join(workdir, 'cert.pem'), os.path.join(workdir, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1',
+                    '-keyout', key, '-out', cert], check=True, capture_output=True)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubCrmHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'https://127.0.0.1:{server.server_port}/wordpresswebhook', cert
+
+
+def run(post, total, threads):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for resp in pool.map(lambda _: post(), range(total)):
+            resp.raise_for_status()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    url, cert = start_stub()
+
+    legacy = run(lambda: requests.post(url, data=PAYLOAD, timeout=25, verify=cert), args.requests, args.threads)
+
+    client = OutboundClient('bench', pool_maxsize=args.threads)
+    pooled = run(lambda: client.post(url, data=PAYLOAD, verify=cert), args.requests, args.threads)
+    stats = client.stats()
+
+    print(f'{args.requests} POSTs over HTTPS, {args.threads} threads')
+    print(f"{'requests.post per call':28} {legacy:7.2f}s {legacy / args.requests * 1000:8.2f} ms/request")
+    print(f"{'pooled OutboundClient':28} {pooled:7.2f}s {pooled / args.requests * 1000:8.2f} ms/request")
+    print(f"pooled client: {stats['new_connections']} connections for {stats['requests']} requests; "
+          f"avg connect {stats['connect_ms']['avg']}ms, TLS {stats['tls_ms']['avg']}ms, "
+          f"response {stats['response_ms']['avg']}ms")
+
+
+if __name__ == '__main__':
+    main()
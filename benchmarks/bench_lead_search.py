@@ -0,0 +1,51 @@
+"""Benchmark: leading-wildcard ILIKE scans vs the trigram lead search index.
+
+    python benchmarks/bench_lead_search.py --leads 1000000
+"""
+import argparse
+
+from common import make_app, seed, timed
+
+from models import Lead
+from services.lead_search import apply_lead_search, search_backend
+
+SEARCHES = [
+    {'name': 'Lead 123456'},
+    {'name': 'ead 98765'},
+    {'mobile': '0012345'},
+    {'mobile': '+91 70000 54321'},
+    {'pincode': '400777'},
+    {'project_name': 'Project 3', 'name': 'Lead 4242'},
+]
+
+
+def legacy_filter(args):
+    query = Lead.query
+    for field in ('name', 'mobile', 'project_name', 'pincode'):
+        if args.get(field):
+            query = query.filter(getattr(Lead, field).ilike(f'%{args[field]}%'))
+    return query
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leads', type=int, default=1000000)
+    parser.add_argument('--page', type=int, default=50, help='rows fetched per search, like one leads page')
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        print(f'Seeding {args.leads} leads (search backend: ', end='')
+        seed(agents=10, leads=args.leads, calls=0, feedbacks=0)
+        print(f'{search_backend()})')
+
+        print(f"{'filters':45} {'ILIKE scan':>12} {'search index':>14} {'rows':>6}")
+        for search in SEARCHES:
+            legacy_time, legacy_rows = timed(lambda: legacy_filter(search).order_by(Lead.id.desc()).limit(args.page).all())
+            new_time, new_rows = timed(lambda: apply_lead_search(Lead.query, search).order_by(Lead.id.desc()).limit(args.page).all())
+            print(f'{str(search):45} {legacy_time * 1000:10.1f}ms {new_time * 1000:12.1f}ms {len(new_rows):6}'
+                  f"{'' if len(new_rows) >= len(legacy_rows) else '  (fewer rows than ILIKE!)'}")
+
+
+if __name__ == '__main__':
+    main()
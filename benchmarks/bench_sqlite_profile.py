@@ -0,0 +1,116 @@
+"""Concurrency benchmark: SQLite with and without the production profile.
+
+    python benchmarks/bench_sqlite_profile.py --workers 4 --seconds 10
+
+Starts ``--workers`` separate processes (like gunicorn workers) against one
+database file. Each runs a dialing-style mix for ``--seconds``: mostly reads
+(an agent's lead page and counters) with one write in ``--write-every``
+operations (an activity log insert plus a lead status update). Reported are
+operations per second and how many failed with "database is locked".
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def worker(args):
+    from common import db, make_app
+    from sqlalchemy.exc import OperationalError
+    from models import CallActivityLog, Lead, User
+
+    app = make_app()
+    rng = random.Random(os.getpid())
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    with app.app_context():
+        agent_ids = [row.id for row in db.session.query(User.id)]
+        max_lead = db.session.query(db.func.max(Lead.id)).scalar()
+        deadline = time.perf_counter() + args.seconds
+        op = 0
+        while time.perf_counter() < deadline:
+            op += 1
+            agent_id = rng.choice(agent_ids)
+            try:
+                if op % args.write_every == 0:
+                    lead_id = rng.randrange(1, max_lead + 1)
+                    db.session.add(CallActivityLog(agent_id=agent_id, lead_id=lead_id,
+                                                   message='Call started', type='info'))
+                    db.session.query(Lead).filter(Lead.id == lead_id)\
+                        .update({'status': rng.choice(['assigned', 'callback'])})
+                    db.session.commit()
+                    counts['writes'] += 1
+                else:
+                    Lead.query.filter_by(assigned_agent_id=agent_id)\
+                        .order_by(Lead.assigned_date.desc()).limit(50).all()
+                    db.session.query(db.func.count(Lead.id))\
+                        .filter(Lead.assigned_agent_id == agent_id, Lead.status == 'assigned').scalar()
+                    db.session.commit()
+                    counts['reads'] += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                counts['locked'] += 1
+    print(json.dumps(counts))
+
+
+def run_mode(args, db_path, profile):
+    env = dict(os.environ, BENCH_DB_PATH=db_path, SQLITE_PRODUCTION_PROFILE='1' if profile else '0')
+    command = [sys.executable, os.path.abspath(__file__), '--worker',
+               '--seconds', str(args.seconds), '--write-every', str(args.write_every)]
+    processes = [subprocess.Popen(command, env=env, cwd=HERE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(args.workers)]
+    totals = {'reads': 0, 'writes': 0, 'locked': 0}
+    for process in processes:
+        out, _ = process.communicate()
+        for key, value in json.loads(out.strip().splitlines()[-1]).items():
+            totals[key] += value
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-every', type=int, default=5, help='one write per N operations')
+    parser.add_argument('--leads', type=int, default=100000)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args)
+
+    if args.seed:
+        from common import db, make_app, seed
+
+        with make_app().app_context():
+            seed(agents=20, leads=args.leads, calls=0, feedbacks=0)
+        return
+
+    import sqlite3
+    import tempfile
+
+    # Seed in a child process so this one holds no connection while switching journal modes
+    db_path = os.path.join(tempfile.mkdtemp(prefix='leads-bench-'), 'bench.db')
+    print(f'Seeding {args.leads} leads into {db_path}')
+    subprocess.run([sys.executable, os.path.abspath(__file__), '--seed', '--leads', str(args.leads)],
+                   env=dict(os.environ, BENCH_DB_PATH=db_path), cwd=HERE, check=True, stdout=subprocess.DEVNULL)
+
+    print(f"{'profile':10} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for profile in (False, True):
+        # journal_mode persists in the file, so reset it before each run
+        with sqlite3.connect(db_path) as connection:
+            connection.execute(f"PRAGMA journal_mode={'WAL' if profile else 'DELETE'}")
+        totals = run_mode(args, db_path, profile)
+        print(f"{'on' if profile else 'off':10} {totals['reads'] / args.seconds:10.0f} "
+              f"{totals['writes'] / args.seconds:10.0f} {totals['locked']:8}")
+
+
+if __name__ == '__main__':
+    main()
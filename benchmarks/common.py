@@ -0,0 +1,105 @@
+"""Shared helpers for the standalone benchmark scripts in this folder.
+
+Each benchmark builds its own throwaway SQLite database, so import this module
+before anything that pulls in ``config`` (the database URI is read at import).
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_DIR = tempfile.mkdtemp(prefix='leads-bench-')
+DB_PATH = os.environ.get('BENCH_DB_PATH') or os.path.join(BENCH_DIR, 'bench.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models import (db, User, UserRole, Lead, LeadFeedback, CallLog, CallStatus,  # noqa: E402
+                    FeedbackType, CallActivityLog, Project)
+
+INSERT_BATCH = 50000
+LEAD_STATUSES = ['new', 'assigned', 'callback', 'completed', 'interested', 'not_interested']
+FEEDBACK_TYPES = list(FeedbackType)
+CALL_STATUSES = list(CallStatus)
+
+
+def make_app():
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def timed(fn, repeat=3):
+    """Run fn ``repeat`` times and return (best seconds, last result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _bulk_insert(model, rows):
+    for start in range(0, len(rows), INSERT_BATCH):
+        db.session.execute(db.insert(model), rows[start:start + INSERT_BATCH])
+    db.session.commit()
+
+
+def seed(agents=50, leads=100000, calls=1000000, feedbacks=100000, activity_logs=0, seed_value=42):
+    """Populate a fresh schema with synthetic agents, leads and call history"""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    db.drop_all()
+    db.create_all()
+
+    db.session.add(Project(project_id='BENCH', name='Bench Project'))
+    password = generate_password_hash('bench')
+    _bulk_insert(User, [
+        {'username': f'agent{i}', 'email': f'agent{i}@bench.local', 'password': password,
+         'role': UserRole.AGENT, 'is_active': True}
+        for i in range(agents)
+    ])
+    agent_ids = [row.id for row in db.session.query(User.id).all()]
+
+    _bulk_insert(Lead, [
+        {'name': f'Lead {i}', 'mobile': str(7000000000 + i), 'project_name': f'Project {i % 40}',
+         'pincode': str(400000 + i % 900), 'project_id': 1,
+         'assigned_agent_id': rng.choice(agent_ids) if i % 10 else None,
+         'status': rng.choice(LEAD_STATUSES),
+         'assigned_date': now - timedelta(minutes=rng.randrange(525600)),
+         'created_at': now - timedelta(minutes=rng.randrange(525600))}
+        for i in range(leads)
+    ])
+
+    rows = []
+    for i in range(calls):
+        call_time = now - timedelta(seconds=rng.randrange(31536000))
+        rows.append({'lead_id': rng.randrange(1, leads + 1), 'agent_id': rng.choice(agent_ids),
+                     'call_time': call_time, 'end_time': call_time + timedelta(seconds=90),
+                     'status': rng.choice(CALL_STATUSES), 'duration_seconds': rng.randrange(5, 600)})
+        if len(rows) == INSERT_BATCH:
+            _bulk_insert(CallLog, rows)
+            rows = []
+    _bulk_insert(CallLog, rows)
+
+    _bulk_insert(LeadFeedback, [
+        {'lead_id': rng.randrange(1, leads + 1), 'agent_id': rng.choice(agent_ids),
+         'feedback_type': rng.choice(FEEDBACK_TYPES), 'call_activity_id': f'call-{i}',
+         'created_at': now - timedelta(seconds=rng.randrange(31536000))}
+        for i in range(feedbacks)
+    ])
+
+    _bulk_insert(CallActivityLog, [
+        {'lead_id': rng.randrange(1, leads + 1), 'agent_id': rng.choice(agent_ids),
+         'call_log_id': f'call-{i // 4}', 'message': 'Call connected', 'type': 'info',
+         'created_at': now - timedelta(seconds=rng.randrange(31536000))}
+        for i in range(activity_logs)
+    ])
+    return agent_ids
@@ -0,0 +1,113 @@
+"""Flask CLI maintenance commands (``flask --app app <command>``)."""
+import click
+
+
+def register_commands(app):
+    @app.cli.command('create-indexes')
+    def create_indexes():
+        """Create the lookup indexes declared on the models."""
+        from services.db_indexes import migrate_lookup_indexes
+
+        result = migrate_lookup_indexes()
+        for name in result['created']:
+            click.echo(f'created  {name}')
+        for name, reason in result['skipped']:
+            click.echo(f'SKIPPED  {name}: {reason}')
+        if not result['created'] and not result['skipped']:
+            click.echo('All indexes already present.')
+
+    @app.cli.command('add-columns')
+    def add_columns():
+        """Add model columns that existing tables are missing."""
+        from services.db_indexes import add_missing_columns
+
+        added = add_missing_columns()
+        for name in added:
+            click.echo(f'added  {name}')
+        if not added:
+            click.echo('All columns already present.')
+
+    @app.cli.command('check-indexes')
+    def check_indexes():
+        """EXPLAIN the hot queries and fail if any falls back to a full scan."""
+        from services.db_indexes import check_query_plans
+
+        report = check_query_plans()
+        for entry in report:
+            click.echo(f"{'ok  ' if entry['ok'] else 'SCAN'}  {entry['query']}")
+            for line in entry['plan']:
+                click.echo(f'        {line}')
+        if not all(entry['ok'] for entry in report):
+            raise SystemExit(1)
+
+    @app.cli.command('build-search-index')
+    def build_search_index():
+        """Install (or rebuild) the trigram search index for lead filters."""
+        from models import db
+        from services.lead_search import install_lead_search, search_backend
+
+        with db.engine.begin() as connection:
+            install_lead_search(connection)
+        click.echo(f'Lead search backend: {search_backend()}')
+
+    @app.cli.command('backfill-rollups')
+    def backfill_rollups():
+        """Rebuild the report rollup table from the full history."""
+        from services.report_rollups import backfill_rollups as rebuild
+
+        click.echo(f'Rebuilt {rebuild()} rollup rows.')
+
+    @app.cli.command('deliver-crm')
+    def deliver_crm():
+        """Deliver every due CRM outbox row now, then print the outbox summary."""
+        from services.crm_outbox import outbox_summary, process_batch
+
+        attempted = 0
+        while True:
+            batch = process_batch()
+            if not batch:
+                break
+            attempted += batch
+        click.echo(f'Attempted {attempted} deliveries.')
+        for status, count in outbox_summary()['counts'].items():
+            click.echo(f'{status:10} {count}')
+
+    @app.cli.command('recover-imports')
+    def recover_imports():
+        """Requeue orphaned lead import jobs and fail the ones left running by a dead worker."""
+        from services.import_jobs import recover_import_jobs, run_import_job
+
+        requeued, failed = recover_import_jobs(app, submit=False)
+        click.echo(f'Marked {len(failed)} stale job(s) failed; running {len(requeued)} queued job(s).')
+        for job_id in requeued:
+            run_import_job(app, job_id)
+
+    @app.cli.command('process-recordings')
+    @click.option('--retry-failed', is_flag=True, help='Also retry recordings the pipeline failed on.')
+    def process_recordings(retry_failed):
+        """Transcode and measure every recording the background pipeline has not handled."""
+        from collections import Counter
+        from models import db
+        from services.media_pipeline import pending_feedback_ids, process_recording, record_failure
+
+        outcomes = Counter()
+        for feedback_id in pending_feedback_ids(retry_failed=retry_failed):
+            try:
+                outcomes[process_recording(feedback_id)] += 1
+            except Exception as e:
+                db.session.rollback()
+                record_failure(feedback_id, e)
+                outcomes['failed'] += 1
+                click.echo(f'feedback {feedback_id} failed: {e}')
+        for outcome, count in sorted(outcomes.items()):
+            click.echo(f'{outcome:14} {count}')
+        if not outcomes:
+            click.echo('No recordings pending.')
+
+    @app.cli.command('gc-recordings')
+    def gc_recordings():
+        """Delete stored recordings no feedback references (run from cron)."""
+        from services.media_pipeline import sweep_orphaned_recordings
+
+        checked, deleted = sweep_orphaned_recordings()
+        click.echo(f'Checked {checked} stored recordings, deleted {deleted}.')
@@ -7,8 +7,94 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Upload cap for the feedback form's call recording (an hour of WAV is ~600MB)
+    MAX_RECORDING_UPLOAD_LENGTH = int(os.environ.get('MAX_RECORDING_UPLOAD_LENGTH', 512 * 1024 * 1024))
     ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'wav', 'mp3'}
 
+    # WAL, busy_timeout and cache pragmas for a SQLite file DB (see services/sqlite_profile.py)
+    SQLITE_PRODUCTION_PROFILE = os.environ.get('SQLITE_PRODUCTION_PROFILE', '1') == '1'
+
+    # Optional read replica for heavy read-only views (see services/db_routing.py)
+    READ_REPLICA_DATABASE_URL = os.environ.get('READ_REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': READ_REPLICA_DATABASE_URL} if READ_REPLICA_DATABASE_URL else {}
+
+    # Projects / locations / active agents cache (see services/reference_cache.py)
+    REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL', 300))
+    REFERENCE_CACHE_REDIS_URL = os.environ.get('REFERENCE_CACHE_REDIS_URL')
+    # Seconds a worker trusts its own copy before re-reading Redis (only with REFERENCE_CACHE_REDIS_URL)
+    REFERENCE_CACHE_LOCAL_TTL = int(os.environ.get('REFERENCE_CACHE_LOCAL_TTL', 5))
+
+    # Seconds a worker serves a user's identity from cache (see services/user_cache.py)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+
+    # CRM webhook delivery through the outbox (see services/crm_outbox.py)
+    CRM_WEBHOOK_URL = os.environ.get('CRM_WEBHOOK_URL', 'https://valueproperties.tranquilcrmone.in/wordpresswebhook')
+    CRM_TIMEOUT = int(os.environ.get('CRM_TIMEOUT', 10))
+    CRM_BATCH_SIZE = int(os.environ.get('CRM_BATCH_SIZE', 20))
+    CRM_MAX_ATTEMPTS = int(os.environ.get('CRM_MAX_ATTEMPTS', 8))
+    CRM_BACKOFF_BASE = int(os.environ.get('CRM_BACKOFF_BASE', 2))
+    CRM_BACKOFF_MAX = int(os.environ.get('CRM_BACKOFF_MAX', 600))
+    CRM_POLL_INTERVAL = int(os.environ.get('CRM_POLL_INTERVAL', 2))
+    # Must exceed CRM_BATCH_SIZE * CRM_TIMEOUT, or a slow batch is claimed twice
+    CRM_CLAIM_TIMEOUT = int(os.environ.get('CRM_CLAIM_TIMEOUT', 300))
+
+    # Pooled outbound HTTP clients (see services/http_client.py)
+    OUTBOUND_HTTP_POOL_CONNECTIONS = int(os.environ.get('OUTBOUND_HTTP_POOL_CONNECTIONS', 10))  # hosts kept
+    OUTBOUND_HTTP_POOL_MAXSIZE = int(os.environ.get('OUTBOUND_HTTP_POOL_MAXSIZE', 10))  # connections per host
+    OUTBOUND_HTTP_TIMEOUT = int(os.environ.get('OUTBOUND_HTTP_TIMEOUT', 10))
+
+    # Call recording storage (see services/recording_storage.py): 'local' or 's3'
+    RECORDING_STORAGE_BACKEND = os.environ.get('RECORDING_STORAGE_BACKEND', 'local')
+    RECORDINGS_DIR = os.environ.get('RECORDINGS_DIR', 'uploads/recordings')
+    # nginx internal location aliased to RECORDINGS_DIR; when set, nginx serves downloads
+    RECORDINGS_ACCEL_REDIRECT_PREFIX = os.environ.get('RECORDINGS_ACCEL_REDIRECT_PREFIX')
+    RECORDINGS_S3_BUCKET = os.environ.get('RECORDINGS_S3_BUCKET')
+    RECORDINGS_S3_PREFIX = os.environ.get('RECORDINGS_S3_PREFIX', 'recordings/')
+    RECORDINGS_S3_ENDPOINT_URL = os.environ.get('RECORDINGS_S3_ENDPOINT_URL')  # e.g. a local MinIO
+    # Seconds an unreferenced recording is kept before 'flask gc-recordings' deletes it
+    RECORDINGS_GC_GRACE = int(os.environ.get('RECORDINGS_GC_GRACE', 86400))
+
+    # Recording transcode pool (see services/media_pipeline.py)
+    MEDIA_PIPELINE_ENABLED = os.environ.get('MEDIA_PIPELINE_ENABLED', '1') == '1'
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))
+    MEDIA_QUEUE_SIZE = int(os.environ.get('MEDIA_QUEUE_SIZE', 200))
+    MEDIA_SAMPLE_RATE = int(os.environ.get('MEDIA_SAMPLE_RATE', 16000))
+    MEDIA_BITRATE = os.environ.get('MEDIA_BITRATE', '32k')
+
+    # Rows fetched per round trip by the CSV/XLSX exports (see services/exports.py)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Per-request query / template profiling (see services/request_profiler.py)
+    PERF_PROFILING_ENABLED = os.environ.get('PERF_PROFILING_ENABLED', '1') == '1'
+    # Server-Timing response header: 'admin' (admin sessions only), 'all' or 'off'
+    PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', 'admin')
+    PERF_SLOW_QUERY_MS = int(os.environ.get('PERF_SLOW_QUERY_MS', 200))
+    PERF_N_PLUS_ONE_THRESHOLD = int(os.environ.get('PERF_N_PLUS_ONE_THRESHOLD', 5))  # identical statements per request
+    PERF_SAMPLES_PER_ENDPOINT = int(os.environ.get('PERF_SAMPLES_PER_ENDPOINT', 500))
+
+    # Prometheus /metrics (see services/metrics.py); the dir is required under gunicorn and must be
+    # shared by all its workers. Without METRICS_TOKEN only admin sessions may scrape.
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Background lead imports
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 2))
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+    # Seconds without progress after which a 'running' job (its worker died) is marked failed
+    IMPORT_STALE_AFTER = int(os.environ.get('IMPORT_STALE_AFTER', 3600))
+
+    # Seconds a worker trusts its in-memory calling queue before rebuilding it
+    DIALER_QUEUE_TTL = int(os.environ.get('DIALER_QUEUE_TTL', 30))
+
+    # Write-behind group commit for call-center activity logs
+    ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', 500))
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', 0.5))
+
+    # Coalesced CallLog updates: max seconds before commit (0 = write through) and rows per commit
+    CALL_LOG_WRITE_MAX_LATENCY = float(os.environ.get('CALL_LOG_WRITE_MAX_LATENCY', 0.2))
+    CALL_LOG_WRITE_MAX_BATCH = int(os.environ.get('CALL_LOG_WRITE_MAX_BATCH', 200))
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
@@ -1,10 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from services.db_routing import RoutingSession
 
 import enum
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class UserRole(enum.Enum):
     ADMIN = 'admin'
@@ -58,6 +59,8 @@ class User(UserMixin, db.Model):
     role = db.Column(db.Enum(UserRole), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Changes on every committed edit so cached identities are dropped in all workers (services/user_cache.py)
+    session_version = db.Column(db.String(32), nullable=False, default='', server_default='')
     
     # Additional agent fields
     phone_number = db.Column(db.String(20), nullable=True)
@@ -71,6 +74,17 @@ class User(UserMixin, db.Model):
     reassignments_to = db.relationship('LeadReassignment', foreign_keys='LeadReassignment.to_agent_id', backref='to_agent', lazy=True)
 
 class Lead(db.Model):
+    __table_args__ = (
+        # Agent queues and per-agent counters: WHERE assigned_agent_id = ? AND status = ? ORDER BY assigned_date
+        db.Index('ix_lead_agent_status_assigned', 'assigned_agent_id', 'status', 'assigned_date'),
+        db.Index('ix_lead_status', 'status'),
+        db.Index('ix_lead_created_at', 'created_at'),
+        db.Index('ix_lead_assigned_date', 'assigned_date'),
+        db.Index('ix_lead_name', 'name'),
+        db.Index('ix_lead_project_id', 'project_id'),
+        db.Index('uq_lead_mobile', 'mobile', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     email = db.Column(db.String(200), nullable=True)
@@ -113,6 +127,12 @@ class Lead(db.Model):
         return f'<Lead {self.id}: {self.name} - {self.mobile}>'
 
 class LeadFeedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_lead_feedback_agent_created', 'agent_id', 'created_at'),
+        db.Index('ix_lead_feedback_lead_created', 'lead_id', 'created_at'),
+        db.Index('ix_lead_feedback_created_at', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('lead.id'), nullable=False)
     agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -178,6 +198,12 @@ class LeadFeedback(db.Model):
         }
 
 class CallLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_call_log_agent_call_time', 'agent_id', 'call_time'),
+        db.Index('ix_call_log_lead_id', 'lead_id'),
+        db.Index('ix_call_log_call_time', 'call_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('lead.id'), nullable=False)
     agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -217,6 +243,13 @@ class CallLog(db.Model):
         }
 
 class LeadReassignment(db.Model):
+    __table_args__ = (
+        db.Index('ix_lead_reassignment_lead_id', 'lead_id'),
+        db.Index('ix_lead_reassignment_from_agent', 'from_agent_id', 'reassigned_at'),
+        db.Index('ix_lead_reassignment_to_agent', 'to_agent_id', 'reassigned_at'),
+        db.Index('ix_lead_reassignment_reassigned_at', 'reassigned_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('lead.id'), nullable=False)
     from_agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -247,6 +280,10 @@ class LeadReassignment(db.Model):
         }
 
 class LeadAssignmentHistory(db.Model):
+    __table_args__ = (
+        db.Index('ix_lead_assignment_history_lead', 'lead_id', 'assigned_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('lead.id'), nullable=False)
     agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -296,6 +333,10 @@ class Notification(db.Model):
     
 class CallActivityLog(db.Model):
     __tablename__ = 'call_activity_logs'
+    __table_args__ = (
+        db.Index('ix_call_activity_logs_lead_created', 'lead_id', 'created_at'),
+        db.Index('ix_call_activity_logs_call_log_id', 'call_log_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -331,4 +372,124 @@ class Location(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
-        return f"<Location {self.name}>"
\ No newline at end of file
+        return f"<Location {self.name}>"
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    filepath = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    # Progress counters, updated after every chunk
+    chunks = db.Column(db.Integer, default=0)
+    rows_processed = db.Column(db.Integer, default=0)
+    leads_added = db.Column(db.Integer, default=0)
+    duplicates_skipped = db.Column(db.Integer, default=0)
+    invalid_rows = db.Column(db.Integer, default=0)
+    rows_per_second = db.Column(db.Float, default=0.0)
+    error_message = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # last progress update while running
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    created_by = db.relationship('User', foreign_keys=[created_by_id])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'chunks': self.chunks,
+            'rows_processed': self.rows_processed,
+            'leads_added': self.leads_added,
+            'duplicates_skipped': self.duplicates_skipped,
+            'invalid_rows': self.invalid_rows,
+            'rows_per_second': self.rows_per_second,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ReportRollup(db.Model):
+    """Pre-aggregated daily counters behind /admin/reports.
+
+    One row per (day, agent, project, metric); agent_id / project_id are 0 when
+    a metric is not broken down by that dimension. Metrics: ``calls``,
+    ``call_status:<status>``, ``feedback:<type>`` and ``leads_created``.
+    Rows dated ``ALL_TIME_DAY`` (see services/report_rollups.py) hold each
+    metric's running total.
+    """
+    __tablename__ = 'report_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'agent_id', 'project_id', 'metric', name='uq_report_rollup_key'),
+        db.Index('ix_report_rollup_metric_day', 'metric', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    agent_id = db.Column(db.Integer, nullable=False, default=0)
+    project_id = db.Column(db.Integer, nullable=False, default=0)
+    metric = db.Column(db.String(60), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CrmOutbox(db.Model):
+    """Leads waiting to be pushed to the CRM webhook by the background worker.
+
+    status: pending -> sending -> delivered, or back to pending with a later
+    next_attempt_at after a failure, and dead once retries run out or the CRM
+    rejects the payload outright.
+    """
+    __tablename__ = 'crm_outbox'
+    __table_args__ = (
+        db.Index('ix_crm_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_crm_outbox_lead_id', 'lead_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey('lead.id'), nullable=True)
+    agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON form fields for the webhook
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, delivered, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(40), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    response_status = db.Column(db.Integer, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lead_id': self.lead_id,
+            'agent_id': self.agent_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'response_status': self.response_status,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None
+        }
+
+class RecordingJob(db.Model):
+    """Media pipeline outcome for one feedback's recording (see services/media_pipeline.py).
+
+    A row means the recording has been handled; ``flask process-recordings``
+    only picks up feedbacks without one (or with a failed one, on request).
+    """
+    __tablename__ = 'recording_job'
+
+    feedback_id = db.Column(db.Integer, db.ForeignKey('lead_feedback.id'), primary_key=True)
+    outcome = db.Column(db.String(20), nullable=False)  # transcoded, duration_only, unchanged, missing, failed
+    error_message = db.Column(db.Text, nullable=True)
+    processed_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,13 +1,30 @@
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from models import db, User, UserRole, Lead, LeadFeedback, LeadReassignment, LeadAssignmentHistory, CallLog, CallStatus, FeedbackType, InterestLevel,Project,Location,CallActivityLog
-import pandas as pd
+from models import db, User, UserRole, Lead, LeadFeedback, LeadReassignment, LeadAssignmentHistory, CallLog, CallStatus, FeedbackType, InterestLevel,Project,Location,CallActivityLog,ImportJob,CrmOutbox,RecordingJob
 import os
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func, and_
+from sqlalchemy.orm import joinedload
+from services.import_jobs import enqueue_import
+from services.agent_performance import get_agent_performance
+from services.agent_stats import get_agent_stats_batch
+from services.pagination import keyset_paginate, clamp_per_page
+from services.lead_search import apply_lead_search
+from services.db_routing import read_replica_view
+from services.crm_outbox import outbox_summary, retry_dead_delivery
+from services.http_client import client_stats
+from services.reference_cache import invalidate_reference
+from services.report_rollups import metric_total, metric_totals, monthly_totals, forget_lead_activity
+from services.call_log_writes import call_log_buffer
+from services.activity_logs import activity_log_buffer
+from services.media_pipeline import pipeline_stats
+from services.history_listing import LISTINGS, history_page
+from services.call_timeline import timeline_page
+from services.exports import lead_export, call_log_export, feedback_export, export_response
+from services.request_profiler import perf_snapshot, reset_perf_stats
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -41,18 +58,7 @@ def get_admin_stats():
     recent_reassignments = LeadReassignment.query.order_by(LeadReassignment.reassigned_at.desc()).limit(5).all()
     
     # Agent performance stats
-    agent_stats = db.session.query(
-        User.username,
-        func.count(Lead.id).label('total_leads'),
-        func.count(LeadFeedback.id).label('total_feedbacks'),
-        func.avg(CallLog.duration_seconds).label('avg_call_duration')
-    ).select_from(User)\
-     .outerjoin(Lead, User.id == Lead.assigned_agent_id)\
-     .outerjoin(LeadFeedback, User.id == LeadFeedback.agent_id)\
-     .outerjoin(CallLog, User.id == CallLog.agent_id)\
-     .filter(User.role == UserRole.AGENT, User.is_active == True)\
-     .group_by(User.id, User.username)\
-     .all()
+    agent_stats = get_agent_performance()
     
     return {
         'total_leads': total_leads,
@@ -88,7 +94,10 @@ def dashboard():
 def upload_leads_page():
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
-    return render_template('admin/upload_leads.html')
+
+    job_id = request.args.get('job_id', type=int)
+    job = ImportJob.query.get(job_id) if job_id else None
+    return render_template('admin/upload_leads.html', job=job)
 
 @admin_bp.route('/add_lead', methods=['POST'])
 @login_required
@@ -141,117 +150,100 @@ def add_lead():
 def upload_leads():
     if not admin_required():
         return jsonify({'error': 'Access denied'}), 403
-    
-    if 'file' not in request.files:
-        flash('No file selected', 'error')
+
+    # The upload page posts with fetch(); it gets JSON back, errors included
+    wants_json = request.accept_mimetypes.best == 'application/json' \
+        or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+    def upload_error(message):
+        if wants_json:
+            return jsonify({'success': False, 'error': message}), 400
+        flash(message, 'error')
         return redirect(url_for('admin.leads_management'))
+
+    if 'file' not in request.files:
+        return upload_error('No file selected')
     
     file = request.files['file']
     if file.filename == '':
-        flash('No file selected', 'error')
-        return redirect(url_for('admin.leads_management'))
+        return upload_error('No file selected')
     
     if file and allowed_file(file.filename, {'csv', 'xlsx', 'xls'}):
         filename = secure_filename(file.filename)
         upload_dir = 'uploads/csv_files'
         os.makedirs(upload_dir, exist_ok=True)
-        filepath = os.path.join(upload_dir, filename)
+        # Unique on-disk name so concurrent uploads of the same file don't collide
+        filepath = os.path.join(upload_dir, f"{int(datetime.now().timestamp() * 1000)}_{filename}")
         file.save(filepath)
-        
-        try:
-            if filename.endswith('.csv'):
-                df = pd.read_csv(filepath)
-            else:
-                df = pd.read_excel(filepath)
-            
-            required_columns = ['name', 'mobile']
-            if not all(col in df.columns for col in required_columns):
-                flash('CSV must contain "name" and "mobile" columns', 'error')
-                return redirect(url_for('admin.leads_management'))
-            
-            leads_added = 0
-            duplicates_skipped = 0
-            
-            for _, row in df.iterrows():
-                if pd.isna(row['mobile']):
-                    continue
-                
-                # Check for duplicate mobile
-                mobile_str = str(row['mobile']).strip()
-                if Lead.query.filter_by(mobile=mobile_str).first():
-                    duplicates_skipped += 1
-                    continue
-                
-                lead = Lead(
-                    name=str(row['name']).strip() if not pd.isna(row['name']) else 'N/A',
-                    email=str(row['email']).strip() if 'email' in df.columns and not pd.isna(row['email']) else None,
-                    mobile=mobile_str,
-                    pincode=str(row['pincode']).strip() if 'pincode' in df.columns and not pd.isna(row['pincode']) else 'N/A',
-                    project_name=str(row['project_name']).strip() if 'project_name' in df.columns and not pd.isna(row['project_name']) else 'N/A',
-                    source=str(row['source']).strip() if 'source' in df.columns and not pd.isna(row['source']) else 'N/A',
-                    year=int(row['year']) if 'year' in df.columns and not pd.isna(row['year']) else None,
-                    location=str(row['location']).strip() if 'location' in df.columns and not pd.isna(row['location']) else 'N/A'
-                )
-                db.session.add(lead)
-                leads_added += 1
-            
-            db.session.commit()
-            
-            if duplicates_skipped > 0:
-                flash(f'Successfully added {leads_added} leads. Skipped {duplicates_skipped} duplicates.', 'warning')
-            else:
-                flash(f'Successfully added {leads_added} leads from file!', 'success')
-                
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Error processing file: {str(e)}', 'error')
-        finally:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-    else:
-        flash('Invalid file type. Please upload CSV or Excel file.', 'error')
-    
-    return redirect(url_for('admin.leads_management'))
+
+        job = enqueue_import(filepath, filename, created_by_id=current_user.id)
+
+        if wants_json:
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status_url': url_for('admin.api_import_job', job_id=job.id)
+            }), 202
+
+        flash(f'Import of {filename} started. Progress is shown below.', 'info')
+        return redirect(url_for('admin.upload_leads_page', job_id=job.id))
+
+    return upload_error('Invalid file type. Please upload CSV or Excel file.')
 
 # -----------------------------
 # Leads Management
 # -----------------------------
+LEAD_SORT_COLUMNS = {
+    'id': Lead.id,
+    'name': Lead.name,
+    'created_at': Lead.created_at,
+    'assigned_date': Lead.assigned_date,
+}
+
+def filtered_leads_query(args):
+    """Lead query with the leads_management filters applied"""
+    # name / mobile / project_name / pincode go through the trigram search index
+    query = apply_lead_search(Lead.query, args)
+
+    if args.get('project_id'):
+        query = query.filter(Lead.project_id == args['project_id'])
+    if args.get('status') and args.get('status') != 'all':
+        query = query.filter(Lead.status == args['status'])
+    if args.get('agent_id') and args.get('agent_id') != 'all':
+        query = query.filter(Lead.assigned_agent_id == args['agent_id'])
+
+    return query
+
+def paginated_leads(args):
+    """One keyset page of filtered leads, sorted by a supported sort key"""
+    sort_by = args.get('sort_by', 'id')
+    if sort_by not in LEAD_SORT_COLUMNS:
+        sort_by = 'id'
+    sort_order = 'asc' if args.get('sort_order') == 'asc' else 'desc'
+
+    query = filtered_leads_query(args).options(
+        joinedload(Lead.project),
+        joinedload(Lead.assigned_agent)
+    )
+    page = keyset_paginate(
+        query,
+        LEAD_SORT_COLUMNS[sort_by],
+        Lead.id,
+        descending=sort_order == 'desc',
+        after=args.get('after'),
+        before=args.get('before'),
+        per_page=clamp_per_page(args.get('per_page'))
+    )
+    page.update(sort_by=sort_by, sort_order=sort_order)
+    return page
+
 @admin_bp.route('/leads', methods=['GET'])
 @login_required
 def leads_management():
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
 
-    query = Lead.query
-
-    # Filters
-    if request.args.get('name'):
-        query = query.filter(Lead.name.ilike(f"%{request.args['name']}%"))
-    if request.args.get('mobile'):
-        query = query.filter(Lead.mobile.ilike(f"%{request.args['mobile']}%"))
-    if request.args.get('project_name'):
-        query = query.filter(Lead.project_name.ilike(f"%{request.args['project_name']}%"))
-    if request.args.get('pincode'):
-        query = query.filter(Lead.pincode.ilike(f"%{request.args['pincode']}%"))
-    if request.args.get('status') and request.args.get('status') != 'all':
-        query = query.filter(Lead.status == request.args['status'])
-    if request.args.get('agent_id') and request.args.get('agent_id') != 'all':
-        query = query.filter(Lead.assigned_agent_id == request.args['agent_id'])
-
-    # Sorting
-    sort_by = request.args.get('sort_by', 'id')
-    sort_order = request.args.get('sort_order', 'desc')
-    
-    if sort_by == 'name':
-        query = query.order_by(Lead.name.asc() if sort_order == 'asc' else Lead.name.desc())
-    elif sort_by == 'created_at':
-        query = query.order_by(Lead.created_at.asc() if sort_order == 'asc' else Lead.created_at.desc())
-    elif sort_by == 'assigned_date':
-        query = query.order_by(Lead.assigned_date.asc() if sort_order == 'asc' else Lead.assigned_date.desc())
-    else:
-        query = query.order_by(Lead.id.asc() if sort_order == 'asc' else Lead.id.desc())
-
-    leads = query.all()
+    page = paginated_leads(request.args)
     agents = User.query.filter_by(role=UserRole.AGENT, is_active=True).all()
     
     # Statistics for the page
@@ -260,13 +252,72 @@ def leads_management():
     assigned_leads = Lead.query.filter_by(status='assigned').count()
     completed_leads = Lead.query.filter_by(status='completed').count()
     projects = Project.query.all()
+
+    # Page links keep the active filters and sort, swapping only the cursor
+    link_args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    next_url = url_for('admin.leads_management', **link_args, after=page['next_cursor']) if page['next_cursor'] else None
+    prev_url = url_for('admin.leads_management', **link_args, before=page['prev_cursor']) if page['prev_cursor'] else None
+
     return render_template('admin/leads_management.html', 
-                         leads=leads, 
+                         leads=page['items'], 
                          agents=agents,
                          total_leads=total_leads,
                          new_leads=new_leads,
                          assigned_leads=assigned_leads,
-                         completed_leads=completed_leads,    projects=projects)
+                         completed_leads=completed_leads,    projects=projects,
+                         next_url=next_url,
+                         prev_url=prev_url)
+
+@admin_bp.route('/api/leads')
+@login_required
+def api_leads():
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    page = paginated_leads(request.args)
+    leads = [{
+        'id': lead.id,
+        'name': lead.name,
+        'mobile': lead.mobile,
+        'email': lead.email,
+        'project': lead.project.name if lead.project else None,
+        'location': lead.location,
+        'pincode': lead.pincode,
+        'status': lead.status,
+        'assigned_agent': lead.assigned_agent.username if lead.assigned_agent else None,
+        'assigned_date': lead.assigned_date.isoformat() if lead.assigned_date else None,
+        'created_at': lead.created_at.isoformat() if lead.created_at else None
+    } for lead in page['items']]
+
+    return jsonify({
+        'leads': leads,
+        'per_page': page['per_page'],
+        'sort_by': page['sort_by'],
+        'sort_order': page['sort_order'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    })
+
+@admin_bp.route('/export/<kind>')
+@login_required
+def export_data(kind):
+    """Stream leads (with the leads_management filters), call logs or feedbacks as CSV/XLSX"""
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'xlsx'):
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+
+    if kind == 'leads':
+        spec = lead_export(filtered_leads_query(request.args))
+    elif kind == 'call_logs':
+        spec = call_log_export(request.args)
+    elif kind == 'feedbacks':
+        spec = feedback_export(request.args)
+    else:
+        return jsonify({'error': 'Unknown export'}), 404
+    return export_response(spec, fmt)
 
 @admin_bp.route('/assign_lead', methods=['POST'])
 @login_required
@@ -405,10 +456,15 @@ def delete_lead(lead_id):
     
     try:
         # Delete related records first
+        forget_lead_activity(lead_id)
+        feedback_ids = db.session.query(LeadFeedback.id).filter_by(lead_id=lead_id)
+        RecordingJob.query.filter(RecordingJob.feedback_id.in_(feedback_ids)).delete(synchronize_session=False)
         LeadFeedback.query.filter_by(lead_id=lead_id).delete()
         LeadReassignment.query.filter_by(lead_id=lead_id).delete()
         LeadAssignmentHistory.query.filter_by(lead_id=lead_id).delete()
         CallLog.query.filter_by(lead_id=lead_id).delete()
+        # Keep the CRM delivery history, detached from the lead
+        CrmOutbox.query.filter_by(lead_id=lead_id).update({'lead_id': None})
         
         # Delete the lead
         db.session.delete(lead)
@@ -452,26 +508,9 @@ def agents_management():
     # Get all agents
     agents = User.query.filter_by(role=UserRole.AGENT).order_by(User.created_at.desc()).all()
 
-    # Build agent statistics
-    agent_stats = []
-    today = datetime.utcnow().date()
-
-    for agent in agents:
-        assigned_leads = Lead.query.filter_by(assigned_agent_id=agent.id).count()
-        completed_leads = Lead.query.filter_by(assigned_agent_id=agent.id, status='completed').count()
-        total_feedbacks = LeadFeedback.query.filter_by(agent_id=agent.id).count()
-        today_calls = CallLog.query.filter(
-            CallLog.agent_id == agent.id,
-            func.date(CallLog.call_time) == today
-        ).count()
-
-        agent_stats.append({
-            'agent': agent,
-            'assigned_leads': assigned_leads,
-            'completed_leads': completed_leads,
-            'total_feedbacks': total_feedbacks,
-            'today_calls': today_calls
-        })
+    # Build agent statistics in a fixed number of grouped queries
+    stats_by_agent = get_agent_stats_batch(agent.id for agent in agents)
+    agent_stats = [dict(stats_by_agent[agent.id], agent=agent) for agent in agents]
 
     return render_template(
         'admin/agents.html',
@@ -513,6 +552,7 @@ def add_agent():
     try:
         db.session.add(agent)
         db.session.commit()
+        invalidate_reference('active_agents')
         flash('Agent added successfully!', 'success')
     except IntegrityError:
         db.session.rollback()
@@ -530,6 +570,7 @@ def deactivate_agent(agent_id):
     if agent and agent.role == UserRole.AGENT:
         agent.is_active = False
         db.session.commit()
+        invalidate_reference('active_agents')
         flash('Agent deactivated successfully!', 'success')
     else:
         flash('Agent not found', 'error')
@@ -546,6 +587,7 @@ def activate_agent(agent_id):
     if agent and agent.role == UserRole.AGENT:
         agent.is_active = True
         db.session.commit()
+        invalidate_reference('active_agents')
         flash('Agent activated successfully!', 'success')
     else:
         flash('Agent not found', 'error')
@@ -588,17 +630,8 @@ def agent_details(agent_id):
     feedbacks = LeadFeedback.query.filter_by(agent_id=agent.id).order_by(LeadFeedback.created_at.desc()).all()
     call_logs = CallLog.query.filter_by(agent_id=agent.id).order_by(CallLog.call_time.desc()).limit(50).all()
     
-    # Performance metrics
-    total_calls = CallLog.query.filter_by(agent_id=agent.id).count()
-    completed_calls = CallLog.query.filter_by(agent_id=agent.id, status=CallStatus.COMPLETED).count()
-    interested_leads = LeadFeedback.query.filter_by(agent_id=agent.id, feedback_type=FeedbackType.INTERESTED).count()
-    
-    # Recent activity (last 7 days)
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_calls = CallLog.query.filter(
-        CallLog.agent_id == agent.id,
-        CallLog.call_time >= week_ago
-    ).count()
+    # Performance metrics (recent activity = last 7 days)
+    stats = get_agent_stats_batch([agent.id])[agent.id]
     
     return render_template(
         'admin/agent_details.html',
@@ -606,14 +639,15 @@ def agent_details(agent_id):
         assigned_leads=assigned_leads,
         feedbacks=feedbacks,
         call_logs=call_logs,
-        total_calls=total_calls,
-        completed_calls=completed_calls,
-        interested_leads=interested_leads,
-        recent_calls=recent_calls
+        total_calls=stats['total_calls'],
+        completed_calls=stats['completed_calls'],
+        interested_leads=stats['interested_feedbacks'],
+        recent_calls=stats['week_calls']
     )
 
 @admin_bp.route('/agent/<int:agent_id>/history')
 @login_required
+@read_replica_view
 def agent_history(agent_id):
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
@@ -639,6 +673,7 @@ def agent_history(agent_id):
 
 @admin_bp.route('/lead/<int:lead_id>')
 @login_required
+@read_replica_view
 def lead_details(lead_id):
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
@@ -650,125 +685,107 @@ def lead_details(lead_id):
     reassignments = LeadReassignment.query.filter_by(lead_id=lead.id).order_by(LeadReassignment.reassigned_at.desc()).all()
     
     assignment_history = LeadAssignmentHistory.query.filter_by(lead_id=lead.id).order_by(LeadAssignmentHistory.assigned_at.desc()).all()
-    feedbacks = LeadFeedback.query.filter_by(lead_id=lead_id).all()
-    call_logs = CallActivityLog.query.filter_by(lead_id=lead_id).order_by(CallActivityLog.created_at.desc()).all()
-
-    # Group by call_log_id (include all call sessions even if no feedback)
-    grouped = {}
-
-    for log in call_logs:
-        grouped.setdefault(log.call_log_id, {
-            'call_log_id': log.call_log_id,
-            'call_logs': [],
-            'feedbacks': [],
-            'latest_time': log.created_at
-        })
-        grouped[log.call_log_id]['call_logs'].append(log)
-        if log.created_at > grouped[log.call_log_id]['latest_time']:
-            grouped[log.call_log_id]['latest_time'] = log.created_at
-
-    for fb in feedbacks:
-        if fb.call_activity_id:
-            grouped.setdefault(fb.call_activity_id, {
-                'call_log_id': fb.call_activity_id,
-                'call_logs': [],
-                'feedbacks': [],
-                'latest_time': fb.created_at
-            })
-            grouped[fb.call_activity_id]['feedbacks'].append(fb)
-            if fb.created_at > grouped[fb.call_activity_id]['latest_time']:
-                grouped[fb.call_activity_id]['latest_time'] = fb.created_at
-
-    call_activity_data = sorted(grouped.values(), key=lambda x: x['latest_time'], reverse=True)
+    # Call sessions (activity logs + feedback), grouped in SQL and paged by session
+    timeline = timeline_page(lead.id, page=request.args.get('sessions_page', 1, type=int))
     
     return render_template(
         'admin/lead_details.html',
         lead=lead,
-        feedbacks=feedbacks,
         reassignments=reassignments,
-        call_logs=call_logs,
         assignment_history=assignment_history,
-        call_activity_data=call_activity_data
+        timeline=timeline,
+        call_activity_data=timeline['sessions']
     )
 
+def render_history(name, endpoint):
+    """First page of a history listing; later pages come from api_history"""
+    page = history_page(name, request.args)
+    agents = db.session.query(User.id, User.username)\
+        .filter(User.role == UserRole.AGENT)\
+        .order_by(User.username).all()
+
+    filter_args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    next_url = url_for(endpoint, **filter_args, after=page['next_cursor']) if page['next_cursor'] else None
+    prev_url = url_for(endpoint, **filter_args, before=page['prev_cursor']) if page['prev_cursor'] else None
+
+    return render_template('admin/history_list.html',
+                         listing=page['listing'],
+                         rows=page['rows'],
+                         agents=agents,
+                         filters=filter_args,
+                         endpoint=endpoint,
+                         feed_url=url_for('admin.api_history', name=name, **filter_args),
+                         export_name=name if name in ('call_logs', 'feedbacks') else None,
+                         next_cursor=page['next_cursor'],
+                         next_url=next_url,
+                         prev_url=prev_url)
+
 @admin_bp.route('/reassignments')
 @login_required
+@read_replica_view
 def reassignments_history():
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
-    
-    reassignments = LeadReassignment.query.order_by(LeadReassignment.reassigned_at.desc()).all()
-    
-    return render_template('admin/reassignments.html', reassignments=reassignments)
+
+    return render_history('reassignments', 'admin.reassignments_history')
 
 @admin_bp.route('/feedbacks')
 @login_required
+@read_replica_view
 def feedbacks_history():
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
-    
-    feedbacks = LeadFeedback.query.order_by(LeadFeedback.created_at.desc()).all()
-    
-    return render_template('admin/feedbacks.html', feedbacks=feedbacks)
+
+    return render_history('feedbacks', 'admin.feedbacks_history')
 
 @admin_bp.route('/call-logs')
 @login_required
+@read_replica_view
 def call_logs_history():
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
-    
-    call_logs = CallLog.query.order_by(CallLog.call_time.desc()).all()
-    
-    return render_template('admin/call_logs.html', call_logs=call_logs)
+
+    return render_history('call_logs', 'admin.call_logs_history')
+
+@admin_bp.route('/api/history/<name>')
+@login_required
+@read_replica_view
+def api_history(name):
+    """Infinite-scroll feed: the next keyset page of a history listing as JSON"""
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+    if name not in LISTINGS:
+        return jsonify({'error': 'Unknown history listing'}), 404
+
+    page = history_page(name, request.args)
+    return jsonify({
+        'rows': page['rows'],
+        'per_page': page['per_page'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    })
 
 # -----------------------------
 # Reports & Analytics
 # -----------------------------
 @admin_bp.route('/reports')
 @login_required
+@read_replica_view
 def reports():
     if not admin_required():
         return redirect(url_for('agent.dashboard'))
     
     # Basic statistics
-    total_leads = Lead.query.count()
+    total_leads = metric_total('leads_created')
     total_agents = User.query.filter_by(role=UserRole.AGENT, is_active=True).count()
-    total_calls = CallLog.query.count()
-    
-    # Lead status distribution
-    status_distribution = db.session.query(
-        Lead.status,
-        func.count(Lead.id).label('count')
-    ).group_by(Lead.status).all()
-    
-    # Call status distribution
-    call_status_distribution = db.session.query(
-        CallLog.status,
-        func.count(CallLog.id).label('count')
-    ).group_by(CallLog.status).all()
-    
-    # Feedback type distribution
-    feedback_distribution = db.session.query(
-        LeadFeedback.feedback_type,
-        func.count(LeadFeedback.id).label('count')
-    ).group_by(LeadFeedback.feedback_type).all()
-    
-    # Monthly trends (last 6 months)
-    six_months_ago = datetime.utcnow() - timedelta(days=180)
-    
-    monthly_leads = db.session.query(
-        func.date_trunc('month', Lead.created_at).label('month'),
-        func.count(Lead.id).label('count')
-    ).filter(Lead.created_at >= six_months_ago)\
-     .group_by(func.date_trunc('month', Lead.created_at))\
-     .order_by('month').all()
-    
-    monthly_calls = db.session.query(
-        func.date_trunc('month', CallLog.call_time).label('month'),
-        func.count(CallLog.id).label('count')
-    ).filter(CallLog.call_time >= six_months_ago)\
-     .group_by(func.date_trunc('month', CallLog.call_time))\
-     .order_by('month').all()
+    total_calls = metric_total('calls')
+    
+    # Lead status / call / feedback distributions and monthly trends come from the rollups
+    status_distribution = metric_totals('lead_status')
+    call_status_distribution = metric_totals('call_status')
+    feedback_distribution = metric_totals('feedback')
+    monthly_leads = monthly_totals('leads_created', months=6)
+    monthly_calls = monthly_totals('calls', months=6)
     
     return render_template(
         'admin/reports.html',
@@ -801,31 +818,99 @@ def api_lead_stats():
     
     return jsonify(stats)
 
+@admin_bp.route('/api/import_jobs/<int:job_id>')
+@login_required
+def api_import_job(job_id):
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    job = ImportJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+
+    return jsonify(job.to_dict())
+
+@admin_bp.route('/api/write_buffers')
+@login_required
+def api_write_buffers():
+    """Batch size and commit latency counters for this worker's write-behind buffers"""
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    return jsonify({buffer.name: buffer.stats() for buffer in (call_log_buffer, activity_log_buffer)})
+
+@admin_bp.route('/api/http_clients')
+@login_required
+def api_http_clients():
+    """Connection reuse and connect/TLS/response timings of this worker's outbound clients"""
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    return jsonify(client_stats())
+
+@admin_bp.route('/api/perf', methods=['GET', 'DELETE'])
+@login_required
+def api_perf():
+    """Query count, DB / template / total time percentiles per endpoint in this worker"""
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    if request.method == 'DELETE':
+        reset_perf_stats()
+        return jsonify({'success': True})
+    return jsonify(perf_snapshot())
+
+@admin_bp.route('/api/media_pipeline')
+@login_required
+def api_media_pipeline():
+    """Queue depth, outcomes and bytes saved by this worker's recording pipeline"""
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    return jsonify(pipeline_stats())
+
+@admin_bp.route('/api/crm_outbox')
+@login_required
+def api_crm_outbox():
+    """Delivery counts by status plus the most recent dead letters"""
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    summary = outbox_summary()
+    dead = CrmOutbox.query.filter_by(status='dead').order_by(CrmOutbox.id.desc()).limit(50).all()
+    summary['dead'] = [entry.to_dict() for entry in dead]
+    return jsonify(summary)
+
+@admin_bp.route('/api/crm_outbox/<int:delivery_id>/retry', methods=['POST'])
+@login_required
+def api_retry_crm_delivery(delivery_id):
+    if not admin_required():
+        return jsonify({'error': 'Access denied'}), 403
+
+    entry = CrmOutbox.query.get(delivery_id)
+    if not entry:
+        return jsonify({'error': 'Delivery not found'}), 404
+    if entry.status != 'dead':
+        return jsonify({'error': f'Delivery is {entry.status}, only dead deliveries can be retried'}), 400
+
+    retry_dead_delivery(entry)
+    return jsonify(entry.to_dict())
+
 @admin_bp.route('/api/agent_performance')
 @login_required
 def api_agent_performance():
     if not admin_required():
         return jsonify({'error': 'Access denied'}), 403
     
-    performance_data = db.session.query(
-        User.username,
-        func.count(Lead.id).label('assigned_leads'),
-        func.count(LeadFeedback.id).label('completed_feedbacks'),
-        func.avg(CallLog.duration_seconds).label('avg_call_duration')
-    ).select_from(User)\
-     .outerjoin(Lead, User.id == Lead.assigned_agent_id)\
-     .outerjoin(LeadFeedback, User.id == LeadFeedback.agent_id)\
-     .outerjoin(CallLog, User.id == CallLog.agent_id)\
-     .filter(User.role == UserRole.AGENT, User.is_active == True)\
-     .group_by(User.id, User.username)\
-     .all()
+    performance_data = get_agent_performance()
     
     result = []
     for data in performance_data:
         result.append({
             'agent': data.username,
-            'assigned_leads': data.assigned_leads or 0,
-            'completed_feedbacks': data.completed_feedbacks or 0,
+            'assigned_leads': data.total_leads,
+            'completed_feedbacks': data.total_feedbacks,
+            'total_calls': data.total_calls,
             'avg_call_duration': round(data.avg_call_duration or 0, 2)
         })
     
@@ -855,6 +940,7 @@ def create_project():
         try:
             db.session.add(new_project)
             db.session.commit()
+            invalidate_reference('projects')
             flash("Project created successfully!", "success")
             return redirect(url_for("admin.list_projects"))
 
@@ -873,6 +959,7 @@ def delete_project(id):
     project = Project.query.get_or_404(id)
     db.session.delete(project)
     db.session.commit()
+    invalidate_reference('projects')
     flash("Project deleted!", "success")
     return redirect(url_for("admin.list_projects"))
 @admin_bp.route("/locations")
@@ -898,6 +985,7 @@ def create_location():
         try:
             db.session.add(new_location)
             db.session.commit()
+            invalidate_reference('locations')
             flash("Location created successfully!", "success")
             return redirect(url_for("admin.list_locations"))
 
@@ -917,5 +1005,6 @@ def delete_location(id):
     loc = Location.query.get_or_404(id)
     db.session.delete(loc)
     db.session.commit()
+    invalidate_reference('locations')
     flash("Location deleted!", "success")
     return redirect(url_for("admin.list_locations"))
\ No newline at end of file
@@ -1,12 +1,19 @@
 
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
-from models import db, User, UserRole, Lead, LeadFeedback, LeadReassignment, InterestLevel, CallLog, CallStatus, FeedbackType, CallActivityLog,Project, Location
-import os
+from models import db, User, UserRole, Lead, LeadFeedback, LeadReassignment, InterestLevel, CallLog, CallStatus, FeedbackType, CallActivityLog,Project, Location, CrmOutbox
 from datetime import datetime, timedelta
 import json
-import requests
+from services.agent_stats import get_agent_counters
+from services.dialer_queue import queue_position, invalidate_queues
+from services.crm_outbox import enqueue_crm_delivery
+from services import reference_cache
+from services.call_log_writes import queue_call_log_update
+from services.activity_logs import MAX_EVENTS_PER_REQUEST, build_activity_rows, enqueue_activity_logs
+from services.recording_storage import store_recording, send_recording
+from services.media_pipeline import enqueue_recording
+from services.call_timeline import timeline_page
+from services.metrics import ACTIVITY_EVENTS
 agent_bp = Blueprint('agent', __name__)
 
 def allowed_file(filename, allowed_extensions):
@@ -19,17 +26,7 @@ def dashboard():
         flash('Access denied!', 'error')
         return redirect(url_for('admin.dashboard'))
     
-    assigned_leads = Lead.query.filter_by(assigned_agent_id=current_user.id).count()
-    completed_leads = Lead.query.filter_by(assigned_agent_id=current_user.id, status='completed').count()
-    pending_leads = Lead.query.filter_by(assigned_agent_id=current_user.id, status='assigned').count()
-    interested_leads = Lead.query.filter_by(assigned_agent_id=current_user.id, status='interested').count()
-    
-    # Get today's call statistics
-    today = datetime.utcnow().date()
-    today_calls = CallLog.query.filter(
-        CallLog.agent_id == current_user.id,
-        db.func.date(CallLog.call_time) == today
-    ).count()
+    stats = get_agent_counters(current_user.id)
     
     # Get recent call logs
     recent_calls = CallLog.query.filter_by(agent_id=current_user.id)\
@@ -38,12 +35,8 @@ def dashboard():
         .all()
     
     return render_template('agent/dashboard.html',
-                         assigned_leads=assigned_leads,
-                         completed_leads=completed_leads,
-                         pending_leads=pending_leads,
-                         interested_leads=interested_leads,
-                         today_calls=today_calls,
-                         recent_calls=recent_calls)
+                         recent_calls=recent_calls,
+                         **stats)
 
 @agent_bp.route('/call_center')
 @login_required
@@ -52,59 +45,37 @@ def call_center():
         flash('Access denied!', 'error')
         return redirect(url_for('admin.dashboard'))
     
-    # Get leads assigned to current agent with status 'assigned' or 'callback'
-    leads = Lead.query.filter_by(
-        assigned_agent_id=current_user.id
-    ).filter(
-        Lead.status.in_(['assigned', 'callback'])
-    ).order_by(
-        db.case(
-            (Lead.status == 'callback', 1),
-            (Lead.status == 'assigned', 2),
-            else_=3
-        ),
-        Lead.assigned_date.desc()
-    ).all()
-    
-    if not leads:
+    # Position in the agent's calling queue (callbacks first, newest assignment first)
+    queue = queue_position(current_user.id)
+    
+    if not queue['total']:
         flash('No leads available for calling', 'info')
         return redirect(url_for('agent.my_leads'))
     
     # Get first lead to display
-    current_lead = leads[0]
-    lead_index = 0
-    total_leads = len(leads)
+    current_lead = Lead.query.get(queue['lead_id'])
+    if current_lead is None:
+        # Deleted since the queue was checked; start again from a fresh queue
+        invalidate_queues(current_user.id)
+        return redirect(url_for('agent.call_center'))
     # Assuming current_lead.project.name gives the project name
     current_lead_project = Project.query.filter_by(name=current_lead.project.name).first()
 
     # Get stats for dashboard
-    projects = Project.query.all()
-    assigned_leads = Lead.query.filter_by(assigned_agent_id=current_user.id).count()
-    completed_leads = Lead.query.filter_by(assigned_agent_id=current_user.id, status='completed').count()
-    pending_leads = Lead.query.filter_by(assigned_agent_id=current_user.id, status='assigned').count()
-    today = datetime.utcnow().date()
-    today_calls = CallLog.query.filter(
-        CallLog.agent_id == current_user.id,
-        db.func.date(CallLog.call_time) == today
-    ).count()
+    projects = reference_cache.get_projects()
+    stats = get_agent_counters(current_user.id)
     
     # Get other agents for reassignment
-    other_agents = User.query.filter(
-        User.role == UserRole.AGENT,
-        User.id != current_user.id,
-        User.is_active == True
-    ).all()
+    other_agents = reference_cache.get_other_active_agents(current_user.id)
     
     return render_template('agent/call_center.html',
-                         leads=leads,
                          current_lead=current_lead,
-                         lead_index=lead_index,
-                         total_leads=total_leads,
-                         assigned_leads=assigned_leads,
-                         completed_leads=completed_leads,
-                         pending_leads=pending_leads,
-                         today_calls=today_calls,
-                         other_agents=other_agents,projects=projects,current_lead_project=current_lead_project)
+                         lead_index=queue['index'],
+                         total_leads=queue['total'],
+                         prev_lead_id=queue['prev_lead_id'],
+                         next_lead_id=queue['next_lead_id'],
+                         other_agents=other_agents,projects=projects,current_lead_project=current_lead_project,
+                         **stats)
 
 @agent_bp.route('/call_lead/<int:lead_id>')
 @login_required
@@ -118,21 +89,8 @@ def call_lead(lead_id):
         flash('Lead not assigned to you', 'error')
         return redirect(url_for('agent.call_center'))
     
-    # Get all leads for navigation
-    leads = Lead.query.filter_by(
-        assigned_agent_id=current_user.id
-    ).filter(
-        Lead.status.in_(['assigned', 'callback'])
-    ).order_by(
-        db.case(
-            (Lead.status == 'callback', 1),
-            (Lead.status == 'assigned', 2),
-            else_=3
-        ),
-        Lead.assigned_date.desc()
-    ).all()
-    
-    current_index = next((i for i, l in enumerate(leads) if l.id == lead_id), 0)
+    # Position in the agent's calling queue for navigation
+    queue = queue_position(current_user.id, lead_id)
     
     # Create call log entry
     call_log = CallLog(
@@ -145,33 +103,20 @@ def call_lead(lead_id):
     db.session.commit()
     
     # Get stats
-    assigned_leads = Lead.query.filter_by(assigned_agent_id=current_user.id).count()
-    completed_leads = Lead.query.filter_by(assigned_agent_id=current_user.id, status='completed').count()
-    pending_leads = Lead.query.filter_by(assigned_agent_id=current_user.id, status='assigned').count()
-    today = datetime.utcnow().date()
-    today_calls = CallLog.query.filter(
-        CallLog.agent_id == current_user.id,
-        db.func.date(CallLog.call_time) == today
-    ).count()
+    stats = get_agent_counters(current_user.id)
     
     # Get other agents for reassignment
-    other_agents = User.query.filter(
-        User.role == UserRole.AGENT,
-        User.id != current_user.id,
-        User.is_active == True
-    ).all()
+    other_agents = reference_cache.get_other_active_agents(current_user.id)
     
     return render_template('agent/call_center.html',
-                         leads=leads,
                          current_lead=lead,
-                         lead_index=current_index,
-                         total_leads=len(leads),
+                         lead_index=queue['index'],
+                         total_leads=queue['total'],
+                         prev_lead_id=queue['prev_lead_id'],
+                         next_lead_id=queue['next_lead_id'],
                          call_log_id=call_log.id,
-                         assigned_leads=assigned_leads,
-                         completed_leads=completed_leads,
-                         pending_leads=pending_leads,
-                         today_calls=today_calls,
-                         other_agents=other_agents)
+                         other_agents=other_agents,
+                         **stats)
 
 @agent_bp.route('/update_call_status', methods=['POST'])
 @login_required
@@ -201,13 +146,14 @@ def update_call_status():
         'wrong_number': CallStatus.WRONG_NUMBER
     }
     
+    updates = {'end_time': datetime.utcnow()}
     if status in status_mapping:
-        call_log.status = status_mapping[status]
-    
-    call_log.end_time = datetime.utcnow()
+        updates['status'] = status_mapping[status]
     if duration_seconds:
-        call_log.duration_seconds = duration_seconds
+        updates['duration_seconds'] = duration_seconds
     
+    # Merged with the call's other updates and group-committed
+    queue_call_log_update(call_log, **updates)
     db.session.commit()
     
     return jsonify({'success': True})
@@ -242,12 +188,14 @@ def handle_call_action(lead_id):
                 'callback': CallStatus.CALLBACK_SCHEDULED
             }
             
+            updates = {'end_time': datetime.utcnow()}
             if action in action_mapping:
-                call_log.status = action_mapping[action]
-            
-            call_log.end_time = datetime.utcnow()
+                updates['status'] = action_mapping[action]
             if duration_seconds:
-                call_log.duration_seconds = duration_seconds
+                updates['duration_seconds'] = duration_seconds
+            
+            # Goes through the same buffer as update_call_status so updates stay in order
+            queue_call_log_update(call_log, **updates)
     
     response_data = {'success': True}
     
@@ -287,6 +235,9 @@ def handle_call_action(lead_id):
 @agent_bp.route('/submit_feedback/<int:lead_id>', methods=['POST'])
 @login_required
 def submit_feedback(lead_id):
+    # Long call recordings need more than the app-wide upload cap; set before the form is parsed
+    request.max_content_length = current_app.config['MAX_RECORDING_UPLOAD_LENGTH']
+
     if current_user.role != UserRole.AGENT:
         flash('Access denied!', 'error')
         return redirect(url_for('admin.dashboard'))
@@ -302,11 +253,8 @@ def submit_feedback(lead_id):
         recording = request.files['recording']
         if recording and recording.filename != '':
             if allowed_file(recording.filename, {'wav', 'mp3', 'm4a'}):
-                filename = secure_filename(f"{lead_id}_{int(datetime.now().timestamp())}.{recording.filename.rsplit('.', 1)[1].lower()}")
-                upload_dir = 'uploads/recordings'
-                os.makedirs(upload_dir, exist_ok=True)
-                recording_path = os.path.join(upload_dir, filename)
-                recording.save(recording_path)
+                stored = store_recording(recording.stream, recording.filename.rsplit('.', 1)[1].lower())
+                recording_path = stored.key
     
     # Get form data
     feedback_type = request.form.get('feedback_type')
@@ -370,6 +318,9 @@ def submit_feedback(lead_id):
     lead.updated_at = datetime.utcnow()
     db.session.add(feedback)
     db.session.commit()
+
+    if recording_path:
+        enqueue_recording(feedback.id)
     
     flash('Feedback submitted successfully!', 'success')
     return redirect(url_for('agent.call_center'))
@@ -410,6 +361,14 @@ def get_lead_details(lead_id):
     
     return jsonify(lead_data)
 
+@agent_bp.route('/api/stats')
+@login_required
+def api_stats():
+    if current_user.role != UserRole.AGENT:
+        return jsonify({'error': 'Access denied'}), 403
+
+    return jsonify(get_agent_counters(current_user.id))
+
 @agent_bp.route('/my_leads')
 @login_required
 def my_leads():
@@ -418,11 +377,7 @@ def my_leads():
         return redirect(url_for('admin.dashboard'))
     
     leads = Lead.query.filter_by(assigned_agent_id=current_user.id).all()
-    other_agents = User.query.filter(
-        User.role == UserRole.AGENT,
-        User.id != current_user.id,
-        User.is_active == True
-    ).all()
+    other_agents = reference_cache.get_other_active_agents(current_user.id)
     
     return render_template('agent/my_leads.html', leads=leads, other_agents=other_agents)
 
@@ -481,41 +436,14 @@ def feedback_history(lead_id):
         flash('Lead not found or not assigned to you', 'error')
         return redirect(url_for('agent.my_leads'))
 
-    feedbacks = LeadFeedback.query.filter_by(lead_id=lead_id).all()
-    call_logs = CallActivityLog.query.filter_by(lead_id=lead_id).order_by(CallActivityLog.created_at.desc()).all()
-
-    # Group by call_log_id (include all call sessions even if no feedback)
-    grouped = {}
-
-    for log in call_logs:
-        grouped.setdefault(log.call_log_id, {
-            'call_log_id': log.call_log_id,
-            'call_logs': [],
-            'feedbacks': [],
-            'latest_time': log.created_at
-        })
-        grouped[log.call_log_id]['call_logs'].append(log)
-        if log.created_at > grouped[log.call_log_id]['latest_time']:
-            grouped[log.call_log_id]['latest_time'] = log.created_at
-
-    for fb in feedbacks:
-        if fb.call_activity_id:
-            grouped.setdefault(fb.call_activity_id, {
-                'call_log_id': fb.call_activity_id,
-                'call_logs': [],
-                'feedbacks': [],
-                'latest_time': fb.created_at
-            })
-            grouped[fb.call_activity_id]['feedbacks'].append(fb)
-            if fb.created_at > grouped[fb.call_activity_id]['latest_time']:
-                grouped[fb.call_activity_id]['latest_time'] = fb.created_at
-
-    call_activity_data = sorted(grouped.values(), key=lambda x: x['latest_time'], reverse=True)
+    # Call sessions (activity logs + feedback), grouped in SQL and paged by session
+    timeline = timeline_page(lead.id, page=request.args.get('sessions_page', 1, type=int))
 
     return render_template(
         'agent/feedback_history.html',
         lead=lead,
-        call_activity_data=call_activity_data
+        timeline=timeline,
+        call_activity_data=timeline['sessions']
     )
 
 @agent_bp.route('/all_feedback')
@@ -539,6 +467,16 @@ def all_feedback():
 def feedback_history_default():
     return redirect(url_for('agent.all_feedback'))
 
+@agent_bp.route('/recordings/<int:feedback_id>')
+@login_required
+def download_recording(feedback_id):
+    feedback = LeadFeedback.query.get_or_404(feedback_id)
+    if current_user.role == UserRole.AGENT and feedback.agent_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    if not feedback.recording_path:
+        return jsonify({'error': 'No recording for this feedback'}), 404
+    return send_recording(feedback.recording_path)
+
 # Additional utility routes
 @agent_bp.route('/get_next_lead/<int:current_lead_id>')
 @login_required
@@ -547,30 +485,29 @@ def get_next_lead(current_lead_id):
         return jsonify({'error': 'Access denied'}), 403
     
     # Get next lead in sequence
-    leads = Lead.query.filter_by(
-        assigned_agent_id=current_user.id
-    ).filter(
-        Lead.status.in_(['assigned', 'callback'])
-    ).order_by(
-        db.case(
-            (Lead.status == 'callback', 1),
-            (Lead.status == 'assigned', 2),
-            else_=3
-        ),
-        Lead.assigned_date.desc()
-    ).all()
-    
-    current_index = next((i for i, l in enumerate(leads) if l.id == current_lead_id), -1)
-    
-    if current_index < len(leads) - 1:
-        next_lead = leads[current_index + 1]
+    next_lead_id = queue_position(current_user.id, current_lead_id)['next_lead_id']
+    
+    if next_lead_id:
         return jsonify({
-            'next_lead_id': next_lead.id,
-            'next_lead_url': url_for('agent.call_lead', lead_id=next_lead.id)
+            'next_lead_id': next_lead_id,
+            'next_lead_url': url_for('agent.call_lead', lead_id=next_lead_id)
         })
     else:
         return jsonify({'next_lead_id': None, 'message': 'No more leads'})
 
+@agent_bp.route('/api/queue')
+@login_required
+def api_queue():
+    """Queue position and neighbours for a lead (or the head of the queue)"""
+    if current_user.role != UserRole.AGENT:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    queue = queue_position(current_user.id, request.args.get('lead_id', type=int))
+    for key in ('first', 'prev', 'next'):
+        lead_id = queue[f'{key}_lead_id']
+        queue[f'{key}_lead_url'] = url_for('agent.call_lead', lead_id=lead_id) if lead_id else None
+    return jsonify(queue)
+
 @agent_bp.route('/add_frontend_log', methods=['POST'])
 @login_required
 def add_frontend_log():
@@ -597,9 +534,30 @@ def add_frontend_log():
     db.session.commit()
 
     print(f"[{timestamp}] Lead {lead_id} | Agent {agent_id} | {log_type.upper()} - {message}")
+    ACTIVITY_EVENTS.inc(result='accepted')
 
     return jsonify(success=True, log=new_log.to_dict())
 
+@agent_bp.route('/add_frontend_logs', methods=['POST'])
+@login_required
+def add_frontend_logs():
+    """Batch variant of add_frontend_log; rows are group-committed in the background"""
+    data = request.get_json(silent=True)
+    events = data.get('events') if isinstance(data, dict) else data
+    
+    if not isinstance(events, list):
+        return jsonify(success=False, message="Expected a list of events"), 400
+    if len(events) > MAX_EVENTS_PER_REQUEST:
+        return jsonify(success=False, message=f"At most {MAX_EVENTS_PER_REQUEST} events per request"), 413
+    
+    rows, rejected = build_activity_rows(current_user.id, events)
+    if rows:
+        enqueue_activity_logs(rows)
+    ACTIVITY_EVENTS.inc(len(rows), result='accepted')
+    ACTIVITY_EVENTS.inc(rejected, result='rejected')
+    
+    return jsonify(success=True, accepted=len(rows), rejected=rejected), 202
+
 
 
 @agent_bp.route('/send_to_crm_proxy', methods=['POST'])
@@ -630,48 +588,44 @@ def send_to_crm_proxy():
             "project_name": data["project"]
         }
 
-        # Send to CRM
-        resp = requests.post(
-            "https://valueproperties.tranquilcrmone.in/wordpresswebhook",
-            data=webhook_data,
-            timeout=25
-        )
-
-        # Optional: log the CRM send safely
-        try:
-            lead_id = data.get("lead_id")
-            agent_id = data.get("agent_id", current_user.id)
-            if lead_id:
-                message = f"Sent lead to CRM: {data['name']} | {data['mobile']}"
-                new_log = CallActivityLog(
-                    agent_id=agent_id,
-                    lead_id=lead_id,
-                    message=message,
-                    type="crm"
-                )
-                db.session.add(new_log)
-                db.session.commit()
-        except Exception as e:
-            # Logging failed, but do not block CRM send
-            print(f"[CRM Logging Error] Could not log CRM send: {e}")
-
-        # Return response to frontend
-        if resp.ok:
-            return jsonify(success=True, message="Lead sent to CRM successfully"), 200
-        else:
-            return jsonify(success=False, message=f"CRM Error: {resp.text}"), 500
+        # Queue for the background CRM worker instead of waiting on the webhook here
+        lead_id = data.get("lead_id")
+        entry = enqueue_crm_delivery(webhook_data, lead_id=lead_id, agent_id=current_user.id)
+
+        return jsonify(
+            success=True,
+            message="Lead queued for CRM delivery",
+            delivery_id=entry.id,
+            status_url=url_for('agent.crm_delivery_status', delivery_id=entry.id)
+        ), 202
 
     except Exception as e:
         # Catch-all error handling
+        db.session.rollback()
         return jsonify(success=False, message=f"Exception: {str(e)}"), 500
+
+@agent_bp.route('/api/crm_deliveries/<int:delivery_id>')
+@login_required
+def crm_delivery_status(delivery_id):
+    entry = CrmOutbox.query.get(delivery_id)
+    if not entry or (entry.agent_id != current_user.id and current_user.role != UserRole.ADMIN):
+        return jsonify({'error': 'Delivery not found'}), 404
+
+    return jsonify(entry.to_dict())
+
+def reference_response(name, fields):
+    """Cached reference data as JSON, answering 304 when the client's ETag still matches"""
+    data, etag = reference_cache.get_reference(name)
+    response = jsonify([{key: item[field] for key, field in fields.items()} for item in data])
+    response.set_etag(etag)
+    # Browsers keep the body but revalidate on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 @agent_bp.route('/api/projects')
 def get_projects():
-    projects = Project.query.order_by(Project.name).all()
-    data = [{"id": p.project_id, "name": p.name} for p in projects]
-    return jsonify(data)
+    return reference_response('projects', {'id': 'project_id', 'name': 'name'})
 
 @agent_bp.route('/api/locations')
 def get_locations():
-    locations = Location.query.order_by(Location.name).all()
-    data = [{"id": l.id, "name": l.name} for l in locations]
-    return jsonify(data)
\ No newline at end of file
+    return reference_response('locations', {'id': 'id', 'name': 'name'})
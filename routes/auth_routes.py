@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
 from models import db, User, UserRole
 
 auth_bp = Blueprint('auth', __name__)
@@ -50,4 +51,8 @@ def create_admin_user():
             role=UserRole.ADMIN
         )
         db.session.add(admin)
-        db.session.commit()
\ No newline at end of file
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker booting at the same time created it first
+            db.session.rollback()
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Batched ingestion of call-center activity events (CallActivityLog)."""
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from models import db, CallActivityLog
+from services.write_behind import WriteBehindBuffer
+
+MAX_EVENTS_PER_REQUEST = 500
+MAX_MESSAGE_LENGTH = 500
+# Client timestamps older than this (or in the future) fall back to receipt time
+MAX_EVENT_AGE = timedelta(hours=1)
+
+
+def _insert_activity_logs(rows):
+    db.session.execute(db.insert(CallActivityLog), rows)
+
+
+activity_log_buffer = WriteBehindBuffer('call_activity_logs', _insert_activity_logs)
+
+
+def _event_time(value, received_at):
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return received_at
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if received_at - MAX_EVENT_AGE <= parsed <= received_at:
+        return parsed
+    return received_at
+
+
+def build_activity_rows(agent_id, events):
+    """Validate raw event dicts; returns (rows, number of rejected events)"""
+    received_at = datetime.utcnow()
+    rows, rejected = [], 0
+    for event in events:
+        if not isinstance(event, dict) or not event.get('lead_id') or not event.get('message'):
+            rejected += 1
+            continue
+        try:
+            lead_id = int(event['lead_id'])
+        except (TypeError, ValueError):
+            rejected += 1
+            continue
+        call_log_id = event.get('call_log_id')
+        rows.append({
+            'agent_id': agent_id,
+            'lead_id': lead_id,
+            'call_log_id': str(call_log_id) if call_log_id is not None else None,
+            'message': str(event['message'])[:MAX_MESSAGE_LENGTH],
+            'type': str(event.get('type') or 'info')[:50],
+            'created_at': _event_time(event.get('timestamp'), received_at),
+        })
+    return rows, rejected
+
+
+def enqueue_activity_logs(rows):
+    """Hand validated rows to the write-behind buffer for group commit"""
+    app = current_app._get_current_object()
+    activity_log_buffer.configure(max_batch=app.config.get('ACTIVITY_LOG_BATCH_SIZE'),
+                                  max_latency=app.config.get('ACTIVITY_LOG_FLUSH_INTERVAL'))
+    return activity_log_buffer.submit(app, rows)
@@ -0,0 +1,58 @@
+"""Agent performance aggregates built from per-table pre-aggregated subqueries."""
+from models import db, User, UserRole, Lead, LeadFeedback, CallLog
+
+
+def _lead_totals():
+    return db.session.query(
+        Lead.assigned_agent_id.label('agent_id'),
+        db.func.count(Lead.id).label('total_leads')
+    ).filter(Lead.assigned_agent_id.isnot(None))\
+     .group_by(Lead.assigned_agent_id)\
+     .subquery('lead_totals')
+
+
+def _feedback_totals():
+    return db.session.query(
+        LeadFeedback.agent_id.label('agent_id'),
+        db.func.count(LeadFeedback.id).label('total_feedbacks')
+    ).group_by(LeadFeedback.agent_id)\
+     .subquery('feedback_totals')
+
+
+def _call_totals():
+    return db.session.query(
+        CallLog.agent_id.label('agent_id'),
+        db.func.count(CallLog.id).label('total_calls'),
+        db.func.avg(CallLog.duration_seconds).label('avg_call_duration')
+    ).group_by(CallLog.agent_id)\
+     .subquery('call_totals')
+
+
+def get_agent_performance(active_only=True):
+    """
+    Per-agent lead, feedback and call aggregates.
+
+    Each fact table is grouped by agent on its own and the small per-agent
+    results are joined to User, so no leads x feedbacks x calls product is
+    ever formed and every count is exact.
+    """
+    leads = _lead_totals()
+    feedbacks = _feedback_totals()
+    calls = _call_totals()
+
+    query = db.session.query(
+        User.id.label('agent_id'),
+        User.username,
+        db.func.coalesce(leads.c.total_leads, 0).label('total_leads'),
+        db.func.coalesce(feedbacks.c.total_feedbacks, 0).label('total_feedbacks'),
+        db.func.coalesce(calls.c.total_calls, 0).label('total_calls'),
+        calls.c.avg_call_duration
+    ).outerjoin(leads, leads.c.agent_id == User.id)\
+     .outerjoin(feedbacks, feedbacks.c.agent_id == User.id)\
+     .outerjoin(calls, calls.c.agent_id == User.id)\
+     .filter(User.role == UserRole.AGENT)
+
+    if active_only:
+        query = query.filter(User.is_active == True)
+
+    return query.order_by(User.username).all()
@@ -0,0 +1,108 @@
+"""Per-agent lead, feedback and call counters computed with grouped aggregate queries."""
+from datetime import datetime, timedelta
+
+from models import db, Lead, LeadFeedback, CallLog, CallStatus, FeedbackType
+
+
+def today_range(now=None):
+    """[start, end) of the current UTC day, so call_time filters stay index-friendly"""
+    start = datetime.combine((now or datetime.utcnow()).date(), datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def _count_where(condition):
+    return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+
+
+def get_agent_counters(agent_id):
+    """
+    Return assigned/completed/pending/interested lead counts and today's calls
+    for one agent. Lead counters use conditional aggregation over the agent's
+    leads and today's calls ride along as a scalar subquery: one round trip.
+    """
+    day_start, day_end = today_range()
+    today_calls = db.session.query(db.func.count(CallLog.id))\
+        .filter(CallLog.agent_id == agent_id,
+                CallLog.call_time >= day_start,
+                CallLog.call_time < day_end)\
+        .scalar_subquery()
+
+    row = db.session.query(
+        db.func.count(Lead.id).label('assigned_leads'),
+        _count_where(Lead.status == 'completed').label('completed_leads'),
+        _count_where(Lead.status == 'assigned').label('pending_leads'),
+        _count_where(Lead.status == 'interested').label('interested_leads'),
+        today_calls.label('today_calls')
+    ).filter(Lead.assigned_agent_id == agent_id).one()
+
+    return {
+        'assigned_leads': row.assigned_leads,
+        'completed_leads': row.completed_leads,
+        'pending_leads': row.pending_leads,
+        'interested_leads': row.interested_leads,
+        'today_calls': row.today_calls
+    }
+
+
+EMPTY_AGENT_STATS = {
+    'assigned_leads': 0,
+    'completed_leads': 0,
+    'pending_leads': 0,
+    'interested_leads': 0,
+    'total_feedbacks': 0,
+    'interested_feedbacks': 0,
+    'total_calls': 0,
+    'completed_calls': 0,
+    'today_calls': 0,
+    'week_calls': 0,
+}
+
+
+def get_agent_stats_batch(agent_ids):
+    """
+    Return {agent_id: stats} for many agents in three grouped queries
+    (leads, feedbacks, calls), independent of how many agents are asked for.
+    """
+    agent_ids = list(agent_ids)
+    stats = {agent_id: dict(EMPTY_AGENT_STATS) for agent_id in agent_ids}
+    if not agent_ids:
+        return stats
+
+    day_start, day_end = today_range()
+    week_ago = datetime.utcnow() - timedelta(days=7)
+
+    lead_rows = db.session.query(
+        Lead.assigned_agent_id,
+        db.func.count(Lead.id).label('assigned_leads'),
+        _count_where(Lead.status == 'completed').label('completed_leads'),
+        _count_where(Lead.status == 'assigned').label('pending_leads'),
+        _count_where(Lead.status == 'interested').label('interested_leads')
+    ).filter(Lead.assigned_agent_id.in_(agent_ids))\
+     .group_by(Lead.assigned_agent_id)\
+     .all()
+
+    feedback_rows = db.session.query(
+        LeadFeedback.agent_id,
+        db.func.count(LeadFeedback.id).label('total_feedbacks'),
+        _count_where(LeadFeedback.feedback_type == FeedbackType.INTERESTED).label('interested_feedbacks')
+    ).filter(LeadFeedback.agent_id.in_(agent_ids))\
+     .group_by(LeadFeedback.agent_id)\
+     .all()
+
+    call_rows = db.session.query(
+        CallLog.agent_id,
+        db.func.count(CallLog.id).label('total_calls'),
+        _count_where(CallLog.status == CallStatus.COMPLETED).label('completed_calls'),
+        _count_where(db.and_(CallLog.call_time >= day_start, CallLog.call_time < day_end)).label('today_calls'),
+        _count_where(CallLog.call_time >= week_ago).label('week_calls')
+    ).filter(CallLog.agent_id.in_(agent_ids))\
+     .group_by(CallLog.agent_id)\
+     .all()
+
+    for rows in (lead_rows, feedback_rows, call_rows):
+        for row in rows:
+            values = row._asdict()
+            agent_id = values.pop(row._fields[0])
+            stats[agent_id].update(values)
+
+    return stats
@@ -0,0 +1,69 @@
+"""Coalesced, group-committed CallLog updates.
+
+A call touches its CallLog three or four times in quick succession (status
+"active", manual end, outcome), each previously its own commit. Updates are
+merged per call log and written in batches by a write-behind flusher:
+
+- ``CALL_LOG_WRITE_MAX_LATENCY``: seconds an update may wait before it is
+  committed (0 writes through synchronously inside the request)
+- ``CALL_LOG_WRITE_MAX_BATCH``: call logs per commit; a full batch is flushed
+  immediately
+
+The flusher applies updates through the ORM, so the report rollups and
+dialer queue listeners see them like any other flush.
+
+Under several workers the manual end and the outcome of one call can sit in
+different buffers and commit in either order, so a manual end never
+overwrites an outcome already recorded: its status and end time are dropped
+and it only fills fields that are still empty. The rows are read with
+``FOR UPDATE`` (PostgreSQL; SQLite serialises writers anyway), so the check
+and the write cannot interleave with another worker's flush.
+"""
+from flask import current_app
+
+from models import CallLog, CallStatus
+from services.write_behind import WriteBehindBuffer
+
+# Statuses a manual end must not replace
+OUTCOME_STATUSES = frozenset(CallStatus) - {CallStatus.INITIATED, CallStatus.ENDED_MANUAL}
+
+
+def _is_late_manual_end(current_status, fields):
+    return current_status in OUTCOME_STATUSES and fields.get('status') == CallStatus.ENDED_MANUAL
+
+
+def _merge_pending(pending, fields):
+    if _is_late_manual_end(pending.get('status'), fields):
+        fields = {field: value for field, value in fields.items() if field not in pending and field != 'status'}
+    pending.update(fields)
+
+
+def _apply_fields(call_log, fields):
+    if _is_late_manual_end(call_log.status, fields):
+        fields = {field: value for field, value in fields.items()
+                  if field != 'status' and getattr(call_log, field) is None}
+    for field, value in fields.items():
+        setattr(call_log, field, value)
+
+
+def _apply_updates(batch):
+    updates = dict(batch)
+    for call_log in CallLog.query.filter(CallLog.id.in_(list(updates))).with_for_update().all():
+        _apply_fields(call_log, updates[call_log.id])
+
+
+call_log_buffer = WriteBehindBuffer('call_log_updates', _apply_updates, coalesce=True, merge=_merge_pending)
+
+
+def queue_call_log_update(call_log, **fields):
+    """Record ``fields`` for ``call_log``; committed within the configured max latency"""
+    app = current_app._get_current_object()
+    max_latency = app.config.get('CALL_LOG_WRITE_MAX_LATENCY', 0.2)
+    if max_latency <= 0:
+        _apply_fields(call_log, fields)
+        return False
+
+    call_log_buffer.configure(max_batch=app.config.get('CALL_LOG_WRITE_MAX_BATCH'),
+                              max_latency=max_latency)
+    call_log_buffer.submit(app, [(call_log.id, fields)])
+    return True
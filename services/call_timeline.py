@@ -0,0 +1,105 @@
+"""Call-session timeline for a lead: activity logs and feedback grouped by call session.
+
+A session is every ``CallActivityLog`` sharing a ``call_log_id`` plus every
+``LeadFeedback`` whose ``call_activity_id`` matches it; sessions are listed
+newest activity first. The session index (id and latest timestamp per session)
+is one ``UNION ALL ... GROUP BY`` query, cached per lead in this worker; the
+logs and feedback are then fetched only for the sessions on the requested page.
+
+The cache entry is stamped with the lead's row counts and highest ids in both
+tables, read from the ``lead_id`` indexes on every call, so a new log or
+feedback from any worker (including the activity-log write-behind buffer)
+rebuilds the index on the next view.
+"""
+from sqlalchemy import select, union_all, func, or_
+
+from models import db, CallActivityLog, LeadFeedback
+from services.reference_cache import TTLCache
+
+DEFAULT_SESSIONS_PER_PAGE = 20
+
+_index_cache = TTLCache(maxsize=512, ttl=600)
+
+
+def activity_stamp(lead_id):
+    """(log count, max log id, feedback count, max feedback id) for the lead"""
+    def scalar(aggregate, model):
+        return select(aggregate(model.id)).where(model.lead_id == lead_id).scalar_subquery()
+
+    return tuple(db.session.execute(select(
+        scalar(func.count, CallActivityLog), scalar(func.max, CallActivityLog),
+        scalar(func.count, LeadFeedback), scalar(func.max, LeadFeedback),
+    )).one())
+
+
+def _build_session_index(lead_id):
+    logs = select(CallActivityLog.call_log_id.label('session_id'), CallActivityLog.created_at.label('at'))\
+        .where(CallActivityLog.lead_id == lead_id)
+    feedbacks = select(LeadFeedback.call_activity_id.label('session_id'), LeadFeedback.created_at.label('at'))\
+        .where(LeadFeedback.lead_id == lead_id, LeadFeedback.call_activity_id.isnot(None))
+    events = union_all(logs, feedbacks).subquery()
+    latest = func.max(events.c.at).label('latest')
+    rows = db.session.execute(
+        select(events.c.session_id, latest)
+        .group_by(events.c.session_id)
+        .order_by(latest.desc(), events.c.session_id)
+    )
+    return [(row.session_id, row.latest) for row in rows]
+
+
+def session_index(lead_id):
+    """Cached ``[(session_id, latest_time), ...]`` plus the activity stamp"""
+    stamp = activity_stamp(lead_id)
+    cached = _index_cache.get(lead_id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], stamp
+    index = _build_session_index(lead_id)
+    _index_cache.set(lead_id, (stamp, index))
+    return index, stamp
+
+
+def _in_sessions(column, session_ids):
+    known = [session_id for session_id in session_ids if session_id is not None]
+    condition = column.in_(known)
+    return or_(condition, column.is_(None)) if None in session_ids else condition
+
+
+def iter_sessions(lead_id, sessions):
+    """Yield session dicts for ``[(session_id, latest_time), ...]`` in that order"""
+    session_ids = [session_id for session_id, _ in sessions]
+    if not session_ids:
+        return
+
+    logs = CallActivityLog.query\
+        .filter(CallActivityLog.lead_id == lead_id, _in_sessions(CallActivityLog.call_log_id, session_ids))\
+        .order_by(CallActivityLog.created_at.desc())
+    feedbacks = LeadFeedback.query\
+        .filter(LeadFeedback.lead_id == lead_id, LeadFeedback.call_activity_id.isnot(None),
+                _in_sessions(LeadFeedback.call_activity_id, session_ids))\
+        .order_by(LeadFeedback.id)
+
+    grouped = {session_id: {'call_log_id': session_id, 'call_logs': [], 'feedbacks': [], 'latest_time': latest}
+               for session_id, latest in sessions}
+    for log in logs:
+        grouped[log.call_log_id]['call_logs'].append(log)
+    for feedback in feedbacks:
+        grouped[feedback.call_activity_id]['feedbacks'].append(feedback)
+    for session_id in session_ids:
+        yield grouped[session_id]
+
+
+def timeline_page(lead_id, page=1, per_page=DEFAULT_SESSIONS_PER_PAGE):
+    """One page of call sessions for the lead, newest first"""
+    index, stamp = session_index(lead_id)
+    total = len(index)
+    pages = max(1, -(-total // per_page))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * per_page
+    return {
+        'sessions': list(iter_sessions(lead_id, index[start:start + per_page])),
+        'total': total,
+        'page': page,
+        'pages': pages,
+        'call_log_count': stamp[0],
+        'feedback_count': stamp[2],
+    }
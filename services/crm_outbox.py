@@ -0,0 +1,198 @@
+"""Outbox-based delivery of leads to the CRM webhook.
+
+``send_to_crm_proxy`` only writes a ``crm_outbox`` row; a background thread
+per worker process claims due rows in batches and posts them over a pooled
+HTTP client (``services.http_client``). Failures are retried with exponential backoff and jitter until
+``CRM_MAX_ATTEMPTS``; 4xx rejections (other than 408/429) and exhausted
+retries end in the ``dead`` state, from which an admin can requeue them.
+
+Rows are claimed with a conditional UPDATE, so several gunicorn workers can
+run the loop at once without double-sending; a claim older than
+``CRM_CLAIM_TIMEOUT`` seconds (a worker died mid-send) is picked up again.
+The loop starts with the first request each worker process serves (see
+``init_crm_outbox``), so retries left over from before a deploy or restart
+drain without new CRM traffic; ``flask deliver-crm`` drains the outbox from
+the command line.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+from flask import current_app
+
+from models import db, CrmOutbox, CallActivityLog
+from services.http_client import get_client
+from services.metrics import CRM_DELIVERIES, CRM_DELIVERY_SECONDS
+
+RETRYABLE_CLIENT_ERRORS = {408, 429}
+
+_worker = {'thread': None, 'pid': None}
+_worker_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+# -----------------------------
+# Producer side
+# -----------------------------
+def enqueue_crm_delivery(payload, lead_id=None, agent_id=None):
+    """Store the webhook payload in the outbox and make sure a worker is running"""
+    entry = CrmOutbox(lead_id=lead_id, agent_id=agent_id, payload=json.dumps(payload),
+                      next_attempt_at=datetime.utcnow())
+    db.session.add(entry)
+    db.session.commit()
+    start_crm_worker(current_app._get_current_object())
+    _wakeup.set()
+    return entry
+
+
+def retry_dead_delivery(entry):
+    entry.status = 'pending'
+    entry.attempts = 0
+    entry.next_attempt_at = datetime.utcnow()
+    entry.last_error = None
+    db.session.commit()
+    start_crm_worker(current_app._get_current_object())
+    _wakeup.set()
+
+
+def outbox_summary():
+    counts = dict(db.session.query(CrmOutbox.status, db.func.count(CrmOutbox.id))
+                  .group_by(CrmOutbox.status).all())
+    oldest = db.session.query(db.func.min(CrmOutbox.created_at))\
+        .filter(CrmOutbox.status.in_(['pending', 'sending'])).scalar()
+    return {
+        'counts': {status: counts.get(status, 0) for status in ('pending', 'sending', 'delivered', 'dead')},
+        'oldest_undelivered_at': oldest.isoformat() if oldest else None,
+    }
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+def backoff_seconds(attempts, base, cap):
+    """Exponential backoff, jittered into [delay / 2, delay]"""
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return delay / 2 + random.random() * delay / 2
+
+
+def claim_batch(worker_id, batch_size, claim_timeout):
+    """Atomically mark up to ``batch_size`` due rows as ours; returns them"""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=claim_timeout)
+    due = db.session.query(CrmOutbox.id).filter(
+        db.or_(
+            db.and_(CrmOutbox.status == 'pending', CrmOutbox.next_attempt_at <= now),
+            db.and_(CrmOutbox.status == 'sending', CrmOutbox.claimed_at < stale),
+        )
+    ).order_by(CrmOutbox.next_attempt_at).limit(batch_size)
+    ids = [row.id for row in due]
+    if not ids:
+        return []
+
+    # The status/claimed_at guard makes the claim a no-op if another worker won the race
+    db.session.query(CrmOutbox).filter(
+        CrmOutbox.id.in_(ids),
+        db.or_(CrmOutbox.status == 'pending',
+               db.and_(CrmOutbox.status == 'sending', CrmOutbox.claimed_at < stale)),
+    ).update({'status': 'sending', 'claimed_by': worker_id, 'claimed_at': now}, synchronize_session=False)
+    db.session.commit()
+    return CrmOutbox.query.filter(CrmOutbox.claimed_by == worker_id, CrmOutbox.status == 'sending').all()
+
+
+def _post(config, payload):
+    return get_client('crm').post(config['CRM_WEBHOOK_URL'], data=payload, timeout=config.get('CRM_TIMEOUT', 10))
+
+
+def deliver(entry, config):
+    """Send one claimed row and record the outcome (caller commits)"""
+    payload = json.loads(entry.payload)
+    entry.attempts += 1
+    entry.claimed_by = None
+    started = time.perf_counter()
+    try:
+        resp = _post(config, payload)
+        CRM_DELIVERY_SECONDS.observe(time.perf_counter() - started)
+        entry.response_status = resp.status_code
+        if resp.ok:
+            CRM_DELIVERIES.inc(outcome='delivered')
+            entry.status = 'delivered'
+            entry.delivered_at = datetime.utcnow()
+            entry.last_error = None
+            if entry.lead_id and entry.agent_id:
+                db.session.add(CallActivityLog(
+                    agent_id=entry.agent_id,
+                    lead_id=entry.lead_id,
+                    message=f"Sent lead to CRM: {payload.get('name')} | {payload.get('mobile')}",
+                    type='crm'
+                ))
+            return
+        error = f"HTTP {resp.status_code}: {resp.text[:500]}"
+        permanent = 400 <= resp.status_code < 500 and resp.status_code not in RETRYABLE_CLIENT_ERRORS
+    except requests.RequestException as e:
+        error = f"{type(e).__name__}: {e}"
+        permanent = False
+
+    entry.last_error = error
+    if permanent or entry.attempts >= config.get('CRM_MAX_ATTEMPTS', 8):
+        CRM_DELIVERIES.inc(outcome='dead')
+        entry.status = 'dead'
+        print(f"[CRM Outbox] delivery {entry.id} dead after {entry.attempts} attempts: {error}")
+    else:
+        CRM_DELIVERIES.inc(outcome='retry')
+        entry.status = 'pending'
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(
+            entry.attempts, config.get('CRM_BACKOFF_BASE', 2), config.get('CRM_BACKOFF_MAX', 600)))
+
+
+def process_batch(worker_id=None):
+    """Claim and deliver one batch; returns how many rows were attempted"""
+    config = current_app.config
+    worker_id = worker_id or uuid.uuid4().hex
+    batch = claim_batch(worker_id, config.get('CRM_BATCH_SIZE', 20), config.get('CRM_CLAIM_TIMEOUT', 300))
+    for entry in batch:
+        deliver(entry, config)
+        db.session.commit()
+    return len(batch)
+
+
+def _run(app):
+    worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    poll_interval = app.config.get('CRM_POLL_INTERVAL', 2)
+    while True:
+        with app.app_context():
+            try:
+                attempted = process_batch(worker_id)
+            except Exception as e:
+                db.session.rollback()
+                attempted = 0
+                print(f"[CRM Outbox] worker error: {e}")
+            finally:
+                db.session.remove()
+        if not attempted:
+            _wakeup.wait(poll_interval)
+            _wakeup.clear()
+
+
+def start_crm_worker(app):
+    # Like the write-behind flusher, each forked gunicorn worker starts its own thread
+    thread = _worker['thread']
+    if thread is not None and thread.is_alive() and _worker['pid'] == os.getpid():
+        return
+    with _worker_lock:
+        thread = _worker['thread']
+        if thread is None or not thread.is_alive() or _worker['pid'] != os.getpid():
+            thread = threading.Thread(target=_run, args=(app,), name='crm-outbox', daemon=True)
+            _worker.update(thread=thread, pid=os.getpid())
+            thread.start()
+
+
+def init_crm_outbox(app):
+    """Start this worker's delivery loop on its first request"""
+    @app.before_request
+    def _ensure_crm_worker():
+        start_crm_worker(app)
@@ -0,0 +1,136 @@
+"""Schema migration (missing columns and indexes) and EXPLAIN-based plan checker for the hot lookup queries."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateColumn
+
+from models import db, Lead, LeadFeedback, CallLog, CallActivityLog
+
+
+# -----------------------------
+# Migration
+# -----------------------------
+def find_duplicate_mobiles(limit=10):
+    """Return (mobile, count) pairs that would block the unique mobile index"""
+    return db.session.query(Lead.mobile, db.func.count(Lead.id))\
+        .group_by(Lead.mobile)\
+        .having(db.func.count(Lead.id) > 1)\
+        .limit(limit)\
+        .all()
+
+
+def add_missing_columns():
+    """
+    Add every column declared on the models that is missing from an existing table.
+
+    ``db.create_all()`` never alters existing tables, so deployments run this
+    after upgrading. It is idempotent; returns the added ``table.column`` names.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}')
+            added.append(f'{table.name}.{column.name}')
+
+    return added
+
+
+def migrate_lookup_indexes():
+    """
+    Create every index declared on the models that is missing from the database.
+
+    ``db.create_all()`` only builds indexes for brand-new tables, so existing
+    deployments run this once. It is idempotent. The unique mobile index is
+    skipped (and reported) while duplicate mobiles remain.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    created, skipped = [], []
+
+    for table in db.metadata.sorted_tables:
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name in existing:
+                continue
+            if index.name == 'uq_lead_mobile':
+                duplicates = find_duplicate_mobiles()
+                if duplicates:
+                    skipped.append((index.name, f'{len(duplicates)}+ duplicate mobiles, e.g. {duplicates[0][0]}'))
+                    continue
+            index.create(bind=db.engine)
+            created.append(index.name)
+
+    return {'created': created, 'skipped': skipped}
+
+
+# -----------------------------
+# Plan checker
+# -----------------------------
+def key_queries(agent_id=1, lead_id=1):
+    """The lookups every dashboard / dialer request depends on, in route shape"""
+    day_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+
+    return {
+        'agent calling queue': select(Lead.id).where(
+            Lead.assigned_agent_id == agent_id,
+            Lead.status.in_(['assigned', 'callback'])
+        ).order_by(Lead.assigned_date.desc()),
+        'agent lead counters': select(db.func.count(Lead.id)).where(
+            Lead.assigned_agent_id == agent_id,
+            Lead.status == 'completed'
+        ),
+        'lead by status': select(db.func.count(Lead.id)).where(Lead.status == 'new'),
+        'lead by mobile': select(Lead.id).where(Lead.mobile == '9999999999'),
+        'agent calls today': select(db.func.count(CallLog.id)).where(
+            CallLog.agent_id == agent_id,
+            CallLog.call_time >= day_start,
+            CallLog.call_time < day_end
+        ),
+        'agent recent calls': select(CallLog.id).where(
+            CallLog.agent_id == agent_id
+        ).order_by(CallLog.call_time.desc()).limit(5),
+        'agent feedbacks': select(LeadFeedback.id).where(
+            LeadFeedback.agent_id == agent_id
+        ).order_by(LeadFeedback.created_at.desc()),
+        'lead feedbacks': select(LeadFeedback.id).where(LeadFeedback.lead_id == lead_id),
+        'lead activity log': select(CallActivityLog.id).where(
+            CallActivityLog.lead_id == lead_id
+        ).order_by(CallActivityLog.created_at.desc()),
+    }
+
+
+def _explain(statement):
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+        plan = [row[-1] for row in rows]
+        scans = [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+    else:
+        # Tiny tables always favour a seq scan; ask whether an index is usable at all
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        rows = db.session.execute(text(f'EXPLAIN {sql}')).all()
+        plan = [row[0] for row in rows]
+        scans = [line.strip() for line in plan if 'Seq Scan' in line]
+    return plan, scans
+
+
+def check_query_plans():
+    """EXPLAIN each key query and flag the ones that fall back to a full table scan"""
+    report = []
+    try:
+        for name, statement in key_queries().items():
+            plan, scans = _explain(statement)
+            report.append({'query': name, 'plan': plan, 'full_scans': scans, 'ok': not scans})
+    finally:
+        db.session.rollback()
+    return report
@@ -0,0 +1,50 @@
+"""Read/write session routing between the primary database and a read replica.
+
+Configure the replica with ``READ_REPLICA_DATABASE_URL`` (it becomes the
+``replica`` entry of ``SQLALCHEMY_BINDS``). Heavy read-only views opt in with
+``@read_replica_view`` or ``with read_replica():``; inside them, SELECTs go to
+the replica while flushes still go to the primary. Without a replica bind,
+or when the app is TESTING, everything stays on the primary.
+
+A replica lags the primary, so only route views that can show data a few
+seconds old. A periodic file copy of the SQLite database or a second
+PostgreSQL container both work as stand-ins.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _use_replica.get() and not self._flushing:
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None and not current_app.testing:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_replica():
+    """Route reads in this block to the replica (falls back to the primary)"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_replica_view(view):
+    """Decorator for read-only views; place it below ``@login_required``"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with read_replica():
+            return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,139 @@
+"""Per-agent calling queue kept in memory for O(log n) navigation.
+
+The queue holds the agent's ``callback`` then ``assigned`` leads, newest
+assignment first, as a sorted list of keys. Building it is one index-only
+query over ``ix_lead_agent_status_assigned``; after that, position and
+next/previous lookups are a bisect. Any flush that changes a lead's status,
+agent or assignment date drops the affected queues. Queues built in other
+gunicorn workers expire after ``DIALER_QUEUE_TTL`` seconds, and neighbours
+are re-checked against the database before being handed out.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from models import db, Lead
+
+QUEUE_STATUSES = ('callback', 'assigned')
+STATUS_PRIORITY = {'callback': 1, 'assigned': 2}
+TRACKED_ATTRIBUTES = ('status', 'assigned_agent_id', 'assigned_date')
+
+_queues = {}
+_lock = threading.Lock()
+
+
+def _sort_key(lead_id, status, assigned_date):
+    # ORDER BY status priority, assigned_date DESC (NULLs last), id
+    return (
+        STATUS_PRIORITY.get(status, 3),
+        assigned_date is None,
+        -assigned_date.timestamp() if assigned_date else 0,
+        lead_id,
+    )
+
+
+class AgentQueue:
+    def __init__(self, rows):
+        self.keys = sorted(_sort_key(*row) for row in rows)
+        self.key_by_id = {key[-1]: key for key in self.keys}
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def index_of(self, lead_id):
+        key = self.key_by_id.get(lead_id)
+        return bisect_left(self.keys, key) if key is not None else None
+
+    def lead_at(self, index):
+        return self.keys[index][-1] if 0 <= index < len(self.keys) else None
+
+
+def _build_queue(agent_id):
+    rows = db.session.query(Lead.id, Lead.status, Lead.assigned_date)\
+        .filter(Lead.assigned_agent_id == agent_id, Lead.status.in_(QUEUE_STATUSES))\
+        .all()
+    return AgentQueue(rows)
+
+
+def get_queue(agent_id):
+    ttl = current_app.config.get('DIALER_QUEUE_TTL', 30)
+    with _lock:
+        queue = _queues.get(agent_id)
+        if queue is not None and time.monotonic() - queue.built_at < ttl:
+            return queue
+
+    queue = _build_queue(agent_id)
+    with _lock:
+        _queues[agent_id] = queue
+    return queue
+
+
+def invalidate_queues(*agent_ids):
+    with _lock:
+        for agent_id in agent_ids:
+            _queues.pop(agent_id, None)
+
+
+def _still_queued(agent_id, lead_ids):
+    lead_ids = [lead_id for lead_id in lead_ids if lead_id is not None]
+    if not lead_ids:
+        return True
+    found = db.session.query(db.func.count(Lead.id))\
+        .filter(Lead.id.in_(lead_ids),
+                Lead.assigned_agent_id == agent_id,
+                Lead.status.in_(QUEUE_STATUSES))\
+        .scalar()
+    return found == len(lead_ids)
+
+
+def queue_position(agent_id, lead_id=None):
+    """
+    Where ``lead_id`` sits in the agent's queue; without one, the first queued lead.
+
+    Returns index (0-based, 0 when the lead is not queued), total and the ids
+    of the first, previous and next leads (None past either end).
+    """
+    for attempt in range(2):
+        queue = get_queue(agent_id)
+        checked = []
+        if lead_id is None:
+            lead_id = queue.lead_at(0)
+            checked.append(lead_id)
+        index = queue.index_of(lead_id) if lead_id is not None else None
+        current = index if index is not None else 0
+        position = {
+            'lead_id': lead_id,
+            'index': current,
+            'total': len(queue),
+            'in_queue': index is not None,
+            'first_lead_id': queue.lead_at(0),
+            'prev_lead_id': queue.lead_at(current - 1) if index is not None else None,
+            'next_lead_id': queue.lead_at(current + 1) if index is not None else queue.lead_at(0),
+        }
+        if attempt or _still_queued(agent_id, checked + [position['prev_lead_id'], position['next_lead_id']]):
+            return position
+        # Another worker changed this agent's leads; rebuild once
+        invalidate_queues(agent_id)
+        if checked:
+            lead_id = None
+    return position
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_changed_queues(session, flush_context):
+    agent_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Lead):
+            continue
+        state = inspect(obj)
+        changed = any(state.attrs[attr].history.has_changes() for attr in TRACKED_ATTRIBUTES)
+        if changed or obj in session.new or obj in session.deleted:
+            agent_ids.add(obj.assigned_agent_id)
+            agent_ids.update(state.attrs.assigned_agent_id.history.deleted or ())
+    agent_ids.discard(None)
+    if agent_ids:
+        invalidate_queues(*agent_ids)
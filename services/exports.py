@@ -0,0 +1,167 @@
+"""Streaming CSV / XLSX exports of leads, call logs and feedback.
+
+Rows are read as plain column tuples with ``yield_per`` (a server-side cursor
+on PostgreSQL; SQLite steps its cursor lazily anyway), so no ORM objects are
+built and memory stays flat however many rows match.
+
+* CSV is generated chunk by chunk into a streaming response; the download
+  starts with the first ``EXPORT_BATCH_SIZE`` rows.
+* XLSX goes through openpyxl's write-only workbook (rows are serialised as they
+  are appended) into a temp file, which is then streamed and deleted. Sheets
+  roll over at Excel's 1,048,576-row limit.
+
+Reads go to the read replica when one is configured.
+"""
+import csv
+import enum
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import Response, current_app, stream_with_context
+from openpyxl import Workbook
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from models import db, User, Lead, Project, LeadFeedback, CallLog
+from services.db_routing import read_replica
+from services.history_listing import LISTINGS, apply_history_filters
+
+XLSX_MAX_ROWS = 1048576
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ExportSpec:
+    name: str
+    headers: tuple
+    statement: object
+
+
+# -----------------------------
+# Export definitions
+# -----------------------------
+def lead_export(query):
+    """``query`` is a filtered ``Lead.query`` (see admin ``filtered_leads_query``)"""
+    agent = aliased(User)
+    statement = query\
+        .outerjoin(Project, Lead.project_id == Project.id)\
+        .outerjoin(agent, Lead.assigned_agent_id == agent.id)\
+        .with_entities(Lead.id, Lead.name, Lead.mobile, Lead.email, Project.name, Lead.project_name,
+                       Lead.location, Lead.pincode, Lead.source, Lead.status, agent.username,
+                       Lead.assigned_date, Lead.created_at)\
+        .order_by(Lead.id)\
+        .statement
+    headers = ('ID', 'Name', 'Mobile', 'Email', 'Project', 'Project Name (import)', 'Location', 'Pincode',
+               'Source', 'Status', 'Assigned Agent', 'Assigned Date', 'Created At')
+    return ExportSpec('leads', headers, statement)
+
+
+def call_log_export(args):
+    statement = select(CallLog.id, CallLog.call_time, CallLog.end_time, Lead.id, Lead.name, Lead.mobile,
+                       User.username, CallLog.status, CallLog.duration_seconds, CallLog.outcome,
+                       CallLog.call_notes)\
+        .outerjoin(Lead, CallLog.lead_id == Lead.id)\
+        .outerjoin(User, CallLog.agent_id == User.id)\
+        .order_by(CallLog.call_time.desc(), CallLog.id.desc())
+    statement = apply_history_filters(LISTINGS['call_logs'], statement, args)
+    headers = ('ID', 'Call Time', 'End Time', 'Lead ID', 'Lead', 'Mobile', 'Agent', 'Status',
+               'Duration (s)', 'Outcome', 'Notes')
+    return ExportSpec('call_logs', headers, statement)
+
+
+def feedback_export(args):
+    statement = select(LeadFeedback.id, LeadFeedback.created_at, Lead.id, Lead.name, Lead.mobile, User.username,
+                       LeadFeedback.feedback_type, LeadFeedback.status, LeadFeedback.project_interested,
+                       LeadFeedback.location_preferred, LeadFeedback.configuration_interested,
+                       LeadFeedback.budget_comfortable, LeadFeedback.possession_timeline,
+                       LeadFeedback.not_interested_reason, LeadFeedback.callback_time,
+                       LeadFeedback.callback_notes, LeadFeedback.additional_notes, LeadFeedback.call_duration)\
+        .outerjoin(Lead, LeadFeedback.lead_id == Lead.id)\
+        .outerjoin(User, LeadFeedback.agent_id == User.id)\
+        .order_by(LeadFeedback.created_at.desc(), LeadFeedback.id.desc())
+    statement = apply_history_filters(LISTINGS['feedbacks'], statement, args)
+    headers = ('ID', 'Created At', 'Lead ID', 'Lead', 'Mobile', 'Agent', 'Outcome', 'Status',
+               'Project Interested', 'Location Preferred', 'Configuration', 'Budget', 'Possession Timeline',
+               'Not Interested Reason', 'Callback Time', 'Callback Notes', 'Notes', 'Call Duration (s)')
+    return ExportSpec('feedbacks', headers, statement)
+
+
+# -----------------------------
+# Writers
+# -----------------------------
+def iter_rows(spec, batch_size):
+    """Yield result rows with enum members replaced by their values"""
+    with read_replica():
+        result = db.session.execute(spec.statement.execution_options(yield_per=batch_size))
+    for row in result:
+        yield [value.value if isinstance(value, enum.Enum) else value for value in row]
+
+
+def _csv_value(value):
+    return value.isoformat(sep=' ', timespec='seconds') if isinstance(value, datetime) else value
+
+
+def generate_csv(spec, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(spec.headers)
+    for count, row in enumerate(iter_rows(spec, batch_size), 1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(spec, path, batch_size):
+    workbook = Workbook(write_only=True)
+    sheet, sheet_rows, sheet_number = None, XLSX_MAX_ROWS, 0
+    for row in iter_rows(spec, batch_size):
+        if sheet_rows >= XLSX_MAX_ROWS:
+            sheet_number += 1
+            sheet = workbook.create_sheet(spec.name if sheet_number == 1 else f'{spec.name} ({sheet_number})')
+            sheet.append(spec.headers)
+            sheet_rows = 1
+        sheet.append(row)
+        sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet(spec.name).append(spec.headers)
+    workbook.save(path)
+
+
+def _stream_file(path):
+    try:
+        with open(path, 'rb') as fh:
+            while True:
+                chunk = fh.read(FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_response(spec, fmt):
+    """Streaming download of ``spec`` as ``csv`` or ``xlsx``"""
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    filename = f"{spec.name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"', 'X-Accel-Buffering': 'no'}
+
+    if fmt == 'xlsx':
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            write_xlsx(spec, path, batch_size)
+        except Exception:
+            os.remove(path)
+            raise
+        headers['Content-Length'] = str(os.path.getsize(path))
+        return Response(_stream_file(path), headers=headers,
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    return Response(stream_with_context(generate_csv(spec, batch_size)), headers=headers,
+                    mimetype='text/csv')
@@ -0,0 +1,161 @@
+"""Paginated listings behind the admin call log / feedback / reassignment history pages.
+
+Each listing names its model, the indexed timestamp it is ordered by and the
+agent column(s) it can be filtered on. Pages are keyset pages over
+(timestamp, id), so the 500th page of an infinite scroll costs the same as the
+first. Only the columns the page shows are loaded, and the lead / agent names
+come in through ``joinedload`` instead of one lazy load per row.
+
+Filters (all optional): ``agent_id``, ``date_from`` and ``date_to``
+(``YYYY-MM-DD``, inclusive). They match the (agent, timestamp) and timestamp
+indexes declared on the models.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload, load_only
+
+from models import User, Lead, LeadFeedback, CallLog, LeadReassignment
+from services.pagination import keyset_paginate, clamp_per_page
+
+
+def _fmt(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else None
+
+
+def _enum(value):
+    return value.value if value else None
+
+
+def _name(user):
+    return user.username if user else None
+
+
+@dataclass
+class HistoryListing:
+    title: str
+    model: type
+    sort_column: object
+    agent_columns: tuple
+    columns: tuple          # model columns loaded for each row
+    relationships: tuple    # many-to-one relationship names (backrefs, so resolved at query time)
+    headers: tuple          # (row key, heading) pairs in display order
+    serialize: object
+
+
+LISTINGS = {
+    'call_logs': HistoryListing(
+        title='Call Logs',
+        model=CallLog,
+        sort_column=CallLog.call_time,
+        agent_columns=(CallLog.agent_id,),
+        columns=(CallLog.id, CallLog.lead_id, CallLog.agent_id, CallLog.call_time, CallLog.status,
+                 CallLog.duration_seconds, CallLog.outcome, CallLog.call_notes),
+        relationships=('lead', 'agent'),
+        headers=(('lead', 'Lead'), ('agent', 'Agent'), ('time', 'Call Time'), ('status', 'Status'),
+                 ('duration_seconds', 'Duration (s)'), ('outcome', 'Outcome'), ('notes', 'Notes')),
+        serialize=lambda log: {
+            'id': log.id,
+            'lead_id': log.lead_id,
+            'lead': log.lead.name if log.lead else None,
+            'agent': _name(log.agent),
+            'time': _fmt(log.call_time),
+            'status': _enum(log.status),
+            'duration_seconds': log.duration_seconds,
+            'outcome': log.outcome,
+            'notes': log.call_notes,
+        },
+    ),
+    'feedbacks': HistoryListing(
+        title='Feedbacks',
+        model=LeadFeedback,
+        sort_column=LeadFeedback.created_at,
+        agent_columns=(LeadFeedback.agent_id,),
+        columns=(LeadFeedback.id, LeadFeedback.lead_id, LeadFeedback.agent_id, LeadFeedback.created_at,
+                 LeadFeedback.feedback_type, LeadFeedback.status, LeadFeedback.additional_notes),
+        relationships=('lead', 'agent'),
+        headers=(('lead', 'Lead'), ('agent', 'Agent'), ('time', 'Date/Time'), ('feedback_type', 'Outcome'),
+                 ('status', 'Status'), ('notes', 'Remarks')),
+        serialize=lambda fb: {
+            'id': fb.id,
+            'lead_id': fb.lead_id,
+            'lead': fb.lead.name if fb.lead else None,
+            'agent': _name(fb.agent),
+            'time': _fmt(fb.created_at),
+            'feedback_type': _enum(fb.feedback_type),
+            'status': fb.status,
+            'notes': fb.additional_notes,
+        },
+    ),
+    'reassignments': HistoryListing(
+        title='Lead Reassignments',
+        model=LeadReassignment,
+        sort_column=LeadReassignment.reassigned_at,
+        agent_columns=(LeadReassignment.from_agent_id, LeadReassignment.to_agent_id),
+        columns=(LeadReassignment.id, LeadReassignment.lead_id, LeadReassignment.from_agent_id,
+                 LeadReassignment.to_agent_id, LeadReassignment.reassigned_at, LeadReassignment.reason),
+        relationships=('lead', 'from_agent', 'to_agent'),
+        headers=(('lead', 'Lead'), ('from_agent', 'From Agent'), ('to_agent', 'To Agent'),
+                 ('time', 'Date/Time'), ('notes', 'Reason')),
+        serialize=lambda r: {
+            'id': r.id,
+            'lead_id': r.lead_id,
+            'lead': r.lead.name if r.lead else None,
+            'from_agent': _name(r.from_agent),
+            'to_agent': _name(r.to_agent),
+            'time': _fmt(r.reassigned_at),
+            'notes': r.reason,
+        },
+    ),
+}
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+def _loader_options(listing):
+    options = [load_only(*listing.columns)]
+    for name in listing.relationships:
+        relationship = getattr(listing.model, name)
+        target = relationship.property.mapper.class_
+        columns = (Lead.id, Lead.name) if target is Lead else (User.id, User.username)
+        options.append(joinedload(relationship).load_only(*columns))
+    return options
+
+
+def apply_history_filters(listing, query, args):
+    """The agent and date-range filters shared by the pages and the exports"""
+    agent_id = args.get('agent_id', type=int)
+    if agent_id:
+        query = query.filter(or_(*(column == agent_id for column in listing.agent_columns)))
+    date_from = _parse_day(args.get('date_from'))
+    if date_from:
+        query = query.filter(listing.sort_column >= date_from)
+    date_to = _parse_day(args.get('date_to'))
+    if date_to:
+        query = query.filter(listing.sort_column < date_to + timedelta(days=1))
+    return query
+
+
+def history_page(name, args):
+    """One keyset page of the ``name`` listing with ``args`` filters applied"""
+    listing = LISTINGS[name]
+    query = apply_history_filters(listing, listing.model.query.options(*_loader_options(listing)), args)
+
+    page = keyset_paginate(
+        query,
+        listing.sort_column,
+        listing.model.id,
+        descending=True,
+        after=args.get('after'),
+        before=args.get('before'),
+        per_page=clamp_per_page(args.get('per_page'))
+    )
+    page['rows'] = [listing.serialize(item) for item in page['items']]
+    page['listing'] = listing
+    return page
@@ -0,0 +1,166 @@
+"""Shared outbound HTTP clients with pooled keep-alive connections and timing metrics.
+
+``get_client(name)`` returns one ``OutboundClient`` per name and process. Each
+wraps a ``requests.Session`` whose adapter keeps up to
+``OUTBOUND_HTTP_POOL_MAXSIZE`` idle connections per host (blocking when that
+many are busy, so a slow host cannot open unbounded sockets) for
+``OUTBOUND_HTTP_POOL_CONNECTIONS`` hosts. Connections record how long the TCP
+connect and the TLS handshake took; requests record time to response headers
+and total time, so reuse is visible as "requests >> new connections".
+"""
+import os
+import threading
+import time
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+TIMINGS = ('connect_ms', 'tls_ms', 'response_ms', 'total_ms')
+
+
+class HttpTimings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {'requests': 0, 'errors': 0, 'new_connections': 0}
+            self.totals = {name: 0.0 for name in TIMINGS}
+            self.samples = {name: 0 for name in TIMINGS}
+            self.maxima = {name: 0.0 for name in TIMINGS}
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def observe(self, name, ms):
+        with self._lock:
+            self.totals[name] += ms
+            self.samples[name] += 1
+            self.maxima[name] = max(self.maxima[name], ms)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counts)
+            for name in TIMINGS:
+                samples = self.samples[name]
+                stats[name] = {
+                    'count': samples,
+                    'avg': round(self.totals[name] / samples, 2) if samples else 0,
+                    'max': round(self.maxima[name], 2),
+                }
+        return stats
+
+
+def _connection_classes(timings):
+    """HTTP(S) connection classes that report TCP connect and TLS handshake time"""
+
+    class TimedHTTPConnection(HTTPConnection):
+        def _new_conn(self):
+            started = time.perf_counter()
+            sock = super()._new_conn()
+            self._tcp_ms = (time.perf_counter() - started) * 1000
+            timings.count('new_connections')
+            timings.observe('connect_ms', self._tcp_ms)
+            return sock
+
+    class TimedHTTPSConnection(HTTPSConnection):
+        def _new_conn(self):
+            started = time.perf_counter()
+            sock = super()._new_conn()
+            self._tcp_ms = (time.perf_counter() - started) * 1000
+            timings.count('new_connections')
+            timings.observe('connect_ms', self._tcp_ms)
+            return sock
+
+        def connect(self):
+            started = time.perf_counter()
+            super().connect()
+            total_ms = (time.perf_counter() - started) * 1000
+            timings.observe('tls_ms', max(total_ms - getattr(self, '_tcp_ms', 0.0), 0.0))
+
+    return TimedHTTPConnection, TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def __init__(self, timings, **kwargs):
+        self.timings = timings
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        http_cls, https_cls = _connection_classes(self.timings)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('TimedHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http_cls}),
+            'https': type('TimedHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https_cls}),
+        }
+
+
+class OutboundClient:
+    def __init__(self, name, pool_connections=10, pool_maxsize=10, pool_block=True, timeout=10):
+        self.name = name
+        self.timeout = timeout
+        self.timings = HttpTimings()
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(self.timings, pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self.timings.count('errors')
+            raise
+        self.timings.count('requests')
+        self.timings.observe('response_ms', resp.elapsed.total_seconds() * 1000)
+        self.timings.observe('total_ms', (time.perf_counter() - started) * 1000)
+        return resp
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        return self.timings.snapshot()
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name):
+    """The process-wide client for ``name``, configured from the app config"""
+    # Keyed by pid so a forked gunicorn worker never reuses its parent's sockets
+    key = (os.getpid(), name)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            config = current_app.config
+            client = OutboundClient(
+                name,
+                pool_connections=config.get('OUTBOUND_HTTP_POOL_CONNECTIONS', 10),
+                pool_maxsize=config.get('OUTBOUND_HTTP_POOL_MAXSIZE', 10),
+                timeout=config.get('OUTBOUND_HTTP_TIMEOUT', 10),
+            )
+            _clients[key] = client
+        return client
+
+
+def client_stats():
+    pid = os.getpid()
+    with _clients_lock:
+        clients = {name: client for (owner, name), client in _clients.items() if owner == pid}
+    return {name: client.stats() for name, client in clients.items()}
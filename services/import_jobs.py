@@ -0,0 +1,152 @@
+"""Background worker pool that runs lead imports outside the HTTP request.
+
+Jobs live in the ``import_job`` table, so a worker restart loses only the
+in-memory executor queue. ``recover_import_jobs`` (run once per worker on its
+first request, and by ``flask recover-imports``) hands ``queued`` jobs back to
+the pool and fails ``running`` jobs that have not reported progress for
+``IMPORT_STALE_AFTER`` seconds, so the upload page stops polling them. A job
+failed that way keeps its outcome even if its worker later finishes.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db, ImportJob
+from services.lead_import import import_leads_file
+from services.metrics import IMPORT_JOBS, IMPORT_ROWS, IMPORT_DURATION
+
+_executor = None
+_executor_lock = threading.Lock()
+_recovered = False
+
+PROGRESS_FIELDS = ('chunks', 'rows_processed', 'leads_added', 'duplicates_skipped',
+                   'invalid_rows', 'rows_per_second')
+
+
+def _get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lead-import')
+        return _executor
+
+
+def _apply_progress(job, stats):
+    for field in PROGRESS_FIELDS:
+        setattr(job, field, stats[field])
+
+
+def run_import_job(app, job_id):
+    """Execute one queued import job inside its own app context"""
+    with app.app_context():
+        # Claim the job atomically: after a restart several workers may requeue it
+        claimed = ImportJob.query\
+            .filter(ImportJob.id == job_id, ImportJob.status == 'queued')\
+            .update({'status': 'running', 'started_at': datetime.utcnow(), 'heartbeat_at': datetime.utcnow()},
+                    synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return
+        job = db.session.get(ImportJob, job_id)
+
+        def progress(stats):
+            _apply_progress(job, stats)
+            job.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+
+        values = {}
+        try:
+            stats = import_leads_file(job.filepath,
+                                      chunk_size=app.config.get('IMPORT_CHUNK_SIZE', 5000),
+                                      progress=progress)
+            values = {field: stats[field] for field in PROGRESS_FIELDS}
+            values['status'] = 'completed'
+        except Exception as e:
+            db.session.rollback()
+            values = {'status': 'failed', 'error_message': str(e)}
+            print(f"[Lead Import] job {job_id} failed: {e}")
+        finally:
+            values.setdefault('status', 'failed')
+            values['finished_at'] = datetime.utcnow()
+            # Recovery fails a job whose progress stalled; that outcome (and its metrics) stands
+            finished = ImportJob.query\
+                .filter(ImportJob.id == job_id, ImportJob.status == 'running')\
+                .update(values, synchronize_session=False)
+            db.session.commit()
+            if finished:
+                IMPORT_JOBS.inc(status=job.status)
+                IMPORT_DURATION.observe((job.finished_at - job.started_at).total_seconds())
+                for outcome, field in (('added', 'leads_added'), ('duplicate', 'duplicates_skipped'),
+                                       ('invalid', 'invalid_rows')):
+                    IMPORT_ROWS.inc(getattr(job, field) or 0, outcome=outcome)
+            if os.path.exists(job.filepath):
+                os.remove(job.filepath)
+
+
+def enqueue_import(filepath, filename, created_by_id=None):
+    """Record an import job and hand it to the worker pool"""
+    job = ImportJob(filename=filename, filepath=filepath, created_by_id=created_by_id)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    executor = _get_executor(app.config.get('IMPORT_WORKERS', 2))
+    executor.submit(run_import_job, app, job.id)
+    return job
+
+
+def recover_import_jobs(app, submit=True):
+    """Requeue orphaned ``queued`` jobs and fail stale ``running`` ones
+
+    Returns ``(queued, failed)`` job ids; with ``submit=False`` the queued jobs
+    are left for the caller to run.
+    """
+    stale_after = app.config.get('IMPORT_STALE_AFTER', 3600)
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    # Jobs from before the heartbeat column fall back to their start time
+    stale = (ImportJob.status == 'running', db.func.coalesce(ImportJob.heartbeat_at, ImportJob.started_at) < cutoff)
+    failed = []
+    for job_id, filepath in db.session.query(ImportJob.id, ImportJob.filepath).filter(*stale).all():
+        # Conditional, so a job that just reported progress (or another worker's recovery) wins
+        claimed = ImportJob.query.filter(ImportJob.id == job_id, *stale).update({
+            'status': 'failed',
+            'error_message': 'Import was interrupted (no progress for too long)',
+            'finished_at': datetime.utcnow(),
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            continue
+        failed.append(job_id)
+        IMPORT_JOBS.inc(status='failed')
+        print(f"[Lead Import] job {job_id} marked failed: no progress for {stale_after}s")
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    requeued = [job_id for (job_id,) in db.session.query(ImportJob.id).filter(ImportJob.status == 'queued')]
+    if requeued and submit:
+        executor = _get_executor(app.config.get('IMPORT_WORKERS', 2))
+        for job_id in requeued:
+            executor.submit(run_import_job, app, job_id)
+        print(f"[Lead Import] requeued {len(requeued)} queued job(s)")
+    return requeued, failed
+
+
+def init_import_jobs(app):
+    """Recover interrupted jobs once per worker, on its first request"""
+    @app.before_request
+    def _recover_once():
+        global _recovered
+        if _recovered:
+            return
+        with _executor_lock:
+            if _recovered:
+                return
+            _recovered = True
+        try:
+            recover_import_jobs(app)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[Lead Import] recovery failed: {e}")
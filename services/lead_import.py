@@ -0,0 +1,190 @@
+"""Chunked, set-based lead import engine used by the admin upload routes."""
+import time
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from models import db, Lead
+from services.report_rollups import add_rollup_counts, lead_status_metric
+
+DEFAULT_CHUNK_SIZE = 5000
+# Stay well under SQLite's bound-parameter limit when probing existing mobiles
+LOOKUP_BATCH_SIZE = 900
+
+REQUIRED_COLUMNS = ['name', 'mobile']
+TEXT_COLUMNS = {
+    'name': 'N/A',
+    'email': None,
+    'pincode': 'N/A',
+    'project_name': 'N/A',
+    'source': 'N/A',
+    'location': 'N/A',
+}
+
+
+class MissingColumnsError(ValueError):
+    """Raised when an uploaded file lacks the required lead columns"""
+
+
+# -----------------------------
+# Readers
+# -----------------------------
+def _iter_csv_chunks(filepath, chunk_size):
+    # dtype=str keeps mobiles exactly as typed (no float coercion / lost zeros)
+    for chunk in pd.read_csv(filepath, chunksize=chunk_size, dtype=str):
+        yield chunk
+
+
+def _iter_xlsx_chunks(filepath, chunk_size):
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+        width = len(header)
+        batch = []
+        for row in rows:
+            batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=header, dtype=object)
+                batch = []
+        if batch or not header:
+            yield pd.DataFrame(batch, columns=header, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_chunks(filepath, chunk_size):
+    # Legacy .xls has no streaming reader; slice the frame so inserts stay bounded
+    df = pd.read_excel(filepath, dtype=object)
+    for start in range(0, max(len(df), 1), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def iter_lead_chunks(filepath, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the uploaded file as DataFrames of at most chunk_size rows"""
+    extension = filepath.rsplit('.', 1)[-1].lower()
+    if extension == 'csv':
+        return _iter_csv_chunks(filepath, chunk_size)
+    if extension == 'xlsx':
+        return _iter_xlsx_chunks(filepath, chunk_size)
+    return _iter_xls_chunks(filepath, chunk_size)
+
+
+# -----------------------------
+# Normalization & dedupe
+# -----------------------------
+def _clean_text(series):
+    cleaned = series.astype('string').str.strip()
+    return cleaned.mask(cleaned == '')
+
+
+def normalize_chunk(df):
+    """Vectorised cleanup of a raw chunk into Lead column values"""
+    df = df.rename(columns=lambda c: str(c).strip())
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise MissingColumnsError('CSV must contain "name" and "mobile" columns')
+
+    # Spreadsheet cells often turn 9876543210 into 9876543210.0
+    mobile = _clean_text(df['mobile']).str.replace(r'\.0$', '', regex=True)
+    out = pd.DataFrame({'mobile': mobile}, index=df.index)
+
+    for column, default in TEXT_COLUMNS.items():
+        if column in df.columns:
+            out[column] = _clean_text(df[column])
+        else:
+            out[column] = pd.Series(pd.NA, index=df.index, dtype='string')
+        if default is not None:
+            out[column] = out[column].fillna(default)
+
+    if 'year' in df.columns:
+        out['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
+    else:
+        out['year'] = pd.Series(pd.NA, index=df.index, dtype='Int64')
+
+    return out[out['mobile'].notna()]
+
+
+def find_existing_mobiles(mobiles):
+    """Return the subset of mobiles already present, using batched IN lookups"""
+    existing = set()
+    mobiles = list(mobiles)
+    for start in range(0, len(mobiles), LOOKUP_BATCH_SIZE):
+        batch = mobiles[start:start + LOOKUP_BATCH_SIZE]
+        rows = db.session.query(Lead.mobile).filter(Lead.mobile.in_(batch)).all()
+        existing.update(row.mobile for row in rows)
+    return existing
+
+
+def _to_records(df):
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    for record in records:
+        if record['year'] is not None:
+            record['year'] = int(record['year'])
+    return records
+
+
+# -----------------------------
+# Import driver
+# -----------------------------
+def import_leads_file(filepath, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Import leads from a CSV/Excel file chunk by chunk.
+
+    Each chunk is normalised, deduplicated against earlier rows of the same
+    file and against the database (one set-based query per chunk), then
+    bulk-inserted and committed. ``progress`` is called with the running
+    stats dict after every chunk.
+    """
+    stats = {
+        'chunks': 0,
+        'rows_processed': 0,
+        'leads_added': 0,
+        'duplicates_skipped': 0,
+        'invalid_rows': 0,
+        'elapsed_seconds': 0.0,
+        'rows_per_second': 0.0,
+    }
+    seen_mobiles = set()
+    started = time.perf_counter()
+
+    for raw_chunk in iter_lead_chunks(filepath, chunk_size):
+        chunk = normalize_chunk(raw_chunk)
+        stats['invalid_rows'] += len(raw_chunk) - len(chunk)
+
+        unique = chunk.drop_duplicates(subset='mobile')
+        unique = unique[~unique['mobile'].isin(seen_mobiles)]
+        existing = find_existing_mobiles(unique['mobile'])
+        fresh = unique[~unique['mobile'].isin(existing)]
+        seen_mobiles.update(unique['mobile'])
+
+        try:
+            if len(fresh):
+                db.session.execute(db.insert(Lead), _to_records(fresh))
+                # Core bulk inserts bypass the flush hooks that keep report rollups current
+                today = datetime.utcnow().date()
+                add_rollup_counts(db.session.connection(), {
+                    (today, 0, 0, 'leads_created'): len(fresh),
+                    (today, 0, 0, lead_status_metric(Lead.status.default.arg)): len(fresh),
+                })
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        stats['chunks'] += 1
+        stats['rows_processed'] += len(raw_chunk)
+        stats['leads_added'] += len(fresh)
+        stats['duplicates_skipped'] += len(chunk) - len(fresh)
+        stats['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        if stats['elapsed_seconds']:
+            stats['rows_per_second'] = round(stats['rows_processed'] / stats['elapsed_seconds'], 1)
+
+        print(f"[Lead Import] chunk {stats['chunks']} | rows {stats['rows_processed']} | "
+              f"added {stats['leads_added']} | duplicates {stats['duplicates_skipped']} | "
+              f"{stats['rows_per_second']} rows/sec")
+        if progress:
+            progress(dict(stats))
+
+    return stats
@@ -0,0 +1,157 @@
+"""Substring search for the leads filters backed by trigram indexes.
+
+SQLite uses an FTS5 ``trigram`` table (``lead_search``) kept in sync with
+``lead`` by triggers, so bulk imports are indexed too. PostgreSQL uses
+``pg_trgm`` GIN indexes, which ``ILIKE '%term%'`` picks up directly. Either
+way the filters keep their case-insensitive "contains" semantics; mobile
+searches are normalised to digits first so "+91 98765-43210" and "43210"
+both match the stored number.
+
+If the index cannot be installed (SQLite before 3.34 has no trigram
+tokenizer; a PostgreSQL role may lack the privilege to create ``pg_trgm``)
+the filters fall back to plain ``LIKE``. Workers re-check a ``like`` backend
+every ``BACKEND_RECHECK_SECONDS``, so ``flask build-search-index`` takes effect
+without a restart.
+"""
+import re
+import time
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from models import db, Lead
+
+# Trigram indexes need at least three characters to narrow anything down
+MIN_INDEXED_LENGTH = 3
+BACKEND_RECHECK_SECONDS = 60
+
+SEARCH_COLUMNS = {
+    'name': Lead.name,
+    'project_name': Lead.project_name,
+    'pincode': Lead.pincode,
+}
+
+_SQLITE_DIGITS = "replace(replace(replace(replace(replace({col}, ' ', ''), '-', ''), '+', ''), '(', ''), ')', '')"
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS lead_search USING fts5("
+    "name, mobile_digits, project_name, pincode, tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS lead_search_ai AFTER INSERT ON lead BEGIN "
+    "INSERT INTO lead_search(rowid, name, mobile_digits, project_name, pincode) "
+    f"VALUES (new.id, new.name, {_SQLITE_DIGITS.format(col='new.mobile')}, new.project_name, new.pincode); END",
+    "CREATE TRIGGER IF NOT EXISTS lead_search_au AFTER UPDATE OF name, mobile, project_name, pincode ON lead BEGIN "
+    "DELETE FROM lead_search WHERE rowid = old.id; "
+    "INSERT INTO lead_search(rowid, name, mobile_digits, project_name, pincode) "
+    f"VALUES (new.id, new.name, {_SQLITE_DIGITS.format(col='new.mobile')}, new.project_name, new.pincode); END",
+    "CREATE TRIGGER IF NOT EXISTS lead_search_ad AFTER DELETE ON lead BEGIN "
+    "DELETE FROM lead_search WHERE rowid = old.id; END",
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM lead_search",
+    "INSERT INTO lead_search(rowid, name, mobile_digits, project_name, pincode) "
+    f"SELECT id, name, {_SQLITE_DIGITS.format(col='mobile')}, project_name, pincode FROM lead",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_lead_name_trgm ON lead USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_lead_project_name_trgm ON lead USING gin (project_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_lead_pincode_trgm ON lead USING gin (pincode gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_lead_mobile_digits_trgm ON lead "
+    "USING gin ((regexp_replace(mobile, '[^0-9]', '', 'g')) gin_trgm_ops)",
+]
+
+_backends = {}  # engine url -> (backend, checked at)
+
+
+def install_lead_search(connection):
+    """Create (or rebuild) the search index for the connection's dialect"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DDL + SQLITE_REBUILD:
+            connection.exec_driver_sql(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            connection.exec_driver_sql(statement)
+    _backends.clear()
+
+
+@event.listens_for(Lead.__table__, 'after_create')
+def _install_on_create(target, connection, **kw):
+    # A savepoint keeps a failed DDL from aborting the rest of create_all
+    try:
+        with connection.begin_nested():
+            install_lead_search(connection)
+    except DBAPIError as e:
+        print(f"[Lead Search] trigram index not installed, filters use LIKE: {e.orig}")
+
+
+def _detect_backend(engine):
+    inspector = inspect(engine)
+    if engine.dialect.name == 'sqlite':
+        return 'fts5' if inspector.has_table('lead_search') else 'like'
+    if engine.dialect.name == 'postgresql':
+        indexes = {index['name'] for index in inspector.get_indexes('lead')}
+        return 'pg_trgm' if 'ix_lead_name_trgm' in indexes else 'like'
+    return 'like'
+
+
+def search_backend():
+    """'fts5', 'pg_trgm' or 'like' for the current engine"""
+    engine = db.engine
+    cached = _backends.get(engine.url)
+    if cached is None or (cached[0] == 'like' and time.monotonic() - cached[1] > BACKEND_RECHECK_SECONDS):
+        cached = _backends[engine.url] = (_detect_backend(engine), time.monotonic())
+    return cached[0]
+
+
+def normalize_mobile(term):
+    """Digits only, without a +91 country code or trunk 0 prefix"""
+    digits = re.sub(r'\D', '', term or '')
+    if len(digits) > 10 and digits.startswith('91'):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    return digits
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def apply_lead_search(query, args):
+    """Apply the name/mobile/project_name/pincode "contains" filters from args"""
+    backend = search_backend()
+    fts_conditions, params = [], {}
+
+    for field, column in SEARCH_COLUMNS.items():
+        term = (args.get(field) or '').strip()
+        if not term:
+            continue
+        if backend == 'fts5' and len(term) >= MIN_INDEXED_LENGTH:
+            # An ESCAPE clause stops FTS5 using the trigram index, so only add it when needed
+            escape = " ESCAPE '\\'" if _escape_like(term) != term else ''
+            fts_conditions.append(f"{field} LIKE :{field}{escape}")
+            params[field] = f'%{_escape_like(term)}%'
+        else:
+            query = query.filter(column.ilike(f'%{_escape_like(term)}%', escape='\\'))
+
+    mobile = (args.get('mobile') or '').strip()
+    if mobile:
+        digits = normalize_mobile(mobile)
+        if backend == 'fts5' and len(digits) >= MIN_INDEXED_LENGTH:
+            fts_conditions.append('mobile_digits LIKE :mobile_digits')
+            params['mobile_digits'] = f'%{digits}%'
+        elif backend == 'pg_trgm' and digits:
+            query = query.filter(db.func.regexp_replace(Lead.mobile, '[^0-9]', '', 'g').like(f'%{digits}%'))
+        else:
+            query = query.filter(Lead.mobile.ilike(f'%{_escape_like(mobile)}%', escape='\\'))
+
+    if fts_conditions:
+        matches = text(f"SELECT rowid FROM lead_search WHERE {' AND '.join(fts_conditions)}")\
+            .bindparams(**params)\
+            .columns(db.column('rowid', db.Integer))
+        query = query.filter(Lead.id.in_(matches))
+
+    return query
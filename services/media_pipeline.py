@@ -0,0 +1,318 @@
+"""Background normalisation of call recordings.
+
+``submit_feedback`` stores the upload as-is and calls ``enqueue_recording``;
+a pool of ``MEDIA_WORKERS`` threads per process then
+
+* measures the duration and fills ``LeadFeedback.call_duration`` if empty,
+* re-encodes the recording to mono ``MEDIA_SAMPLE_RATE`` Hz audio - AAC at
+  ``MEDIA_BITRATE`` in an .m4a when ``ffmpeg`` is on the PATH, otherwise
+  (WAV only) 16-bit mono PCM resampled in Python - and
+* swaps ``recording_path`` to the new key when the result is smaller.
+
+Each handled feedback gets a ``recording_job`` row with the outcome, so
+nothing is processed twice whatever the file's format. Content-addressed
+originals are left for ``sweep_orphaned_recordings`` (``flask
+gc-recordings``), which removes them once no feedback references them and
+``RECORDINGS_GC_GRACE`` has passed; deleting them here could race with an
+upload deduplicating to the same key.
+
+The work queue holds at most ``MEDIA_QUEUE_SIZE`` jobs; when it is full the
+upload keeps its original file and ``flask process-recordings`` picks it up
+later. ``pipeline_stats()`` reports queue depth, outcomes and bytes saved.
+"""
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+import warnings
+from datetime import datetime
+
+from flask import current_app
+
+from models import db, LeadFeedback, RecordingJob
+from services.recording_storage import (KEY_RE, store_recording, local_recording, delete_legacy_recording,
+                                        sweep_recordings)
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import audioop  # stdlib up to 3.12; the audioop-lts package after that
+except ImportError:
+    audioop = None
+
+FFMPEG_TIMEOUT = 300
+
+_queue = None
+_workers = {'threads': [], 'pid': None}
+_workers_lock = threading.Lock()
+
+
+class PipelineStats:
+    COUNTERS = ('enqueued', 'rejected', 'transcoded', 'duration_only', 'unchanged', 'missing', 'failed',
+                'durations_backfilled', 'bytes_in', 'bytes_out')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.job_ms_total = 0.0
+        self.job_ms_max = 0.0
+        self.jobs = 0
+        self.max_queue_depth = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def observe_job(self, ms):
+        with self._lock:
+            self.jobs += 1
+            self.job_ms_total += ms
+            self.job_ms_max = max(self.job_ms_max, ms)
+
+    def observe_depth(self, depth):
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counts)
+            stats['job_ms_avg'] = round(self.job_ms_total / self.jobs, 2) if self.jobs else 0
+            stats['job_ms_max'] = round(self.job_ms_max, 2)
+            stats['max_queue_depth'] = self.max_queue_depth
+        return stats
+
+
+stats = PipelineStats()
+
+
+# -----------------------------
+# Probing and transcoding
+# -----------------------------
+def ffmpeg_path():
+    return shutil.which('ffmpeg')
+
+
+def probe_duration(path):
+    """Duration in seconds, or None if no available tool understands the file"""
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe:
+        result = subprocess.run([ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+                                 '-of', 'default=noprint_wrappers=1:nokey=1', path],
+                                capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
+        try:
+            return float(result.stdout.strip())
+        except ValueError:
+            pass
+    try:
+        with wave.open(path, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError):
+        pass
+    try:
+        import mutagen
+    except ImportError:
+        return None
+    info = mutagen.File(path)
+    return info.info.length if info is not None and info.info else None
+
+
+def transcode_ffmpeg(src, workdir, sample_rate, bitrate):
+    dst = os.path.join(workdir, 'out.m4a')
+    subprocess.run([ffmpeg_path(), '-nostdin', '-y', '-v', 'error', '-i', src, '-vn',
+                    '-ac', '1', '-ar', str(sample_rate), '-c:a', 'aac', '-b:a', bitrate,
+                    '-movflags', '+faststart', dst],
+                   check=True, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    return dst, 'm4a'
+
+
+def transcode_wav_python(src, workdir, sample_rate):
+    """Mono, 16-bit, at most ``sample_rate`` Hz; None if already that compact"""
+    if audioop is None:
+        return None
+    try:
+        reader = wave.open(src, 'rb')
+    except (wave.Error, EOFError):
+        return None
+    with reader:
+        channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+        if channels == 1 and width <= 2 and rate <= sample_rate:
+            return None
+        target_rate = min(rate, sample_rate)
+        dst = os.path.join(workdir, 'out.wav')
+        state = None
+        with warnings.catch_warnings(), wave.open(dst, 'wb') as writer:
+            warnings.simplefilter('ignore', DeprecationWarning)
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(target_rate)
+            while True:
+                frames = reader.readframes(65536)
+                if not frames:
+                    break
+                if width == 1:
+                    frames = audioop.bias(frames, 1, -128)  # 8-bit WAV is unsigned
+                if channels == 2:
+                    frames = audioop.tomono(frames, width, 0.5, 0.5)
+                elif channels > 2:
+                    # Keep the first channel of multi-channel captures
+                    frames = b''.join(frames[i:i + width] for i in range(0, len(frames), width * channels))
+                if width != 2:
+                    frames = audioop.lin2lin(frames, width, 2)
+                if target_rate != rate:
+                    frames, state = audioop.ratecv(frames, 2, 1, rate, target_rate, state)
+                writer.writeframes(frames)
+    return dst, 'wav'
+
+
+def transcode(src, workdir, config):
+    sample_rate = config.get('MEDIA_SAMPLE_RATE', 16000)
+    if src.lower().endswith('.m4a'):
+        return None  # already AAC; re-encoding would only lose quality
+    if ffmpeg_path():
+        return transcode_ffmpeg(src, workdir, sample_rate, config.get('MEDIA_BITRATE', '32k'))
+    if src.lower().endswith('.wav'):
+        return transcode_wav_python(src, workdir, sample_rate)
+    return None
+
+
+# -----------------------------
+# Jobs
+# -----------------------------
+def record_outcome(feedback_id, outcome, error=None):
+    """Mark the feedback's recording as handled (caller commits)"""
+    db.session.merge(RecordingJob(feedback_id=feedback_id, outcome=outcome, error_message=error,
+                                  processed_at=datetime.utcnow()))
+
+
+def process_recording(feedback_id):
+    """Normalise one feedback's recording; returns the outcome name"""
+    feedback = db.session.get(LeadFeedback, feedback_id)
+    if feedback is None or not feedback.recording_path:
+        return 'missing'
+
+    old_key = feedback.recording_path
+    new_key = None
+    try:
+        with local_recording(old_key) as src, tempfile.TemporaryDirectory() as workdir:
+            duration = probe_duration(src)
+            size_in = os.path.getsize(src)
+            result = transcode(src, workdir, current_app.config)
+            if result is not None and os.path.getsize(result[0]) < size_in:
+                with open(result[0], 'rb') as fh:
+                    new_key = store_recording(fh, result[1]).key
+                if duration is None:
+                    duration = probe_duration(result[0])
+                stats.incr('bytes_in', size_in)
+                stats.incr('bytes_out', os.path.getsize(result[0]))
+    except FileNotFoundError:
+        record_outcome(feedback_id, 'missing')
+        db.session.commit()
+        return 'missing'
+
+    if duration and not feedback.call_duration:
+        feedback.call_duration = int(round(duration))
+        stats.incr('durations_backfilled')
+    replaced = new_key is not None and new_key != old_key
+    if replaced:
+        feedback.recording_path = new_key
+        outcome = 'transcoded'
+    else:
+        outcome = 'duration_only' if duration else 'unchanged'
+    record_outcome(feedback_id, outcome)
+    db.session.commit()
+
+    if replaced and not KEY_RE.match(old_key):
+        # Legacy files belong to exactly one upload; content-addressed ones wait for the sweep
+        delete_legacy_recording(old_key)
+    return outcome
+
+
+def record_failure(feedback_id, error):
+    try:
+        record_outcome(feedback_id, 'failed', str(error)[:1000])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+
+def _run(app):
+    while True:
+        feedback_id = _queue.get()
+        started = time.perf_counter()
+        with app.app_context():
+            try:
+                stats.incr(process_recording(feedback_id))
+            except Exception as e:
+                db.session.rollback()
+                stats.incr('failed')
+                print(f"[Media Pipeline] feedback {feedback_id} failed: {e}")
+                record_failure(feedback_id, e)
+            finally:
+                db.session.remove()
+        stats.observe_job((time.perf_counter() - started) * 1000)
+        _queue.task_done()
+
+
+def start_media_workers(app):
+    global _queue
+    # One pool per forked gunicorn worker, as with the other background threads
+    with _workers_lock:
+        alive = [t for t in _workers['threads'] if t.is_alive()]
+        if _workers['pid'] == os.getpid() and alive:
+            return
+        _queue = queue.Queue(maxsize=app.config.get('MEDIA_QUEUE_SIZE', 200))
+        threads = [threading.Thread(target=_run, args=(app,), name=f'media-{i}', daemon=True)
+                   for i in range(app.config.get('MEDIA_WORKERS', 2))]
+        _workers.update(threads=threads, pid=os.getpid())
+        for thread in threads:
+            thread.start()
+
+
+def enqueue_recording(feedback_id):
+    """Queue a feedback's recording for processing; False if the queue is full"""
+    if not current_app.config.get('MEDIA_PIPELINE_ENABLED', True):
+        return False
+    start_media_workers(current_app._get_current_object())
+    try:
+        _queue.put_nowait(feedback_id)
+    except queue.Full:
+        stats.incr('rejected')
+        print(f"[Media Pipeline] queue full, feedback {feedback_id} left for process-recordings")
+        return False
+    stats.incr('enqueued')
+    stats.observe_depth(_queue.qsize())
+    return True
+
+
+def pending_feedback_ids(retry_failed=False):
+    """Feedbacks with a recording the pipeline has not handled (or failed on, with ``retry_failed``)"""
+    unhandled = RecordingJob.feedback_id.is_(None)
+    if retry_failed:
+        unhandled = db.or_(unhandled, RecordingJob.outcome == 'failed')
+    rows = db.session.query(LeadFeedback.id)\
+        .outerjoin(RecordingJob, RecordingJob.feedback_id == LeadFeedback.id)\
+        .filter(LeadFeedback.recording_path.isnot(None), unhandled)\
+        .order_by(LeadFeedback.id)
+    return [row.id for row in rows]
+
+
+def sweep_orphaned_recordings():
+    """Delete stored recordings no feedback references; returns (checked, deleted)"""
+    def referenced(keys):
+        rows = db.session.query(LeadFeedback.recording_path).filter(LeadFeedback.recording_path.in_(keys))
+        return {row.recording_path for row in rows}
+
+    return sweep_recordings(referenced, current_app.config.get('RECORDINGS_GC_GRACE', 86400))
+
+
+def pipeline_stats():
+    snapshot = stats.snapshot()
+    snapshot['queue_depth'] = _queue.qsize() if _queue is not None and _workers['pid'] == os.getpid() else 0
+    snapshot['queue_size'] = current_app.config.get('MEDIA_QUEUE_SIZE', 200)
+    snapshot['workers'] = sum(t.is_alive() for t in _workers['threads']) if _workers['pid'] == os.getpid() else 0
+    snapshot['encoder'] = 'ffmpeg' if ffmpeg_path() else ('python-wav' if audioop else 'none')
+    return snapshot
@@ -0,0 +1,444 @@
+"""Prometheus-format metrics: HTTP traffic, DB pool usage and call-center events.
+
+``GET /metrics`` returns the text exposition format. Metrics are plain module
+objects (``CALLS_STARTED.inc()``, ``CRM_DELIVERY_SECONDS.observe(0.4)``); no
+client library is needed.
+
+Under gunicorn every worker keeps its own values. Set ``METRICS_MULTIPROC_DIR``
+to a directory shared by the workers: each worker process then snapshots its
+values every ``METRICS_FLUSH_INTERVAL`` seconds to
+``metrics_<pid>_<random id>.json``, so a recycled pid never overwrites an
+earlier worker's file, and whichever worker answers the scrape adds up every
+snapshot. A snapshot that has not been refreshed for ``STALE_AFTER_FLUSHES``
+intervals belongs to an exited worker: its counters and histograms are folded
+into ``metrics_archive.json`` (under a lock, once) and the file is removed, so
+totals never go down and Prometheus sees no spurious reset. Gauges are
+reported per live worker with a ``pid`` label. The directory can be kept
+across restarts; old snapshots are archived like any other.
+
+Under gunicorn ``/metrics`` refuses to answer without the directory, since
+each scrape would report whichever worker happened to answer it.
+
+Scrapes need ``Authorization: Bearer <METRICS_TOKEN>`` when a token is
+configured. Without one only admin sessions are accepted, plus localhost when
+the app runs in debug mode (behind nginx every request comes from localhost).
+"""
+import glob
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines run a single process
+    fcntl = None
+
+from flask import Response, current_app, g, request
+from flask_login import current_user
+from sqlalchemy import event, inspect
+
+from models import db, UserRole, CallLog, LeadFeedback, LeadReassignment
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_values = {}        # (name, labels) -> float, or [bucket counts..., sum, count] for histograms
+_metrics = {}       # name -> Metric, in registration order
+_lock = threading.Lock()
+_flusher = {'thread': None, 'pid': None, 'dir': None, 'interval': 1.0}
+_identity = {'pid': None, 'instance': None}
+_warned = {'no_dir': False}
+
+STALE_AFTER_FLUSHES = 10
+ARCHIVE_FILE = 'metrics_archive.json'
+MAX_ARCHIVED_INSTANCES = 1000
+
+
+class Metric:
+    def __init__(self, kind, name, documentation, labelnames=(), buckets=None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets or DEFAULT_BUCKETS) if kind == 'histogram' else ()
+        _metrics[name] = self
+
+    def _key(self, labels):
+        return self.name, tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            _values[key] = _values.get(key, 0) + amount
+        _ensure_flusher()
+
+    def set(self, value, **labels):
+        with _lock:
+            _values[self._key(labels)] = value
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            slots = _values.get(key)
+            if slots is None:
+                slots = _values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    slots[i] += 1
+            slots[-2] += value
+            slots[-1] += 1
+        _ensure_flusher()
+
+
+def counter(name, documentation, labelnames=()):
+    return Metric('counter', name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=None):
+    return Metric('histogram', name, documentation, labelnames, buckets)
+
+
+def gauge(name, documentation, labelnames=()):
+    return Metric('gauge', name, documentation, labelnames)
+
+
+# -----------------------------
+# Metric definitions
+# -----------------------------
+HTTP_REQUESTS = counter('http_requests_total', 'HTTP requests by endpoint, method and status',
+                        ('blueprint', 'endpoint', 'method', 'status'))
+HTTP_DURATION = histogram('http_request_duration_seconds', 'Request handling time by endpoint',
+                          ('blueprint', 'endpoint'))
+DB_POOL = gauge('db_pool_connections', 'Connection pool state per engine and worker',
+                ('bind', 'state', 'pid'))
+
+CALLS_STARTED = counter('calls_started_total', 'Calls started from the call center')
+CALLS_ENDED = counter('calls_ended_total', 'Calls ended, by final status', ('status',))
+CALL_DURATION = histogram('call_duration_seconds', 'Talk time reported for ended calls',
+                          buckets=(10, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+FEEDBACK_SUBMITTED = counter('feedback_submitted_total', 'Lead feedback saved, by type', ('feedback_type',))
+REASSIGNMENTS = counter('lead_reassignments_total', 'Leads moved from one agent to another')
+ACTIVITY_EVENTS = counter('activity_log_events_total', 'Call-center activity events received',
+                          ('result',))
+IMPORT_JOBS = counter('lead_import_jobs_total', 'Finished lead import jobs, by status', ('status',))
+IMPORT_ROWS = counter('lead_import_rows_total', 'Rows processed by lead imports, by outcome', ('outcome',))
+IMPORT_DURATION = histogram('lead_import_duration_seconds', 'Wall time of lead import jobs',
+                            buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+CRM_DELIVERIES = counter('crm_deliveries_total', 'CRM webhook attempts, by outcome', ('outcome',))
+CRM_DELIVERY_SECONDS = histogram('crm_delivery_seconds', 'CRM webhook request latency')
+
+
+# -----------------------------
+# Multi-process snapshots
+# -----------------------------
+def _snapshot():
+    with _lock:
+        return [[name, list(labels), list(value) if isinstance(value, list) else value]
+                for (name, labels), value in _values.items()]
+
+
+def _write_json(directory, name, data):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+    with os.fdopen(fd, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def _instance_id():
+    """Random per-process id, renewed after a fork, so a recycled pid gets a new snapshot file"""
+    if _identity['pid'] != os.getpid():
+        _identity.update(pid=os.getpid(), instance=uuid.uuid4().hex[:12])
+    return _identity['instance']
+
+
+def _write_snapshot(directory):
+    instance = _instance_id()
+    _write_json(directory, f'metrics_{os.getpid()}_{instance}.json',
+                {'pid': os.getpid(), 'instance': instance, 'values': _snapshot()})
+
+
+def _flush_loop(directory, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            _write_snapshot(directory)
+        except OSError as e:
+            print(f"[Metrics] snapshot failed: {e}")
+
+
+def configure_multiprocess(directory, interval):
+    _flusher.update(dir=directory, interval=interval)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def _ensure_flusher():
+    # Started lazily so each forked gunicorn worker gets its own thread
+    if not _flusher['dir'] or (_flusher['pid'] == os.getpid() and _flusher['thread'].is_alive()):
+        return
+    with _lock:
+        if _flusher['pid'] != os.getpid() or not _flusher['thread'].is_alive():
+            thread = threading.Thread(target=_flush_loop, args=(_flusher['dir'], _flusher['interval']),
+                                      name='metrics-flush', daemon=True)
+            _flusher.update(thread=thread, pid=os.getpid())
+            thread.start()
+
+
+def _read_json(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _add_value(merged, name, labels, value):
+    metric = _metrics.get(name)
+    if metric is None:
+        return
+    key = (name, tuple(labels))
+    if metric.kind == 'histogram':
+        slots = merged.setdefault(key, [0] * len(value))
+        for i, amount in enumerate(value):
+            slots[i] += amount
+    elif metric.kind == 'gauge':
+        merged[key] = value
+    else:
+        merged[key] = merged.get(key, 0) + value
+
+
+def _is_gauge(name):
+    metric = _metrics.get(name)
+    return metric is not None and metric.kind == 'gauge'
+
+
+class _ArchiveLock:
+    """flock on the shared directory so only one worker archives a snapshot"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, '.archive.lock')
+
+    def __enter__(self):
+        self.fh = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fh, fcntl.LOCK_UN)
+        self.fh.close()
+
+
+def _archive_stale(directory, stale_paths):
+    """Fold exited workers' counters and histograms into the archive file, then drop their snapshots"""
+    with _ArchiveLock(directory):
+        archive = _read_json(os.path.join(directory, ARCHIVE_FILE)) or {'instances': [], 'values': []}
+        archived = set(archive['instances'])
+        totals = {}
+        for name, labels, value in archive['values']:
+            _add_value(totals, name, labels, value)
+        added = []
+        for path in stale_paths:
+            data = _read_json(path)
+            if data is None:
+                continue
+            # Listed once it is in the archive, so a crash before the unlink cannot count it twice
+            if data.get('instance') not in archived:
+                for name, labels, value in data.get('values', []):
+                    if not _is_gauge(name):
+                        _add_value(totals, name, labels, value)
+                added.append(data.get('instance'))
+        if added:
+            instances = (archive['instances'] + added)[-MAX_ARCHIVED_INSTANCES:]
+            _write_json(directory, ARCHIVE_FILE, {
+                'instances': instances,
+                'values': [[name, list(labels), value] for (name, labels), value in totals.items()],
+            })
+        for path in stale_paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _merged_values():
+    """Own live values plus the archive and the snapshots of every other live worker"""
+    merged = {}
+    for name, labels, value in _snapshot():
+        _add_value(merged, name, labels, value)
+
+    directory = _flusher['dir']
+    if not directory:
+        return merged
+
+    stale_before = time.time() - STALE_AFTER_FLUSHES * max(_flusher['interval'], 1)
+    own_file = f'metrics_{os.getpid()}_{_instance_id()}.json'
+    stale = []
+    for path in glob.glob(os.path.join(directory, 'metrics_*_*.json')):
+        if os.path.basename(path) == own_file:
+            continue  # counted from live values; archiving it would count it twice
+        try:
+            if os.path.getmtime(path) < stale_before:
+                stale.append(path)
+        except FileNotFoundError:
+            pass
+    if stale:
+        _archive_stale(directory, stale)
+
+    archive = _read_json(os.path.join(directory, ARCHIVE_FILE))
+    for name, labels, value in (archive or {}).get('values', []):
+        _add_value(merged, name, labels, value)
+    for path in glob.glob(os.path.join(directory, 'metrics_*_*.json')):
+        data = _read_json(path)
+        if data is None or data.get('instance') == _instance_id():
+            continue
+        for name, labels, value in data.get('values', []):
+            _add_value(merged, name, labels, value)
+    return merged
+
+
+# -----------------------------
+# Exposition
+# -----------------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    collect_pool_gauges()
+    values = _merged_values()
+    lines = []
+    for metric in _metrics.values():
+        series = sorted((labels, value) for (name, labels), value in values.items() if name == metric.name)
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for labels, value in series:
+            if metric.kind == 'histogram':
+                # Bucket counts are stored cumulatively already
+                for bound, count in zip(metric.buckets, value):
+                    lines.append(f'{metric.name}_bucket{_label_text(metric.labelnames, labels, [("le", bound)])} {count}')
+                lines.append(f'{metric.name}_bucket{_label_text(metric.labelnames, labels, [("le", "+Inf")])} {value[-1]}')
+                lines.append(f'{metric.name}_sum{_label_text(metric.labelnames, labels)} {_number(value[-2])}')
+                lines.append(f'{metric.name}_count{_label_text(metric.labelnames, labels)} {value[-1]}')
+            else:
+                lines.append(f'{metric.name}{_label_text(metric.labelnames, labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def collect_pool_gauges():
+    pid = os.getpid()
+    for bind, engine in db.engines.items():
+        pool = engine.pool
+        for state in ('size', 'checkedout', 'checkedin', 'overflow'):
+            reader = getattr(pool, state, None)
+            if callable(reader):
+                # QueuePool.overflow() goes negative while the pool is below its size
+                value = max(reader(), 0) if state == 'overflow' else reader()
+                DB_POOL.set(value, bind=bind or 'default', state=state, pid=pid)
+
+
+# -----------------------------
+# Flask hooks
+# -----------------------------
+def _start_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is None or request.endpoint in (None, 'static', 'metrics'):
+        return response
+    blueprint = request.blueprint or ''
+    HTTP_REQUESTS.inc(blueprint=blueprint, endpoint=request.endpoint, method=request.method,
+                      status=response.status_code)
+    HTTP_DURATION.observe(time.perf_counter() - started, blueprint=blueprint, endpoint=request.endpoint)
+    # Refreshed per request so every worker's snapshot carries its current pool state
+    collect_pool_gauges()
+    return response
+
+
+def _scrape_allowed():
+    token = current_app.config.get('METRICS_TOKEN')
+    if current_user.is_authenticated and current_user.role == UserRole.ADMIN:
+        return True
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    # Behind nginx every request arrives from localhost, so only trust it in debug mode
+    return current_app.debug and request.remote_addr in ('127.0.0.1', '::1')
+
+
+def metrics_view():
+    if not _scrape_allowed():
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    if not _flusher['dir'] and request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        if not _warned['no_dir']:
+            _warned['no_dir'] = True
+            print("[Metrics] /metrics refused: running under gunicorn without METRICS_MULTIPROC_DIR; "
+                  "each scrape would only see the worker that answered it")
+        return Response('METRICS_MULTIPROC_DIR must be set when running under gunicorn\n',
+                        status=503, mimetype='text/plain')
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    configure_multiprocess(app.config.get('METRICS_MULTIPROC_DIR'), app.config.get('METRICS_FLUSH_INTERVAL', 1))
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+# -----------------------------
+# Domain events from ORM flushes
+# -----------------------------
+# Collected at flush, counted at commit, so rolled-back work is not counted.
+# The call-log write-behind flusher goes through the ORM too.
+def _enum_value(value):
+    return getattr(value, 'value', value)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_domain_events(session, flush_context):
+    events = []
+    for obj in session.new:
+        if isinstance(obj, CallLog):
+            events.append((CALLS_STARTED, {}, None))
+        elif isinstance(obj, LeadFeedback):
+            events.append((FEEDBACK_SUBMITTED, {'feedback_type': _enum_value(obj.feedback_type) or 'none'}, None))
+        elif isinstance(obj, LeadReassignment):
+            events.append((REASSIGNMENTS, {}, None))
+    for obj in session.dirty:
+        if isinstance(obj, CallLog):
+            ended = inspect(obj).attrs.end_time.history
+            if ended.added and ended.added[0] is not None and not any(ended.deleted):
+                events.append((CALLS_ENDED, {'status': _enum_value(obj.status)}, obj.duration_seconds))
+    if events:
+        session.info.setdefault('metric_events', []).extend(events)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _count_domain_events(session):
+    for metric, labels, duration in session.info.pop('metric_events', ()):
+        metric.inc(**labels)
+        if metric is CALLS_ENDED and duration:
+            try:
+                CALL_DURATION.observe(float(duration))
+            except (TypeError, ValueError):
+                pass
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_domain_events(session):
+    session.info.pop('metric_events', None)
@@ -0,0 +1,103 @@
+"""Keyset (seek) pagination: every page costs the same as the first one."""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        payload = {'v': sort_value.isoformat(), 't': 'dt', 'id': row_id}
+    else:
+        payload = {'v': sort_value, 'id': row_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, id) or None for a missing/garbled cursor"""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        value = payload['v']
+        if payload.get('t') == 'dt' and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(payload['id'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def clamp_per_page(value, default=DEFAULT_PER_PAGE):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, MAX_PER_PAGE))
+
+
+def _seek_condition(sort_column, id_column, descending, position, forward=True):
+    """Rows strictly after (forward) or before ``position`` in display order.
+
+    NULL sort values always sort last, in either direction.
+    """
+    value, row_id = position
+    ascending = descending != forward
+    id_past = id_column > row_id if ascending else id_column < row_id
+    if value is None:
+        if forward:
+            return and_(sort_column.is_(None), id_past)
+        return or_(sort_column.isnot(None), and_(sort_column.is_(None), id_past))
+    value_past = sort_column > value if ascending else sort_column < value
+    condition = or_(value_past, and_(sort_column == value, id_past))
+    return or_(condition, sort_column.is_(None)) if forward else condition
+
+
+def _order(sort_column, id_column, descending, forward=True):
+    if descending == forward:
+        sort = sort_column.desc()
+        ids = id_column.desc()
+    else:
+        sort = sort_column.asc()
+        ids = id_column.asc()
+    return [sort.nullslast() if forward else sort.nullsfirst(), ids]
+
+
+def keyset_paginate(query, sort_column, id_column, descending=True, after=None, before=None,
+                    per_page=DEFAULT_PER_PAGE, sort_attr=None, id_attr='id'):
+    """
+    Fetch one page of ``query`` ordered by (sort_column, id_column).
+
+    ``after``/``before`` are opaque cursors from a previous page. Returns a dict
+    with the items and the cursors for the neighbouring pages (None at the ends).
+    """
+    sort_attr = sort_attr or sort_column.key
+    after_position = decode_cursor(after)
+    before_position = None if after_position else decode_cursor(before)
+
+    if before_position:
+        # Walk backwards from the cursor, then restore display order
+        query = query.filter(_seek_condition(sort_column, id_column, descending, before_position, forward=False))
+        rows = query.order_by(*_order(sort_column, id_column, descending, forward=False)).limit(per_page + 1).all()
+        items = list(reversed(rows[:per_page]))
+        has_prev, has_next = len(rows) > per_page, True
+    else:
+        if after_position:
+            query = query.filter(_seek_condition(sort_column, id_column, descending, after_position))
+        rows = query.order_by(*_order(sort_column, id_column, descending)).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_prev, has_next = after_position is not None, len(rows) > per_page
+
+    def cursor_for(item):
+        return encode_cursor(getattr(item, sort_attr), getattr(item, id_attr))
+
+    return {
+        'items': items,
+        'per_page': per_page,
+        'next_cursor': cursor_for(items[-1]) if items and has_next else None,
+        'prev_cursor': cursor_for(items[0]) if items and has_prev else None,
+    }
+
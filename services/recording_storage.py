@@ -0,0 +1,386 @@
+"""Content-addressed storage for call recordings.
+
+``store_recording`` copies an upload in 64KB chunks into a temp file, hashing
+as it goes, and files it under its SHA-256: ``ab/cd/abcd…<sha256>.mp3``. Two
+levels of two-hex-digit shards keep any one directory to a few hundred
+entries, and an upload whose content is already stored is discarded instead of
+written twice. ``LeadFeedback.recording_path`` holds the returned key.
+
+Only the write is streamed, not the request body: Werkzeug has spooled the
+upload to its own temp file before the view runs, so a recording is on disk
+twice until the request ends. The feedback form is capped by
+``MAX_RECORDING_UPLOAD_LENGTH`` rather than the app-wide ``MAX_CONTENT_LENGTH``.
+
+Backends implement ``exists`` / ``claim`` / ``put_file`` / ``send`` /
+``iter_keys`` / ``delete_if_stale``:
+
+* ``local`` (default) - files under ``RECORDINGS_DIR``; downloads go through
+  ``send_file(conditional=True)``, so Range requests get 206 responses and
+  gunicorn's ``wsgi.file_wrapper`` uses ``sendfile``. With
+  ``RECORDINGS_ACCEL_REDIRECT_PREFIX`` set, nginx serves the file instead.
+* ``s3`` - any S3-compatible store via ``boto3`` (point
+  ``RECORDINGS_S3_ENDPOINT_URL`` at a local MinIO for development); downloads
+  redirect to a short-lived presigned URL, which handles Range itself.
+
+Recordings saved before this module (``uploads/recordings/<lead>_<ts>.wav``)
+are still served from ``RECORDINGS_DIR``.
+
+Content-addressed objects are never deleted while a request may be about to
+reference them: an upload that dedupes ``claim``s the existing object, which
+refreshes its age, and orphans are only removed by a sweep
+(``flask gc-recordings``) once they are older than ``RECORDINGS_GC_GRACE``.
+On the local backend ``claim`` and ``delete_if_stale`` also serialise on a
+lock file, so a sweep cannot delete an object between an upload's claim and
+its commit.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines; the sweep is not run there
+    fcntl = None
+
+from flask import current_app, abort, redirect, send_file, make_response
+from werkzeug.utils import safe_join
+
+CHUNK_SIZE = 64 * 1024
+SWEEP_BATCH_SIZE = 500
+KEY_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]+)?$')
+
+mimetypes.add_type('audio/mp4', '.m4a')
+
+
+@dataclass
+class StoredRecording:
+    key: str
+    sha256: str
+    size: int
+    deduplicated: bool
+
+
+def content_key(digest, ext):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}" if ext else f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def recording_mimetype(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class RecordingBackend:
+    """Interface every storage backend implements"""
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def claim(self, key):
+        """True if ``key`` is stored; also resets its age so a sweep keeps it"""
+        raise NotImplementedError
+
+    def put_file(self, key, path):
+        """Take ownership of the finished temp file at ``path`` and store it as ``key``"""
+        raise NotImplementedError
+
+    def send(self, key):
+        """Flask response that delivers the object to the browser"""
+        raise NotImplementedError
+
+    def local_copy(self, key):
+        """Context manager yielding a filesystem path with the object's bytes"""
+        raise NotImplementedError
+
+    def iter_keys(self):
+        """Every content-addressed key in the store"""
+        raise NotImplementedError
+
+    def delete_if_stale(self, key, cutoff):
+        """Delete ``key`` if it was last stored or claimed before ``cutoff`` (epoch seconds)"""
+        raise NotImplementedError
+
+
+class LocalFSBackend(RecordingBackend):
+    def __init__(self, root, accel_prefix=None):
+        self.root = os.path.abspath(root)
+        self.accel_prefix = accel_prefix
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    @contextmanager
+    def _sweep_lock(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, '.sweep.lock'), 'a') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def claim(self, key):
+        with self._sweep_lock(exclusive=False):
+            try:
+                os.utime(self.path(key))
+                return True
+            except FileNotFoundError:
+                return False
+
+    def put_file(self, key, path):
+        final = self.path(key)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        # Same filesystem as the staging dir, so the rename is atomic: readers
+        # never see a half-written recording
+        os.replace(path, final)
+
+    def send(self, key):
+        path = self.path(key)
+        if not os.path.isfile(path):
+            abort(404)
+        if self.accel_prefix:
+            resp = make_response('')
+            resp.headers['X-Accel-Redirect'] = f"{self.accel_prefix.rstrip('/')}/{key}"
+            resp.headers['Content-Type'] = recording_mimetype(key)
+            return resp
+        return send_file(path, mimetype=recording_mimetype(key), conditional=True)
+
+    @contextmanager
+    def local_copy(self, key):
+        yield self.path(key)
+
+    def iter_keys(self):
+        for directory, subdirs, files in os.walk(self.root):
+            subdirs[:] = [name for name in subdirs if not name.startswith('.')]
+            prefix = os.path.relpath(directory, self.root).replace(os.sep, '/')
+            for name in files:
+                key = f"{prefix}/{name}"
+                if KEY_RE.match(key):
+                    yield key
+
+    def delete_if_stale(self, key, cutoff):
+        # Shard directories are left in place: removing them would race with
+        # put_file's makedirs
+        path = self.path(key)
+        with self._sweep_lock(exclusive=True):
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    return False
+                os.remove(path)
+                return True
+            except FileNotFoundError:
+                return False
+
+
+class S3Backend(RecordingBackend):
+    """S3-compatible object store; needs the ``boto3`` package"""
+
+    def __init__(self, bucket, prefix='recordings/', endpoint_url=None, url_expiry=300):
+        import boto3
+
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_expiry = url_expiry
+
+    def object_name(self, key):
+        return self.prefix + key
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_name(key))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def claim(self, key):
+        if not self.exists(key):
+            return False
+        # Copying an object onto itself resets LastModified, which the sweep goes by
+        name = self.object_name(key)
+        self.client.copy_object(Bucket=self.bucket, Key=name, CopySource={'Bucket': self.bucket, 'Key': name},
+                                MetadataDirective='REPLACE', ContentType=recording_mimetype(key))
+        return True
+
+    def put_file(self, key, path):
+        try:
+            self.client.upload_file(path, self.bucket, self.object_name(key),
+                                    ExtraArgs={'ContentType': recording_mimetype(key)})
+        finally:
+            os.remove(path)
+
+    def send(self, key):
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.object_name(key)},
+            ExpiresIn=self.url_expiry)
+        return redirect(url)
+
+    @contextmanager
+    def local_copy(self, key):
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.object_name(key), path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def iter_keys(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                key = item['Key'][len(self.prefix):]
+                if KEY_RE.match(key):
+                    yield key
+
+    def delete_if_stale(self, key, cutoff):
+        from botocore.exceptions import ClientError
+
+        name = self.object_name(key)
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=name)
+        except ClientError:
+            return False
+        if head['LastModified'].timestamp() >= cutoff:
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=name)
+        return True
+
+
+_backends = {}
+
+
+def get_backend():
+    config = current_app.config
+    name = config.get('RECORDING_STORAGE_BACKEND', 'local')
+    if name not in _backends:
+        if name == 's3':
+            _backends[name] = S3Backend(
+                config['RECORDINGS_S3_BUCKET'],
+                prefix=config.get('RECORDINGS_S3_PREFIX', 'recordings/'),
+                endpoint_url=config.get('RECORDINGS_S3_ENDPOINT_URL'),
+            )
+        elif name == 'local':
+            _backends[name] = LocalFSBackend(config.get('RECORDINGS_DIR', 'uploads/recordings'),
+                                             accel_prefix=config.get('RECORDINGS_ACCEL_REDIRECT_PREFIX'))
+        else:
+            raise ValueError(f"Unknown RECORDING_STORAGE_BACKEND: {name}")
+    return _backends[name]
+
+
+def _staging_dir():
+    # Inside RECORDINGS_DIR so the local backend's final rename never crosses filesystems
+    path = os.path.join(os.path.abspath(current_app.config.get('RECORDINGS_DIR', 'uploads/recordings')), '.incoming')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# -----------------------------
+# Public API
+# -----------------------------
+def store_recording(stream, ext):
+    """Stream ``stream`` into storage and return a ``StoredRecording``"""
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=_staging_dir(), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        key = content_key(sha256, ext)
+        backend = get_backend()
+        if backend.claim(key):
+            os.remove(tmp_path)
+            return StoredRecording(key, sha256, size, deduplicated=True)
+        backend.put_file(key, tmp_path)
+        return StoredRecording(key, sha256, size, deduplicated=False)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _legacy_path(key):
+    # Legacy rows store 'uploads/recordings/<name>' relative to the working directory
+    legacy_root = os.path.abspath(current_app.config.get('RECORDINGS_DIR', 'uploads/recordings'))
+    return safe_join(legacy_root, os.path.basename(key))
+
+
+def send_recording(key):
+    """Download response for a stored key (or a pre-content-addressing path)"""
+    if KEY_RE.match(key):
+        return get_backend().send(key)
+
+    path = _legacy_path(key)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return send_file(path, mimetype=recording_mimetype(path), conditional=True)
+
+
+@contextmanager
+def local_recording(key):
+    """Filesystem path holding the recording's bytes, for tools like ffmpeg"""
+    if KEY_RE.match(key):
+        with get_backend().local_copy(key) as path:
+            yield path
+        return
+
+    path = _legacy_path(key)
+    if path is None or not os.path.isfile(path):
+        raise FileNotFoundError(key)
+    yield path
+
+
+def delete_legacy_recording(key):
+    """Remove a pre-content-addressing file; each upload had its own, so this is safe inline"""
+    path = _legacy_path(key)
+    if path and os.path.isfile(path):
+        os.remove(path)
+
+
+def sweep_recordings(referenced, grace_seconds):
+    """Delete stored objects ``referenced(keys)`` does not return, once older than the grace period
+
+    ``referenced`` gets batches of keys and returns the subset still in use.
+    Returns ``(checked, deleted)``.
+    """
+    backend = get_backend()
+    cutoff = time.time() - grace_seconds
+    checked = deleted = 0
+    batch = []
+
+    def sweep(keys):
+        in_use = referenced(keys)
+        return sum(backend.delete_if_stale(key, cutoff) for key in keys if key not in in_use)
+
+    for key in backend.iter_keys():
+        batch.append(key)
+        if len(batch) >= SWEEP_BATCH_SIZE:
+            checked, deleted = checked + len(batch), deleted + sweep(batch)
+            batch = []
+    if batch:
+        checked, deleted = checked + len(batch), deleted + sweep(batch)
+    return checked, deleted
@@ -0,0 +1,196 @@
+"""Cache for rarely-changing reference data: projects, locations, active agents.
+
+Values are plain dicts (safe to share between threads and requests) and are
+kept in a per-process TTL + LRU cache. Set ``REFERENCE_CACHE_REDIS_URL`` to
+add a shared Redis tier, so a fresh gunicorn worker gets the data without a
+query and an invalidation reaches every worker: the per-process copy then
+only lives ``REFERENCE_CACHE_LOCAL_TTL`` seconds before it is re-read from
+Redis. Without Redis, other workers catch up within ``REFERENCE_CACHE_TTL``
+seconds. A TTL of 0 turns the cache off. Each entry carries an ETag so the
+JSON APIs can answer ``304 Not Modified``.
+
+The admin routes that change this data call ``invalidate_reference``.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from models import db, User, UserRole, Project, Location
+
+SHARED_KEY_PREFIX = 'reference-cache:'
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize=128, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if ttl <= 0:
+                self._entries.pop(key, None)
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Optional shared tier; needs the ``redis`` package"""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self.client.get(SHARED_KEY_PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, value, ttl):
+        self.client.set(SHARED_KEY_PREFIX + key, json.dumps(value), ex=int(ttl))
+
+    def add(self, key, value, ttl):
+        """Set only if the key is absent, so a slow reader cannot overwrite a newer value"""
+        self.client.set(SHARED_KEY_PREFIX + key, json.dumps(value), ex=int(ttl), nx=True)
+
+    def delete(self, *keys):
+        self.client.delete(*(SHARED_KEY_PREFIX + key for key in keys))
+
+
+_local = TTLCache()
+_shared = {}
+
+
+def shared_backend():
+    url = current_app.config.get('REFERENCE_CACHE_REDIS_URL')
+    if not url:
+        return None
+    if url not in _shared:
+        try:
+            _shared[url] = RedisBackend(url)
+        except ImportError:
+            print("[Reference Cache] redis package not installed; using the in-process cache only")
+            _shared[url] = None
+    return _shared[url]
+
+
+# -----------------------------
+# Loaders
+# -----------------------------
+def _load_projects():
+    return [{'id': p.id, 'project_id': p.project_id, 'name': p.name}
+            for p in Project.query.order_by(Project.name)]
+
+
+def _load_locations():
+    return [{'id': l.id, 'name': l.name} for l in Location.query.order_by(Location.name)]
+
+
+def _load_active_agents():
+    rows = db.session.query(User.id, User.username)\
+        .filter(User.role == UserRole.AGENT, User.is_active == True)\
+        .order_by(User.username)
+    return [{'id': row.id, 'username': row.username} for row in rows]
+
+
+LOADERS = {
+    'projects': _load_projects,
+    'locations': _load_locations,
+    'active_agents': _load_active_agents,
+}
+
+
+def _make_entry(data):
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return {'data': data, 'etag': hashlib.sha1(body.encode()).hexdigest()}
+
+
+def _get_entry(name):
+    entry = _local.get(name)
+    if entry is not None:
+        return entry
+
+    ttl = current_app.config.get('REFERENCE_CACHE_TTL', 300)
+    shared = shared_backend()
+    if shared is not None:
+        try:
+            entry = shared.get(name)
+        except Exception as e:
+            print(f"[Reference Cache] shared get failed: {e}")
+    if entry is None:
+        entry = _make_entry(LOADERS[name]())
+        if shared is not None and ttl > 0:
+            try:
+                shared.set(name, entry, ttl)
+            except Exception as e:
+                print(f"[Reference Cache] shared set failed: {e}")
+
+    # Invalidations only reach other workers through Redis, so keep their local copies short-lived
+    if shared is not None:
+        ttl = min(ttl, current_app.config.get('REFERENCE_CACHE_LOCAL_TTL', 5))
+    _local.set(name, entry, ttl)
+    return entry
+
+
+# -----------------------------
+# Public API
+# -----------------------------
+def get_reference(name):
+    """Return ``(data, etag)`` for projects, locations or active_agents"""
+    entry = _get_entry(name)
+    return entry['data'], entry['etag']
+
+
+def get_projects():
+    return get_reference('projects')[0]
+
+
+def get_locations():
+    return get_reference('locations')[0]
+
+
+def get_other_active_agents(agent_id):
+    return [agent for agent in get_reference('active_agents')[0] if agent['id'] != agent_id]
+
+
+def invalidate_reference(*names):
+    """Drop cached entries after the underlying rows change"""
+    for name in names:
+        _local.delete(name)
+    shared = shared_backend()
+    if shared is not None:
+        try:
+            shared.delete(*names)
+        except Exception as e:
+            print(f"[Reference Cache] shared delete failed: {e}")
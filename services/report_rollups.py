@@ -0,0 +1,220 @@
+"""Daily per-agent / per-project report rollups, maintained incrementally.
+
+Every flush that inserts, updates or deletes a CallLog, LeadFeedback or Lead
+folds its effect into ``report_rollup`` inside the same transaction, so the
+reports page reads a few hundred summary rows instead of scanning history.
+Lead status changes move a lead between the ``lead_status:<status>`` metrics,
+so the status distribution needs no scan of ``lead`` either.
+Bulk Core inserts (the lead importer) call ``add_rollup_counts`` themselves;
+``backfill_rollups`` rebuilds everything from the source tables.
+
+Every write also bumps an all-time row per metric (day ``ALL_TIME_DAY``,
+agent and project 0), so the distribution totals read one row per metric
+however many days of history there are. Databases rolled up before the
+all-time rows and the lead status metrics existed need one
+``flask backfill-rollups``.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Lead, LeadFeedback, CallLog, ReportRollup
+
+# Sentinel day of the all-time rows; before any real day, so date ranges skip it
+ALL_TIME_DAY = date(1900, 1, 1)
+
+
+def _day(value):
+    if value is None:
+        return datetime.utcnow().date()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _as_date(value):
+    # func.date() comes back as text on SQLite and as a date on PostgreSQL
+    return date.fromisoformat(value) if isinstance(value, str) else _day(value)
+
+
+def _enum_value(value):
+    return getattr(value, 'value', value)
+
+
+# -----------------------------
+# Writes
+# -----------------------------
+def add_rollup_counts(connection, deltas):
+    """Upsert {(day, agent_id, project_id, metric): delta} into report_rollup
+
+    The deltas are added to the metrics' all-time rows as well.
+    """
+    rows = [
+        {'day': day, 'agent_id': agent_id or 0, 'project_id': project_id or 0, 'metric': metric, 'count': delta}
+        for (day, agent_id, project_id, metric), delta in deltas.items() if delta
+    ]
+    all_time = Counter()
+    for row in rows:
+        all_time[row['metric']] += row['count']
+    rows += [{'day': ALL_TIME_DAY, 'agent_id': 0, 'project_id': 0, 'metric': metric, 'count': total}
+             for metric, total in all_time.items() if total]
+    if not rows:
+        return
+
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    table = ReportRollup.__table__
+    statement = dialect.insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=['day', 'agent_id', 'project_id', 'metric'],
+        set_={'count': table.c.count + statement.excluded.count}
+    )
+    connection.execute(statement, rows)
+
+
+def lead_status_metric(status):
+    return f'lead_status:{status}'
+
+
+def _call_log_deltas(call_log, sign, deltas, status=None):
+    key = (_day(call_log.call_time), call_log.agent_id, 0)
+    deltas[key + ('calls',)] += sign
+    deltas[key + (f'call_status:{_enum_value(status or call_log.status)}',)] += sign
+
+
+def _collect_deltas(session):
+    deltas = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, CallLog):
+            _call_log_deltas(obj, 1, deltas)
+        elif isinstance(obj, LeadFeedback):
+            deltas[(_day(obj.created_at), obj.agent_id, 0, f'feedback:{_enum_value(obj.feedback_type)}')] += 1
+        elif isinstance(obj, Lead):
+            key = (_day(obj.created_at), 0, obj.project_id)
+            deltas[key + ('leads_created',)] += 1
+            deltas[key + (lead_status_metric(obj.status),)] += 1
+
+    for obj in session.dirty:
+        if isinstance(obj, CallLog):
+            history = inspect(obj).attrs.status.history
+            if history.deleted and history.added:
+                _call_log_deltas(obj, -1, deltas, status=history.deleted[0])
+                _call_log_deltas(obj, 1, deltas, status=history.added[0])
+        elif isinstance(obj, LeadFeedback):
+            history = inspect(obj).attrs.feedback_type.history
+            if history.deleted and history.added:
+                key = (_day(obj.created_at), obj.agent_id, 0)
+                deltas[key + (f'feedback:{_enum_value(history.deleted[0])}',)] -= 1
+                deltas[key + (f'feedback:{_enum_value(history.added[0])}',)] += 1
+        elif isinstance(obj, Lead):
+            history = inspect(obj).attrs.status.history
+            if history.deleted and history.added:
+                key = (_day(obj.created_at), 0, obj.project_id)
+                deltas[key + (lead_status_metric(history.deleted[0]),)] -= 1
+                deltas[key + (lead_status_metric(history.added[0]),)] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, CallLog):
+            _call_log_deltas(obj, -1, deltas)
+        elif isinstance(obj, LeadFeedback):
+            deltas[(_day(obj.created_at), obj.agent_id, 0, f'feedback:{_enum_value(obj.feedback_type)}')] -= 1
+        elif isinstance(obj, Lead):
+            # The row was counted under its committed status, even if it changed before the delete
+            history = inspect(obj).attrs.status.history
+            key = (_day(obj.created_at), 0, obj.project_id)
+            deltas[key + ('leads_created',)] -= 1
+            deltas[key + (lead_status_metric(history.deleted[0] if history.deleted else obj.status),)] -= 1
+
+    return deltas
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_rollups(session, flush_context):
+    deltas = _collect_deltas(session)
+    if deltas:
+        add_rollup_counts(session.connection(), deltas)
+
+
+def forget_lead_activity(lead_id):
+    """Subtract a lead's calls and feedback before they are bulk-deleted"""
+    deltas = Counter()
+    for call_time, agent_id, status in db.session.query(
+            CallLog.call_time, CallLog.agent_id, CallLog.status).filter(CallLog.lead_id == lead_id):
+        key = (_day(call_time), agent_id, 0)
+        deltas[key + ('calls',)] -= 1
+        deltas[key + (f'call_status:{_enum_value(status)}',)] -= 1
+    for created_at, agent_id, feedback_type in db.session.query(
+            LeadFeedback.created_at, LeadFeedback.agent_id, LeadFeedback.feedback_type).filter(LeadFeedback.lead_id == lead_id):
+        deltas[(_day(created_at), agent_id, 0, f'feedback:{_enum_value(feedback_type)}')] -= 1
+    add_rollup_counts(db.session.connection(), deltas)
+
+
+# -----------------------------
+# Backfill
+# -----------------------------
+def backfill_rollups():
+    """Rebuild report_rollup from the full Lead, CallLog and LeadFeedback history"""
+    deltas = Counter()
+
+    call_day = db.func.date(CallLog.call_time)
+    for day, agent_id, status, count in db.session.query(
+            call_day, CallLog.agent_id, CallLog.status, db.func.count(CallLog.id)
+    ).group_by(call_day, CallLog.agent_id, CallLog.status):
+        day = _as_date(day)
+        deltas[(day, agent_id, 0, 'calls')] += count
+        deltas[(day, agent_id, 0, f'call_status:{_enum_value(status)}')] += count
+
+    feedback_day = db.func.date(LeadFeedback.created_at)
+    for day, agent_id, feedback_type, count in db.session.query(
+            feedback_day, LeadFeedback.agent_id, LeadFeedback.feedback_type, db.func.count(LeadFeedback.id)
+    ).group_by(feedback_day, LeadFeedback.agent_id, LeadFeedback.feedback_type):
+        day = _as_date(day)
+        deltas[(day, agent_id, 0, f'feedback:{_enum_value(feedback_type)}')] += count
+
+    lead_day = db.func.date(Lead.created_at)
+    for day, project_id, status, count in db.session.query(
+            lead_day, Lead.project_id, Lead.status, db.func.count(Lead.id)
+    ).group_by(lead_day, Lead.project_id, Lead.status):
+        day = _as_date(day)
+        deltas[(day, 0, project_id, 'leads_created')] += count
+        deltas[(day, 0, project_id, lead_status_metric(status))] += count
+
+    ReportRollup.query.delete()
+    add_rollup_counts(db.session.connection(), deltas)
+    db.session.commit()
+    return len(deltas)
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+def metric_totals(prefix):
+    """[(suffix, total)] for every metric starting with ``prefix:``; a null value comes back as None"""
+    rows = db.session.query(ReportRollup.metric, ReportRollup.count)\
+        .filter(ReportRollup.metric.like(f'{prefix}:%'), ReportRollup.day == ALL_TIME_DAY)\
+        .all()
+    totals = []
+    for metric, total in rows:
+        suffix = metric.split(':', 1)[1]
+        if total:
+            totals.append((None if suffix == 'None' else suffix, total))
+    return sorted(totals, key=lambda item: -item[1])
+
+
+def metric_total(metric):
+    return db.session.query(ReportRollup.count)\
+        .filter(ReportRollup.metric == metric, ReportRollup.day == ALL_TIME_DAY)\
+        .scalar() or 0
+
+
+def monthly_totals(metric, months=6):
+    """[(YYYY-MM, total)] for the last ``months`` months, oldest first"""
+    since = datetime.utcnow().date() - timedelta(days=30 * months)
+    rows = db.session.query(ReportRollup.day, db.func.sum(ReportRollup.count))\
+        .filter(ReportRollup.metric == metric, ReportRollup.day >= since)\
+        .group_by(ReportRollup.day)\
+        .all()
+    totals = Counter()
+    for day, total in rows:
+        totals[day.strftime('%Y-%m')] += int(total)
+    return sorted(totals.items())
@@ -0,0 +1,229 @@
+"""Per-request database and template profiling.
+
+While a request runs, SQLAlchemy cursor events count its queries and time
+them, and Flask's template signals time ``render_template``. When the response
+goes out:
+
+* a ``Server-Timing`` header carries ``db`` (with the query count),
+  ``tmpl`` and ``app`` durations, so the browser's network panel shows where
+  the time went. ``PERF_SERVER_TIMING`` is ``admin`` by default (admin
+  sessions only, so anonymous visitors learn nothing about the internals),
+  ``all`` for every response, or ``off``;
+* the numbers are added to a rolling window of ``PERF_SAMPLES_PER_ENDPOINT``
+  samples per endpoint, which ``/admin/api/perf`` reports as percentiles along
+  with each endpoint's slowest statement;
+* a statement executed ``PERF_N_PLUS_ONE_THRESHOLD`` or more times with
+  identical SQL (parameters aside) in one request is logged as a likely N+1,
+  and any statement slower than ``PERF_SLOW_QUERY_MS`` is logged too.
+
+Streamed responses (the CSV exports) run most of their queries after the
+view returns, so they are recorded when the response is closed instead, and
+get no ``Server-Timing`` header: it has to go out before the body.
+
+Background threads (write-behind flushes, the CRM and media workers) have no
+request context and are not counted. Statistics are per worker process.
+"""
+import threading
+import time
+from collections import Counter, deque
+
+from flask import current_app, g, has_request_context, request, template_rendered, before_render_template
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import UserRole
+
+METRICS = ('total_ms', 'db_ms', 'queries', 'template_ms')
+PERCENTILES = (50, 90, 95, 99)
+MAX_STATEMENT_LENGTH = 500
+
+
+class EndpointStats:
+    def __init__(self, window):
+        self.samples = {metric: deque(maxlen=window) for metric in METRICS}
+        self.requests = 0
+        self.slowest_statement = None
+        self.slowest_statement_ms = 0.0
+        self.n_plus_one = 0
+        self.last_n_plus_one = None
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+_engine_hooks_installed = False
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted sequence"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def _state():
+    if not has_request_context():
+        return None
+    return g.get('_perf')
+
+
+# -----------------------------
+# SQLAlchemy hooks
+# -----------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _state() is not None:
+        conn.info.setdefault('_perf_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = _state()
+    started = conn.info.get('_perf_started')
+    if state is None or not started:
+        return
+    elapsed = (time.perf_counter() - started.pop()) * 1000
+    state['queries'] += 1
+    state['db_ms'] += elapsed
+    state['statements'][statement] += 1
+    if elapsed > state['slowest_ms']:
+        state['slowest_ms'] = elapsed
+        state['slowest'] = statement
+    if elapsed >= state['slow_query_ms']:
+        print(f"[Perf] slow query on {request.endpoint}: {elapsed:.1f}ms {statement[:MAX_STATEMENT_LENGTH]}")
+
+
+def _install_engine_hooks():
+    # Listening on the Engine class covers the primary, the replica bind and
+    # every app instance in the process
+    global _engine_hooks_installed
+    if not _engine_hooks_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _engine_hooks_installed = True
+
+
+# -----------------------------
+# Flask hooks
+# -----------------------------
+def _before_render(sender, template, context, **extra):
+    state = _state()
+    if state is not None:
+        state['render_started'].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    state = _state()
+    if state is not None and state['render_started']:
+        state['template_ms'] += (time.perf_counter() - state['render_started'].pop()) * 1000
+
+
+def _start_request():
+    config = current_app.config
+    g._perf = {
+        'started': time.perf_counter(),
+        'queries': 0,
+        'db_ms': 0.0,
+        'template_ms': 0.0,
+        'slowest': None,
+        'slowest_ms': 0.0,
+        'statements': Counter(),
+        'render_started': [],
+        'slow_query_ms': config.get('PERF_SLOW_QUERY_MS', 200),
+    }
+
+
+def _server_timing_allowed(mode):
+    if mode == 'all':
+        return True
+    if mode == 'admin':
+        return current_user.is_authenticated and current_user.role == UserRole.ADMIN
+    return False
+
+
+def _finish_request(response):
+    state = g.get('_perf')
+    if state is None:
+        return response
+    config = current_app.config
+    endpoint = request.endpoint or 'unmatched'
+    path = request.path
+
+    if response.is_streamed:
+        # The body (and its queries) is produced after this hook; keep g._perf
+        # for the cursor hooks and record once the server closes the response
+        response.call_on_close(lambda: _record(state, endpoint, path, config))
+        return response
+
+    g.pop('_perf')
+    total_ms = _record(state, endpoint, path, config)
+    if _server_timing_allowed(config.get('PERF_SERVER_TIMING', 'admin')):
+        response.headers.add('Server-Timing', f'db;dur={state["db_ms"]:.1f};desc="{state["queries"]} queries"')
+        response.headers.add('Server-Timing', f'tmpl;dur={state["template_ms"]:.1f}')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.1f}')
+    return response
+
+
+def _record(state, endpoint, path, config):
+    """Add a finished request to its endpoint's window; returns its total ms"""
+    total_ms = (time.perf_counter() - state['started']) * 1000
+    threshold = config.get('PERF_N_PLUS_ONE_THRESHOLD', 5)
+    repeated = [(statement, count) for statement, count in state['statements'].items() if count >= threshold]
+    for statement, count in repeated:
+        print(f"[Perf] possible N+1 in {endpoint} ({path}): {count}x {statement[:MAX_STATEMENT_LENGTH]}")
+
+    with _stats_lock:
+        stats = _stats.get(endpoint)
+        if stats is None:
+            stats = _stats[endpoint] = EndpointStats(config.get('PERF_SAMPLES_PER_ENDPOINT', 500))
+        stats.requests += 1
+        for metric, value in (('total_ms', total_ms), ('db_ms', state['db_ms']),
+                              ('queries', state['queries']), ('template_ms', state['template_ms'])):
+            stats.samples[metric].append(value)
+        if state['slowest_ms'] > stats.slowest_statement_ms:
+            stats.slowest_statement_ms = state['slowest_ms']
+            stats.slowest_statement = state['slowest'][:MAX_STATEMENT_LENGTH]
+        if repeated:
+            stats.n_plus_one += 1
+            statement, count = max(repeated, key=lambda item: item[1])
+            stats.last_n_plus_one = {'statement': statement[:MAX_STATEMENT_LENGTH], 'count': count}
+    return total_ms
+
+
+def init_request_profiler(app):
+    if not app.config.get('PERF_PROFILING_ENABLED', True):
+        return
+    _install_engine_hooks()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def perf_snapshot():
+    """Per-endpoint percentiles over the recent window"""
+    with _stats_lock:
+        copies = {endpoint: (stats.requests, {m: list(v) for m, v in stats.samples.items()},
+                             stats.slowest_statement, stats.slowest_statement_ms,
+                             stats.n_plus_one, stats.last_n_plus_one)
+                  for endpoint, stats in _stats.items()}
+
+    report = {}
+    for endpoint, (requests, samples, slowest, slowest_ms, n_plus_one, last_n_plus_one) in copies.items():
+        entry = {'requests': requests, 'window': len(samples['total_ms'])}
+        for metric, values in samples.items():
+            entry[metric] = {f'p{pct}': round(percentile(values, pct), 2) for pct in PERCENTILES}
+            entry[metric]['max'] = round(max(values), 2) if values else 0
+        entry['slowest_statement'] = {'ms': round(slowest_ms, 2), 'sql': slowest}
+        entry['n_plus_one_requests'] = n_plus_one
+        entry['last_n_plus_one'] = last_n_plus_one
+        report[endpoint] = entry
+    return report
+
+
+def reset_perf_stats():
+    with _stats_lock:
+        _stats.clear()
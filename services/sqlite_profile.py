@@ -0,0 +1,73 @@
+"""Production settings for running on a SQLite file under several gunicorn workers.
+
+With the default rollback journal a writer blocks every reader and a second
+writer fails straight away with "database is locked". The profile switches
+the database to WAL, so readers never wait for the writer, gives writers a
+``busy_timeout`` to queue behind each other, and sizes the page cache and
+memory map for a read-heavy workload. ``SQLITE_PRODUCTION_PROFILE=0`` turns it
+off; ``SQLITE_PRAGMAS`` overrides individual pragmas.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,           # ms a writer waits for the lock before "database is locked"
+    'synchronous': 'NORMAL',        # safe with WAL; fsync at checkpoints instead of every commit
+    'mmap_size': 268435456,         # 256 MB memory-mapped reads
+    'cache_size': -65536,           # 64 MB page cache per connection (negative = KiB)
+    'temp_store': 'MEMORY',
+}
+
+DEFAULT_ENGINE_OPTIONS = {
+    'poolclass': QueuePool,
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+    # Threads in one worker share the pool; SQLite serialises access itself
+    'connect_args': {'check_same_thread': False},
+}
+
+
+def _is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def configure_sqlite_profile(app):
+    """Set pool options before ``db.init_app``; returns True when the profile applies"""
+    if not app.config.get('SQLITE_PRODUCTION_PROFILE') or not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return False
+    options = dict(DEFAULT_ENGINE_OPTIONS)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    return True
+
+
+def install_sqlite_pragmas(app):
+    """Run the profile pragmas on every new connection of the app's SQLite engines"""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    # The primary and, when configured, a SQLite read replica
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', on_connect)
@@ -0,0 +1,129 @@
+"""Cache for Flask-Login's user_loader so requests skip loading the ``user`` row.
+
+Each entry is a detached snapshot of the User's columns, keyed by user id and
+tagged with the user's ``session_version``. Committing any change to a User
+(password reset, activation/deactivation, role change) gives it a new random
+``session_version``, and a snapshot is only served while its tag matches the
+current one, so the change takes effect in every worker on the next request.
+
+The current version comes from Redis when ``REFERENCE_CACHE_REDIS_URL`` is
+set (no database query on a hit); otherwise from a single-column
+primary-key read of ``user.session_version``, which still saves loading and
+building the full row. ``load_cached_user`` merges the snapshot into the
+request's session with ``load=False``, so relationships still lazy-load
+normally. ``USER_CACHE_TTL=0`` turns the cache off.
+"""
+import uuid
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, User
+from services.reference_cache import TTLCache, shared_backend
+
+# How long Redis keeps a version nobody has changed; a miss falls back to the database
+SHARED_VERSION_TTL = 86400
+
+_cache = TTLCache(maxsize=2048, ttl=30)
+
+
+def _version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def session_version(user_id):
+    """The user's current session version, or None if the user no longer exists"""
+    shared = shared_backend()
+    if shared is not None:
+        try:
+            version = shared.get(_version_key(user_id))
+            if version is not None:
+                return version
+        except Exception as e:
+            print(f"[User Cache] shared get failed: {e}")
+
+    version = db.session.query(User.session_version).filter(User.id == user_id).scalar()
+    if shared is not None and version is not None:
+        try:
+            shared.add(_version_key(user_id), version, SHARED_VERSION_TTL)
+        except Exception as e:
+            print(f"[User Cache] shared set failed: {e}")
+    return version
+
+
+def invalidate_user(*user_ids):
+    """Drop this worker's snapshots of these users"""
+    for user_id in user_ids:
+        _cache.delete(user_id)
+
+
+def _snapshot(user):
+    copy = User()
+    for attr in inspect(User).column_attrs:
+        setattr(copy, attr.key, getattr(user, attr.key))
+    make_transient_to_detached(copy)
+    return copy
+
+
+def load_cached_user(user_id):
+    """user_loader body: cached snapshot merged into db.session, else one SELECT"""
+    version = session_version(user_id)
+    if version is None:
+        invalidate_user(user_id)
+        return None
+    cached = _cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return db.session.merge(cached[1], load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        # Tagged with the version read before the row, so a change in between forces a reload
+        _cache.set(user_id, (version, _snapshot(user)), ttl=current_app.config.get('USER_CACHE_TTL', 30))
+    return user
+
+
+@event.listens_for(db.session, 'before_flush')
+def _stamp_session_versions(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj, include_collections=False):
+            obj.session_version = uuid.uuid4().hex
+
+
+# Publish the new versions only once the change is committed, so a concurrent
+# request cannot re-cache the old row between flush and commit
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_user_versions', {})
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            changed[obj.id] = obj.session_version
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed[obj.id] = None
+    if not changed:
+        session.info.pop('changed_user_versions')
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_committed_users(session):
+    changed = session.info.pop('changed_user_versions', None)
+    if not changed:
+        return
+    invalidate_user(*changed)
+    shared = shared_backend()
+    if shared is None:
+        return
+    try:
+        for user_id, version in changed.items():
+            if version is None:
+                shared.delete(_version_key(user_id))
+            else:
+                shared.set(_version_key(user_id), version, SHARED_VERSION_TTL)
+    except Exception as e:
+        print(f"[User Cache] shared set failed: {e}")
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_user_versions', None)
@@ -0,0 +1,231 @@
+"""In-process write-behind buffers that group many small writes into one commit.
+
+Request handlers ``submit`` rows and return immediately; a daemon thread per
+buffer drains them every ``max_latency`` seconds, or as soon as ``max_batch``
+rows are waiting, and hands each batch to ``write_batch`` inside an app
+context. Anything still buffered is flushed at interpreter exit.
+
+A buffer created with ``coalesce=True`` takes ``(key, fields)`` pairs and
+merges pending updates to the same key (with ``merge(pending, fields)`` if
+given, else ``dict.update``), so only the latest values are written.
+
+A batch is never dropped because one commit failed:
+
+* a transient error (database locked, connection lost) is retried
+  ``WRITE_RETRIES`` times with backoff; if it persists the batch goes back to
+  the head of the buffer and is retried on the next flush;
+* any other error splits the batch into one commit per row, so only the rows
+  that fail on their own are rejected (and printed, so they can be recovered).
+"""
+import atexit
+import os
+import threading
+import time
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from models import db
+
+WRITE_RETRIES = 3
+RETRY_BACKOFF = 0.05  # seconds, doubled after every failed attempt
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+class WriteBehindBuffer:
+    def __init__(self, name, write_batch, max_batch=500, max_latency=0.5, coalesce=False, merge=None):
+        self.name = name
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.coalesce = coalesce
+        self.merge = merge or dict.update
+        self._items = {} if coalesce else []
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._counters = {
+            'submitted': 0,
+            'coalesced': 0,
+            'written': 0,
+            'batches': 0,
+            'retries': 0,
+            'requeued': 0,
+            'split_batches': 0,
+            'rejected': 0,
+            'largest_batch': 0,
+            'commit_ms_total': 0.0,
+            'commit_ms_max': 0.0,
+            'commit_ms_last': 0.0,
+        }
+        atexit.register(self._flush_at_exit)
+
+    def configure(self, max_batch=None, max_latency=None):
+        if max_batch:
+            self.max_batch = max_batch
+        if max_latency is not None:
+            self.max_latency = max_latency
+
+    def submit(self, app, items):
+        """Queue ``items`` for the next batch; returns the number now pending"""
+        with self._condition:
+            self._app = app
+            if self.coalesce:
+                for key, fields in items:
+                    if key in self._items:
+                        self.merge(self._items[key], fields)
+                        self._counters['coalesced'] += 1
+                    else:
+                        self._items[key] = dict(fields)
+            else:
+                self._items.extend(items)
+            self._counters['submitted'] += len(items)
+            pending = len(self._items)
+            self._ensure_thread()
+            if pending >= self.max_batch:
+                self._condition.notify()
+        return pending
+
+    def pending(self):
+        with self._condition:
+            return len(self._items)
+
+    def stats(self):
+        """Counters for batch sizes and commit latency since process start"""
+        with self._condition:
+            stats = dict(self._counters, pending=len(self._items),
+                         max_batch=self.max_batch, max_latency=self.max_latency)
+        for key in ('commit_ms_total', 'commit_ms_max', 'commit_ms_last'):
+            stats[key] = round(stats[key], 2)
+        batches = stats['batches']
+        stats['avg_batch_size'] = round(stats['written'] / batches, 2) if batches else 0
+        stats['commit_ms_avg'] = round(stats['commit_ms_total'] / batches, 2) if batches else 0
+        return stats
+
+    def _ensure_thread(self):
+        # gunicorn forks after import, so each worker starts its own flusher
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.name}', daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        with self._condition:
+            if self.coalesce:
+                keys = list(self._items)[:self.max_batch]
+                batch = [(key, self._items.pop(key)) for key in keys]
+            else:
+                batch = self._items[:self.max_batch]
+                del self._items[:self.max_batch]
+            return batch, self._app
+
+    def _requeue(self, batch):
+        """Put ``batch`` back ahead of everything submitted since it was taken"""
+        with self._condition:
+            if self.coalesce:
+                items = {}
+                for key, fields in batch:
+                    items[key] = dict(fields)
+                    if key in self._items:
+                        self.merge(items[key], self._items.pop(key))
+                items.update(self._items)
+                self._items = items
+            else:
+                self._items[:0] = batch
+            self._counters['requeued'] += len(batch)
+
+    def _count(self, counter, amount=1):
+        with self._condition:
+            self._counters[counter] += amount
+
+    def _record(self, batch_size, elapsed_ms):
+        with self._condition:
+            counters = self._counters
+            counters['batches'] += 1
+            counters['written'] += batch_size
+            counters['largest_batch'] = max(counters['largest_batch'], batch_size)
+            counters['commit_ms_total'] += elapsed_ms
+            counters['commit_ms_max'] = max(counters['commit_ms_max'], elapsed_ms)
+            counters['commit_ms_last'] = elapsed_ms
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        try:
+            self.write_batch(batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._record(len(batch), (time.perf_counter() - started) * 1000)
+
+    def _commit_with_retry(self, batch):
+        delay = RETRY_BACKOFF
+        for attempt in range(WRITE_RETRIES):
+            try:
+                return self._commit(batch)
+            except TRANSIENT_ERRORS:
+                if attempt == WRITE_RETRIES - 1:
+                    raise
+                self._count('retries')
+                time.sleep(delay)
+                delay *= 2
+
+    def _write_rows(self, batch):
+        """One commit per row; returns the rows still to write after a transient error"""
+        self._count('split_batches')
+        for index, item in enumerate(batch):
+            try:
+                self._commit_with_retry([item])
+            except TRANSIENT_ERRORS:
+                return batch[index:]
+            except Exception as e:
+                self._count('rejected')
+                print(f"[WriteBehind] {self.name}: rejected {item!r}: {e}")
+        return []
+
+    def _write(self, batch, app):
+        """Write ``batch``; False when it had to be requeued"""
+        with app.app_context():
+            try:
+                self._commit_with_retry(batch)
+                return True
+            except TRANSIENT_ERRORS as e:
+                unwritten, error = batch, e
+            except Exception as e:
+                print(f"[WriteBehind] {self.name}: batch of {len(batch)} failed, writing rows one by one: {e}")
+                unwritten = self._write_rows(batch)
+                error = 'transient error while writing rows one by one'
+            finally:
+                db.session.remove()
+        if unwritten:
+            self._requeue(unwritten)
+            print(f"[WriteBehind] {self.name}: requeued {len(unwritten)} after {WRITE_RETRIES} attempts: {error}")
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if len(self._items) < self.max_batch:
+                    self._condition.wait(max(self.max_latency, 0.01))
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far from the calling thread
+
+        Stops early, leaving the rest buffered, when a batch has to be requeued.
+        """
+        with self._flush_lock:
+            while True:
+                batch, app = self._take_batch()
+                if not batch:
+                    return
+                if not self._write(batch, app):
+                    return
+
+    def _flush_at_exit(self):
+        self.flush()
+        pending = self.pending()
+        if pending:
+            print(f"[WriteBehind] {self.name}: exiting with {pending} unwritten after repeated database errors")